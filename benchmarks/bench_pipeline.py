@@ -0,0 +1,70 @@
+"""
+CPU time per event through the API -> stream -> worker -> SSE path, without the
+Redis and database round trips. "before" reproduces the old path: the worker
+parses the stream payload, validates it again, dumps additional_data from the
+rebuilt model and re-encodes the event to publish it. "after" carries the
+validated JSON in a stream envelope that the worker stores and forwards as-is.
+
+Usage: python benchmarks/bench_pipeline.py [events]
+"""
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_validation import SAMPLES
+from pylotlight.log_stream import read_entry, stream_entry
+from pylotlight.schemas.log_events import validate_log_event
+from pylotlight.sources import get_source_handler
+from pylotlight.sse_channels import group_by_channel
+from pylotlight.worker.worker import decode_envelope, parse_event, to_db_row
+
+def api_side(events: List[Dict[str, Any]], entry: Callable) -> List[Dict[bytes, bytes]]:
+    """Validates a batch like /ingest/batch does and returns the stream entries as the worker reads them."""
+    queued = []
+    for event in events:
+        log_event = validate_log_event(event)
+        try:
+            log_event = get_source_handler(log_event.source).validate_and_process(log_event)
+        except ValueError:
+            pass
+        queued.append((log_event, log_event.model_dump_json().encode("utf-8")))
+    group_by_channel(queued)
+    return [{key.encode(): value if isinstance(value, bytes) else str(value).encode()
+             for key, value in entry(payload, log_event).items()} for log_event, payload in queued]
+
+def before(events: List[Dict[str, Any]]):
+    published = []
+    for fields in api_side(events, lambda payload, log_event: {"event": payload}):
+        event = json.loads(fields[b"event"])
+        parsed_log = parse_event(event)
+        to_db_row(parsed_log)
+        published.append((parsed_log, json.dumps(event).encode()))
+    group_by_channel(published)
+
+def after(events: List[Dict[str, Any]]):
+    for fields in api_side(events, lambda payload, log_event: stream_entry(payload, log_event, published=True)):
+        decode_envelope(read_entry(fields))
+
+def cpu_per_event(fn: Callable, events: List[Dict[str, Any]]) -> float:
+    start = time.process_time()
+    fn(events)
+    return (time.process_time() - start) / len(events) * 1e6
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # The old path warns about every event without a source handler
+    logging.disable(logging.WARNING)
+    print(f"{'event type':<26}{'before us':>11}{'after us':>11}{'saved':>8}")
+    for name, sample in SAMPLES.items():
+        events = [dict(sample) for _ in range(count)]
+        old, new = cpu_per_event(before, events), cpu_per_event(after, events)
+        print(f"{name:<26}{old:>11.1f}{new:>11.1f}{1 - new / old:>7.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares LogEvent validation throughput before and after the (source, source_type)
+dispatch. "before" reproduces the old path: validating against the plain Union and
+then rebuilding the model from model_dump() in the source handler.
+
+Usage: python benchmarks/bench_validation.py [iterations]
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from pydantic import TypeAdapter
+from pylotlight.schemas.log_events import (
+    AirflowHealthCheckEvent,
+    AirflowImportErrorEvent,
+    AirflowFailedDagEvent,
+    AirflowConnectionErrorEvent,
+    DbtLogEvent,
+    GenericLogEvent,
+    resolve_event_model,
+    validate_log_event,
+)
+
+BASE = {
+    "timestamp": "2024-08-27T17:24:52.551306+00:00",
+    "status_type": "failure",
+    "log_level": "ERROR",
+    "message": "benchmark event",
+}
+
+SAMPLES: Dict[str, Dict[str, Any]] = {
+    "airflow_health_check": {**BASE, "source": "airflow", "source_type": "health_check",
+                             "metadatabase_status": "healthy", "scheduler_status": "healthy", "triggerer_status": "healthy"},
+    "airflow_import_error": {**BASE, "source": "airflow", "source_type": "airflow_import_error",
+                             "filename": "/dags/example.py", "stack_trace": "ImportError: no module"},
+    "airflow_failed_dag": {**BASE, "source": "airflow", "source_type": "airflow_failed_dag",
+                           "dag_id": "example_dag", "execution_date": "2024-08-27T00:00:00+00:00", "try_number": 1},
+    "airflow_connection_error": {**BASE, "source": "airflow", "source_type": "airflow_connection_error"},
+    "dbt": {**BASE, "source": "dbt", "source_type": "dbt", "model_name": "orders", "node_id": "model.shop.orders", "run_id": "abc"},
+    "generic": {**BASE, "source": "ci", "source_type": "build", "additional_data": {"job": "build", "attempt": 2}},
+}
+
+_plain_union = TypeAdapter(Union[AirflowHealthCheckEvent, AirflowImportErrorEvent, AirflowFailedDagEvent,
+                                 AirflowConnectionErrorEvent, DbtLogEvent, GenericLogEvent])
+
+def before(event: Dict[str, Any]):
+    parsed = _plain_union.validate_python(event)
+    model = resolve_event_model(event["source"], event["source_type"])
+    return model(**parsed.model_dump())
+
+def after(event: Dict[str, Any]):
+    return validate_log_event(validate_log_event(event))
+
+def rate(fn: Callable, event: Dict[str, Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(event)
+    return iterations / (time.perf_counter() - start)
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'event type':<26}{'before/s':>12}{'after/s':>12}{'speedup':>9}")
+    for name, event in SAMPLES.items():
+        old, new = rate(before, event, iterations), rate(after, event, iterations)
+        print(f"{name:<26}{old:>12,.0f}{new:>12,.0f}{new / old:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from pylotlight.agent.agent import run_agent
+
+run_agent()
@@ -0,0 +1,155 @@
+"""
+Log file agent: tails log files, parses their lines with the source handlers
+and ships them to /ingest/batch in size- and time-bounded batches. File offsets
+are checkpointed only once their lines were accepted, so a restart resumes
+where the last delivered batch ended.
+"""
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from pylotlight.config import Config
+from pylotlight.sources import get_source_handler
+from pylotlight.schemas.log_events import validate_log_event
+from pylotlight.agent.tailer import CheckpointStore, FileTailer, TailedFile
+from pylotlight.agent.shipper import BatchShipper
+
+logger = logging.getLogger(__name__)
+
+class LogAgent:
+    def __init__(self, patterns: List[Tuple[str, str]], api_url: str, checkpoint_path: str,
+                 batch_size: int = 1000, batch_bytes: int = 1000000, flush_interval: float = 1.0,
+                 poll_interval: float = 0.25, start_at_end: bool = True, compress: bool = True):
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        self.tailer = FileTailer(patterns, self.checkpoints, start_at_end=start_at_end)
+        self.shipper = BatchShipper(api_url, compress=compress)
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self._batch: List[Dict[str, Any]] = []
+        # Rough size of the batch, to avoid serializing it twice
+        self._batch_size_bytes = 0
+        # File offsets reached by the lines in the current batch, checkpointed once it is delivered
+        self._pending_offsets: Dict[str, Tuple[str, int]] = {}
+        self._batch_started: Optional[float] = None
+        self._stats = {'lines': 0, 'events': 0, 'skipped': 0, 'failed': 0, 'batches': 0}
+        self._last_stats = time.time()
+
+    def _parse(self, tailed: TailedFile, line: str) -> Optional[Dict[str, Any]]:
+        handler = get_source_handler(tailed.source)
+        event = handler.parse_line(line, tailed.context)
+        if event is None:
+            last_event = tailed.context.get('last_event')
+            if last_event is not None and line.strip():
+                # Continuation of the previous event, e.g. a traceback
+                last_event['message'] = f"{last_event['message']}\n{line}"
+                self._batch_size_bytes += len(line) + 1
+            return None
+        try:
+            model = handler.validate_and_process(event)
+        except ValueError:
+            model = validate_log_event(event)
+        event = model.model_dump(mode='json', exclude_none=True)
+        tailed.context['last_event'] = event
+        return event
+
+    def _batch_full(self) -> bool:
+        return len(self._batch) >= self.batch_size or self._batch_size_bytes >= self.batch_bytes
+
+    def flush(self):
+        if self._batch:
+            # Continuation lines can't be appended to an event once it is sent
+            for tailed in self.tailer.files.values():
+                tailed.context['last_event'] = None
+            payloads = [json.dumps(event).encode('utf-8') for event in self._batch]
+            response = self.shipper.send(payloads)
+            failed = response.get('failed_events', [])
+            if failed:
+                logger.warning(f"{len(failed)} of {len(payloads)} events were rejected by the API")
+            self._stats['events'] += len(payloads) - len(failed)
+            self._stats['failed'] += len(failed)
+            self._stats['batches'] += 1
+            self._batch = []
+            self._batch_size_bytes = 0
+        for key, (path, offset) in self._pending_offsets.items():
+            if key in self.tailer.files:
+                self.checkpoints.update(key, path, offset)
+            else:
+                # Done with a rotated-away file
+                self.checkpoints.remove(key)
+        if self._pending_offsets:
+            self.checkpoints.save()
+        self._pending_offsets = {}
+        self._batch_started = None
+
+    def poll_once(self) -> int:
+        """Reads and batches the new lines of every file; returns the number of lines read."""
+        lines = 0
+        for tailed, line, offset in self.tailer.poll():
+            lines += 1
+            try:
+                event = self._parse(tailed, line)
+            except Exception as e:
+                logger.warning(f"Skipping unparseable line of {tailed.path}: {str(e)}")
+                event = None
+                self._stats['skipped'] += 1
+            self._pending_offsets[tailed.key] = (tailed.path, offset)
+            if event is not None:
+                self._batch.append(event)
+                self._batch_size_bytes += len(event['message']) + 200
+                if self._batch_started is None:
+                    self._batch_started = time.monotonic()
+                if self._batch_full():
+                    self.flush()
+        self._stats['lines'] += lines
+        return lines
+
+    def _log_stats(self):
+        now = time.time()
+        if now - self._last_stats >= 60:
+            logger.info(f"Agent stats over {now - self._last_stats:.0f}s: {self._stats}, "
+                        f"tailing {len(self.tailer.files)} files")
+            self._stats = dict.fromkeys(self._stats, 0)
+            self._last_stats = now
+
+    def run(self):
+        logger.info(f"Agent tailing {self.tailer.patterns}")
+        try:
+            while True:
+                lines = self.poll_once()
+                if self._batch_started is not None and time.monotonic() - self._batch_started >= self.flush_interval:
+                    self.flush()
+                elif not self._batch and self._pending_offsets:
+                    # Lines that produced no events still move the checkpoints
+                    self.flush()
+                self._log_stats()
+                if not lines:
+                    time.sleep(self.poll_interval)
+        finally:
+            self.flush()
+            self.tailer.close()
+            self.shipper.close()
+
+def run_agent():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not Config.AGENT_FILES:
+        raise SystemExit("AGENT_FILES is not set, e.g. AGENT_FILES='dbt=/dbt/logs/dbt.log'")
+    agent = LogAgent(
+        Config.AGENT_FILES,
+        Config.API_URL,
+        Config.AGENT_CHECKPOINT_PATH,
+        batch_size=Config.AGENT_BATCH_SIZE,
+        batch_bytes=Config.AGENT_BATCH_BYTES,
+        flush_interval=Config.AGENT_FLUSH_INTERVAL,
+        poll_interval=Config.AGENT_POLL_INTERVAL,
+        start_at_end=Config.AGENT_START_AT == 'end',
+        compress=Config.AGENT_COMPRESS,
+    )
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        logger.info("Agent stopped")
+
+if __name__ == "__main__":
+    run_agent()
@@ -0,0 +1,61 @@
+import gzip
+import time
+import logging
+from typing import Any, Dict, List
+import requests
+from requests.exceptions import RequestException
+from pylotlight.hooks.rate_limiter import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+class BatchShipper:
+    """
+    Sends batches of serialized log events to /ingest/batch as one compressed
+    request each, retrying with backoff until the API accepts them.
+    """
+
+    def __init__(self, api_url: str, compress: bool = True, timeout: float = 30, max_backoff: float = 30):
+        self.url = f"{api_url.rstrip('/')}/ingest/batch"
+        self.compress = compress
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        if compress:
+            self.session.headers['Content-Encoding'] = 'gzip'
+
+    def _body(self, payloads: List[bytes]) -> bytes:
+        body = b'{"log_events":[' + b','.join(payloads) + b']}'
+        return gzip.compress(body, compresslevel=6) if self.compress else body
+
+    def send(self, payloads: List[bytes]) -> Dict[str, Any]:
+        """Blocks until the batch is accepted and returns the API's response."""
+        body = self._body(payloads)
+        attempt = 0
+        while True:
+            wait = min(self.max_backoff, 2 ** attempt)
+            try:
+                response = self.session.post(self.url, data=body, timeout=self.timeout)
+                if response.status_code == 413 and len(payloads) > 1:
+                    # Too large for the API: send it in halves
+                    middle = len(payloads) // 2
+                    first, second = self.send(payloads[:middle]), self.send(payloads[middle:])
+                    return {'event_ids': first.get('event_ids', []) + second.get('event_ids', []),
+                            'failed_events': first.get('failed_events', []) + [middle + i for i in second.get('failed_events', [])]}
+                if response.status_code in (429, 503):
+                    wait = parse_retry_after(response.headers.get('Retry-After')) or wait
+                    raise RequestException(f"API is throttling ({response.status_code})")
+                if 400 <= response.status_code < 500:
+                    # Retrying won't help; the whole batch is rejected
+                    logger.error(f"API rejected a batch of {len(payloads)} events: {response.status_code} {response.text[:500]}")
+                    return {'event_ids': [], 'failed_events': list(range(len(payloads)))}
+                response.raise_for_status()
+                return response.json()
+            except RequestException as e:
+                attempt += 1
+                logger.warning(f"Failed to send a batch of {len(payloads)} events (attempt {attempt}): {str(e)}. "
+                               f"Retrying in {wait}s")
+                time.sleep(wait)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,154 @@
+import os
+import glob
+import json
+import logging
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CheckpointStore:
+    """
+    Byte offsets of the tailed files, keyed by "device:inode" so a rotated
+    (renamed) file keeps its offset, saved atomically to a JSON file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.offsets = json.load(f)
+
+    def get(self, key: str) -> Optional[int]:
+        entry = self.offsets.get(key)
+        return entry['offset'] if entry else None
+
+    def update(self, key: str, path: str, offset: int):
+        self.offsets[key] = {'path': path, 'offset': offset}
+
+    def remove(self, key: str):
+        self.offsets.pop(key, None)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.offsets, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+class TailedFile:
+    def __init__(self, key: str, path: str, source: str, offset: int):
+        self.key = key
+        self.path = path
+        self.source = source
+        self.offset = offset
+        self.handle: Optional[IO[bytes]] = None
+        # Parser state for the source handler, see BaseSource.parse_line
+        self.context: Dict[str, Any] = {'path': path}
+
+class FileTailer:
+    """
+    Follows the files matching (source, glob pattern) pairs and yields their
+    complete lines.
+
+    Files are tracked by device and inode rather than by name, so after a
+    rename-style rotation the old file is still read to its end (through its
+    open handle, even once it no longer matches) while the new file is picked
+    up from its start. A file that shrinks below its offset was truncated and
+    is re-read from the start.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, str]], checkpoints: CheckpointStore, start_at_end: bool = True,
+                 read_size: int = 1 << 20, max_line_bytes: int = 1 << 20):
+        self.patterns = patterns
+        self.checkpoints = checkpoints
+        self.read_size = read_size
+        self.max_line_bytes = max_line_bytes
+        self.files: Dict[str, TailedFile] = {}
+        # Files already present at startup without a checkpoint are only followed from their end
+        self._start_at_end = start_at_end
+        self._first_poll = True
+
+    def _discover(self) -> Dict[str, Tuple[str, str, os.stat_result]]:
+        found = {}
+        for source, pattern in self.patterns:
+            for path in glob.glob(pattern, recursive=True):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if os.path.isfile(path):
+                    found.setdefault(f"{stat.st_dev}:{stat.st_ino}", (path, source, stat))
+        return found
+
+    def _track(self, key: str, path: str, source: str, stat: os.stat_result) -> TailedFile:
+        offset = self.checkpoints.get(key)
+        if offset is None:
+            offset = stat.st_size if self._start_at_end else 0
+        tailed = TailedFile(key, path, source, offset)
+        tailed.handle = open(path, 'rb')
+        logger.info(f"Tailing {path} ({source}) from offset {offset}")
+        return tailed
+
+    def _read_lines(self, tailed: TailedFile) -> Iterator[Tuple[str, int]]:
+        """Yields (line, offset just past it) for the complete lines in one read."""
+        base = tailed.offset
+        tailed.handle.seek(base)
+        data = tailed.handle.read(self.read_size)
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            if len(data) < self.max_line_bytes:
+                return
+            # A line longer than max_line_bytes is cut into pieces
+            end = len(data)
+        start = 0
+        while start < end:
+            newline = data.find(b'\n', start, end)
+            stop = newline + 1 if newline != -1 else end
+            yield data[start:stop].rstrip(b'\r\n').decode('utf-8', errors='replace'), base + stop
+            start = stop
+        tailed.offset = base + end
+
+    def poll(self) -> Iterator[Tuple[TailedFile, str, int]]:
+        """Yields (file, line, offset just past the line) for up to read_size new bytes per file."""
+        found = self._discover()
+        if self._first_poll:
+            for key in list(self.checkpoints.offsets):
+                if key not in found:
+                    # Rotated away or deleted while the agent was down
+                    self.checkpoints.remove(key)
+            self._first_poll = False
+        for key, (path, source, stat) in found.items():
+            tailed = self.files.get(key)
+            if tailed is None:
+                try:
+                    tailed = self.files[key] = self._track(key, path, source, stat)
+                except OSError as e:
+                    logger.warning(f"Cannot open {path}: {str(e)}")
+                    continue
+            elif tailed.path != path:
+                logger.info(f"{tailed.path} was renamed to {path}")
+                tailed.path = tailed.context['path'] = path
+            if stat.st_size < tailed.offset:
+                logger.warning(f"{path} was truncated, reading it from the start")
+                tailed.offset = 0
+        self._start_at_end = False
+
+        for key, tailed in list(self.files.items()):
+            start = tailed.offset
+            for line, end in self._read_lines(tailed):
+                yield tailed, line, end
+            if key not in found and tailed.offset == start:
+                # Rotated away or deleted, and read to its end
+                logger.info(f"Stopped tailing {tailed.path}")
+                tailed.handle.close()
+                del self.files[key]
+
+    def close(self):
+        for tailed in self.files.values():
+            tailed.handle.close()
+        self.files.clear()
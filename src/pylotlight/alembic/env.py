@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 from pylotlight.database.session import Base, DATABASE_URL
 from pylotlight.database.models.log_event import LogEvent
+from pylotlight.database.models.log_event_rollup import LogEventRollup
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,33 @@
+"""Add composite indexes for keyset pagination on log_events
+
+Revision ID: b3e1f4c2d9a7
+Revises: 65c9d218a1c4
+Create Date: 2024-09-02 10:12:41.318044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e1f4c2d9a7'
+down_revision: Union[str, None] = '65c9d218a1c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_log_events_timestamp_id', 'log_events', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_log_events_source_timestamp_id', 'log_events', ['source', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_log_events_log_level_timestamp_id', 'log_events', ['log_level', 'timestamp', 'id'], unique=False)
+    # Covered by the leading column of ix_log_events_timestamp_id
+    op.drop_index('ix_log_events_timestamp', table_name='log_events')
+
+
+def downgrade() -> None:
+    op.create_index('ix_log_events_timestamp', 'log_events', ['timestamp'], unique=False)
+    op.drop_index('ix_log_events_log_level_timestamp_id', table_name='log_events')
+    op.drop_index('ix_log_events_source_timestamp_id', table_name='log_events')
+    op.drop_index('ix_log_events_timestamp_id', table_name='log_events')
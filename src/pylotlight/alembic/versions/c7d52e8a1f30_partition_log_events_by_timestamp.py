@@ -0,0 +1,104 @@
+"""Convert log_events to a table range-partitioned on timestamp
+
+Revision ID: c7d52e8a1f30
+Revises: b3e1f4c2d9a7
+Create Date: 2024-09-05 14:03:27.902113
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from pylotlight.config import Config
+from pylotlight.database.partitions import ensure_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d52e8a1f30'
+down_revision: Union[str, None] = 'b3e1f4c2d9a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_log_events_id': ['id'],
+    'ix_log_events_source': ['source'],
+    'ix_log_events_source_type': ['source_type'],
+    'ix_log_events_log_level': ['log_level'],
+    'ix_log_events_timestamp_id': ['timestamp', 'id'],
+    'ix_log_events_source_timestamp_id': ['source', 'timestamp', 'id'],
+    'ix_log_events_log_level_timestamp_id': ['log_level', 'timestamp', 'id'],
+}
+
+COLUMNS = "id, timestamp, source, source_type, log_level, message, status_type, additional_data"
+
+
+def _move_aside() -> None:
+    # Index and constraint names are schema-wide, so free them up for the new table
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE log_events RENAME TO log_events_old")
+    op.execute("ALTER TABLE log_events_old RENAME CONSTRAINT log_events_pkey TO log_events_old_pkey")
+
+
+def _create_indexes() -> None:
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'log_events', columns, unique=False)
+
+
+def upgrade() -> None:
+    _move_aside()
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE log_events (
+            id INTEGER NOT NULL DEFAULT nextval('log_events_id_seq'),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            source VARCHAR,
+            source_type VARCHAR,
+            log_level VARCHAR,
+            message VARCHAR,
+            status_type VARCHAR,
+            additional_data JSON,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE log_events_id_seq OWNED BY log_events.id")
+    _create_indexes()
+
+    # Create partitions for the existing data up front so rows land directly in them
+    conn = op.get_bind()
+    oldest = conn.execute(sa.text("SELECT min(timestamp) FROM log_events_old")).scalar()
+    now = datetime.utcnow()
+    ensure_partitions(conn, oldest or now, now + timedelta(days=Config.LOG_PARTITION_PREMAKE_DAYS + 1),
+                      Config.LOG_PARTITION_DAYS)
+
+    op.execute(f"""
+        INSERT INTO log_events ({COLUMNS})
+        SELECT id, COALESCE(timestamp, to_timestamp(0) AT TIME ZONE 'UTC'), source, source_type,
+               log_level, message, status_type, additional_data
+        FROM log_events_old
+    """)
+    op.execute("DROP TABLE log_events_old")
+
+
+def downgrade() -> None:
+    _move_aside()
+    op.execute("""
+        CREATE TABLE log_events (
+            id INTEGER NOT NULL DEFAULT nextval('log_events_id_seq'),
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            source VARCHAR,
+            source_type VARCHAR,
+            log_level VARCHAR,
+            message VARCHAR,
+            status_type VARCHAR,
+            additional_data JSON,
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE log_events_id_seq OWNED BY log_events.id")
+    op.execute(f"INSERT INTO log_events ({COLUMNS}) SELECT {COLUMNS} FROM log_events_old")
+    # Dropping the old parent drops all of its partitions
+    op.execute("DROP TABLE log_events_old")
+    _create_indexes()
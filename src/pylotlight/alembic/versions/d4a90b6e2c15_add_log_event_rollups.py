@@ -0,0 +1,43 @@
+"""Add per-minute log_event_rollups table
+
+Revision ID: d4a90b6e2c15
+Revises: c7d52e8a1f30
+Create Date: 2024-09-09 09:41:56.170382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a90b6e2c15'
+down_revision: Union[str, None] = 'c7d52e8a1f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'log_event_rollups',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('source_type', sa.String(), nullable=False),
+        sa.Column('status_type', sa.String(), nullable=False),
+        sa.Column('log_level', sa.String(), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'source', 'source_type', 'status_type', 'log_level'),
+    )
+    # Backfill from the events already stored
+    op.execute("""
+        INSERT INTO log_event_rollups (bucket, source, source_type, status_type, log_level, count)
+        SELECT date_trunc('minute', timestamp), source, source_type, status_type, log_level, count(*)
+        FROM log_events
+        WHERE source IS NOT NULL AND source_type IS NOT NULL AND status_type IS NOT NULL AND log_level IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('log_event_rollups')
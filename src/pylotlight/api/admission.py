@@ -0,0 +1,137 @@
+"""
+Ingest admission control, shared by every API replica through Redis: a token
+bucket per source limits each producer's event rate, and a high-watermark on
+the log streams' total length stops all ingest while the workers are behind.
+"""
+import math
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PREFIX = 'ingest_bucket:'
+REJECTIONS_KEY = 'ingest_admission:rejections'
+
+ADMITTED = 0
+RATE_LIMITED = 1
+QUEUE_FULL = 2
+
+# KEYS: the log streams, then one bucket per source
+# ARGV: stream count, high watermark, then (cost, rate, burst) per bucket
+# Returns {decision, retry after in ms, index of the limiting bucket or queue depth}
+_ADMIT_SCRIPT = """
+local streams = tonumber(ARGV[1])
+local watermark = tonumber(ARGV[2])
+if watermark > 0 then
+    local depth = 0
+    for i = 1, streams do
+        depth = depth + redis.call('XLEN', KEYS[i])
+    end
+    if depth >= watermark then
+        return {2, 0, depth}
+    end
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local remaining = {}
+for i = streams + 1, #KEYS do
+    local arg = 3 + (i - streams - 1) * 3
+    local cost, rate, burst = tonumber(ARGV[arg]), tonumber(ARGV[arg + 1]), tonumber(ARGV[arg + 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(burst, tokens + elapsed * rate)
+    -- Batches larger than the burst are let through on a full bucket, leaving it in debt
+    local needed = math.min(cost, burst)
+    if tokens < needed then
+        return {1, math.ceil((needed - tokens) / rate * 1000), i - streams}
+    end
+    remaining[i] = tokens - cost
+end
+for i = streams + 1, #KEYS do
+    local arg = 3 + (i - streams - 1) * 3
+    redis.call('HSET', KEYS[i], 'tokens', remaining[i], 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(tonumber(ARGV[arg + 2]) / tonumber(ARGV[arg + 1])) + 60)
+end
+return {0, 0, 0}
+"""
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    reason: Optional[str] = None
+    source: Optional[str] = None
+    retry_after: float = 0
+
+class AdmissionRejected(Exception):
+    def __init__(self, decision: AdmissionDecision):
+        super().__init__(decision.reason)
+        self.decision = decision
+
+class AdmissionController:
+    """
+    Admits or rejects a request's events in one script call. A request is only
+    charged when every source in it is within its limit.
+    """
+
+    def __init__(self, redis_factory: Callable[[], Awaitable[Any]], stream_keys: List[str], rate: float, burst: int,
+                 source_limits: Optional[Dict[str, Tuple[float, int]]] = None, high_watermark: int = 0,
+                 queue_retry_after: float = 5):
+        self.redis_factory = redis_factory
+        self.stream_keys = stream_keys
+        self.rate = rate
+        self.burst = burst
+        self.source_limits = source_limits or {}
+        self.high_watermark = high_watermark
+        self.queue_retry_after = queue_retry_after
+        self._script = None
+
+    def limits(self, source: str) -> Tuple[float, int]:
+        return self.source_limits.get(source, (self.rate, self.burst))
+
+    async def admit(self, counts: Dict[str, int]) -> AdmissionDecision:
+        """Takes tokens for counts (events per source), unless a limit is hit."""
+        sources = [source for source in counts if self.limits(source)[0] > 0]
+        if not sources and self.high_watermark <= 0:
+            return AdmissionDecision(True)
+        args: List[Any] = [len(self.stream_keys), self.high_watermark]
+        for source in sources:
+            rate, burst = self.limits(source)
+            args.extend([counts[source], rate, burst])
+        try:
+            redis_client = await self.redis_factory()
+            if self._script is None:
+                self._script = redis_client.register_script(_ADMIT_SCRIPT)
+            decision, retry_after_ms, detail = await self._script(
+                keys=[*self.stream_keys, *(f"{BUCKET_PREFIX}{source}" for source in sources)], args=args)
+        except Exception as e:
+            # Redis trouble surfaces when the events are queued; don't fail twice
+            logger.error(f"Ingest admission check failed, admitting the request: {type(e).__name__}: {str(e)}")
+            return AdmissionDecision(True)
+
+        if decision == ADMITTED:
+            return AdmissionDecision(True)
+        if decision == QUEUE_FULL:
+            result = AdmissionDecision(False, 'queue_full', retry_after=self.queue_retry_after)
+            logger.warning(f"Log streams hold {detail} entries, above the high watermark of {self.high_watermark}")
+            rejected = counts
+        else:
+            source = sources[detail - 1]
+            result = AdmissionDecision(False, 'rate_limited', source, retry_after_ms / 1000)
+            rejected = {source: counts[source]}
+        await self._count_rejection(redis_client, result.reason, rejected)
+        return result
+
+    async def _count_rejection(self, redis_client, reason: str, counts: Dict[str, int]):
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for source, count in counts.items():
+                    pipe.hincrby(REJECTIONS_KEY, f"{source}:{reason}:requests", 1)
+                    pipe.hincrby(REJECTIONS_KEY, f"{source}:{reason}:events", count)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to count rejected ingest request: {str(e)}")
+
+def retry_after_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(retry_after)))
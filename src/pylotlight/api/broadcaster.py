@@ -0,0 +1,242 @@
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from pylotlight.sse_channels import parse_channel
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+# Queued ahead of everything else when a client's missed events can't be replayed
+RESET = object()
+
+def coalesce(payloads: List[bytes]) -> bytes:
+    """
+    Joins JSON payloads (single events or arrays of events) into one JSON array
+    by splicing the raw bytes, without decoding any of them.
+    """
+    if len(payloads) == 1:
+        return payloads[0]
+    parts = []
+    for payload in payloads:
+        payload = payload.strip()
+        if payload.startswith(b"["):
+            payload = payload[1:-1].strip()
+        if payload:
+            parts.append(payload)
+    return b"[" + b",".join(parts) + b"]"
+
+LOG_LEVEL_RANKS = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3, "CRITICAL": 4}
+
+class SSEFilter:
+    """
+    What one SSE subscriber wants to receive. Matching only looks at the channel
+    an event was published on, and results are cached per channel, for up to
+    MAX_CACHED_CHANNELS channels since producers choose the channel names.
+    """
+    MAX_CACHED_CHANNELS = 1024
+
+    def __init__(self, sources: Optional[Iterable[str]] = None, source_types: Optional[Iterable[str]] = None,
+                 min_log_level: Optional[str] = None, status_types: Optional[Iterable[str]] = None):
+        self.sources = set(sources) if sources else None
+        self.source_types = set(source_types) if source_types else None
+        self.min_rank = LOG_LEVEL_RANKS[min_log_level] if min_log_level else None
+        self.status_types = set(status_types) if status_types else None
+        self._matches: Dict[str, bool] = {}
+
+    def _match(self, channel: str) -> bool:
+        key = parse_channel(channel)
+        if key is None:
+            return False
+        source, source_type, status_type, log_level = key
+        if self.sources is not None and source not in self.sources:
+            return False
+        if self.source_types is not None and source_type not in self.source_types:
+            return False
+        if self.status_types is not None and status_type not in self.status_types:
+            return False
+        if self.min_rank is not None and LOG_LEVEL_RANKS.get(log_level.upper(), -1) < self.min_rank:
+            return False
+        return True
+
+    def matches(self, channel: str) -> bool:
+        matched = self._matches.get(channel)
+        if matched is None:
+            if len(self._matches) >= self.MAX_CACHED_CHANNELS:
+                # Evict the oldest entry
+                del self._matches[next(iter(self._matches))]
+            matched = self._matches[channel] = self._match(channel)
+        return matched
+
+class SSEClient:
+    """Bounded queue of (sequence number, message) pairs waiting to be sent to one SSE connection."""
+
+    def __init__(self, max_size: int, overflow_policy: str = DROP_OLDEST, subscription_filter: Optional[SSEFilter] = None):
+        self.filter = subscription_filter
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self.closed = False
+
+    def accepts(self, channel: str) -> bool:
+        return self.filter is None or self.filter.matches(channel)
+
+    def put(self, item):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow_policy == DISCONNECT:
+                self.close()
+                return
+            self.queue.get_nowait()
+            self.queue.put_nowait(item)
+            self.dropped += 1
+
+    def close(self):
+        """Ends the stream once; the consumer sees the sentinel before anything else."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def frames(self, max_coalesce: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """
+        Yields (sequence number of the last message, frame) per wake-up, combining
+        up to max_coalesce pending messages. A RESET marker is yielded with a frame of None.
+        """
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            if item[1] is RESET:
+                yield item[0], None
+                continue
+            pending = [item]
+            while len(pending) < max_coalesce and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    yield pending[-1][0], coalesce([payload for _, payload in pending])
+                    return
+                pending.append(item)
+            yield pending[-1][0], coalesce([payload for _, payload in pending])
+
+class SSEBroadcaster:
+    """
+    Holds a single Redis pattern subscription per API process and fans every
+    message out to the queues of the connected SSE clients whose filter
+    matches the channel it was published on.
+
+    Every message gets a sequence number and is kept in a bounded replay buffer,
+    so a client reconnecting with Last-Event-ID receives exactly what it missed.
+    Event ids are "<epoch>-<sequence>", where the epoch identifies this process;
+    ids from another process or older than the buffer get a reset instead.
+    """
+
+    def __init__(self, redis_factory: Callable[[], Awaitable], pattern: str, queue_size: int = 1000,
+                 overflow_policy: str = DROP_OLDEST, max_coalesce: int = 100, replay_size: int = 10000):
+        self._redis_factory = redis_factory
+        self.pattern = pattern
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.max_coalesce = max_coalesce
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        # (sequence number, channel, raw payload); sequence numbers in the buffer are contiguous
+        self._replay: Deque[Tuple[int, str, bytes]] = deque(maxlen=replay_size)
+        self._clients: Set[SSEClient] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def _parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        """Returns the sequence number of one of our own event ids, or None."""
+        if not event_id:
+            return None
+        epoch, _, sequence = event_id.rpartition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in list(self._clients):
+            client.close()
+        self._clients.clear()
+
+    def subscribe(self, last_event_id: Optional[str] = None, subscription_filter: Optional[SSEFilter] = None) -> SSEClient:
+        """
+        Registers a client, first queueing whatever it missed since last_event_id.
+        Nothing is awaited between the replay and the registration, so the client
+        sees every message exactly once.
+        """
+        self.start()
+        client = SSEClient(self.queue_size, self.overflow_policy, subscription_filter)
+        if last_event_id:
+            last_sequence = self._parse_event_id(last_event_id)
+            first_buffered = self._replay[0][0] if self._replay else self._sequence + 1
+            if last_sequence is None or last_sequence > self._sequence or last_sequence + 1 < first_buffered:
+                client.put((self._sequence, RESET))
+            else:
+                for sequence, channel, payload in itertools.islice(self._replay, last_sequence + 1 - first_buffered, None):
+                    if client.accepts(channel):
+                        client.put((sequence, payload))
+        self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client: SSEClient):
+        self._clients.discard(client)
+        if client.dropped:
+            logger.warning(f"SSE client dropped {client.dropped} events on overflow")
+
+    def broadcast(self, channel: str, payload: bytes):
+        self._sequence += 1
+        item = (self._sequence, payload)
+        self._replay.append((self._sequence, channel, payload))
+        for client in list(self._clients):
+            if not client.accepts(channel):
+                continue
+            client.put(item)
+            if client.closed:
+                logger.warning("Disconnecting SSE client that fell behind")
+                self._clients.discard(client)
+
+    async def _run(self):
+        while True:
+            pubsub = None
+            try:
+                redis_client = await self._redis_factory()
+                pubsub = redis_client.pubsub()
+                await pubsub.psubscribe(self.pattern)
+                logger.info(f"Subscribed to {self.pattern}")
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        channel = message['channel']
+                        self.broadcast(channel.decode() if isinstance(channel, bytes) else channel, message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in SSE broadcaster: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.punsubscribe(self.pattern)
+                    except Exception:
+                        pass
@@ -1,12 +1,21 @@
 from fastapi import FastAPI
-from pylotlight.api.routes import router as api_router
+from pylotlight.api.routes import router as api_router, broadcaster, start_spill, stop_spill
+from pylotlight.api.middleware import DecompressionMiddleware
+from pylotlight.config import Config as PylotConfig
 from pylotlight.database.session import create_tables
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from alembic import command
 from alembic.config import Config
 
-app = FastAPI(title="Pylot Light")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_spill()
+    yield
+    await stop_spill()
+    await broadcaster.stop()
+
+app = FastAPI(title="Pylot Light", lifespan=lifespan)
 
 app.add_middleware(
        CORSMiddleware,
@@ -15,6 +24,9 @@ app.add_middleware(
        allow_methods=["*"],  # Allows all methods
        allow_headers=["*"],  # Allows all headers
    )
+# Accept gzip/deflate/zstd compressed request bodies, e.g. batches from the log agent
+app.add_middleware(DecompressionMiddleware, max_size=PylotConfig.INGEST_MAX_BODY_BYTES,
+                   unbounded_paths=["/ingest/ndjson"])
 app.include_router(api_router)
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+import zlib
+import logging
+from typing import Iterable, Iterator, Optional, Tuple
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Largest piece of decompressed body handed to the app at once
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+class _ZlibDecoder:
+    def __init__(self, wbits: int):
+        self._decoder = zlib.decompressobj(wbits)
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            chunk = self._decoder.decompress(data, OUTPUT_CHUNK_SIZE)
+            if chunk:
+                yield chunk
+            data = self._decoder.unconsumed_tail
+
+    def flush(self) -> bytes:
+        return self._decoder.flush()
+
+    @property
+    def complete(self) -> bool:
+        return self._decoder.eof
+
+class _ZstdDecoder:
+    # zstd can't cap the output of one call, so input is fed in slices small
+    # enough that even a maximally compressed slice stays a few MB
+    INPUT_SLICE = 64
+
+    def __init__(self):
+        self._decoder = zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        output = []
+        output_size = 0
+        for start in range(0, len(data), self.INPUT_SLICE):
+            chunk = self._decoder.decompress(data[start:start + self.INPUT_SLICE])
+            output.append(chunk)
+            output_size += len(chunk)
+            if output_size >= OUTPUT_CHUNK_SIZE:
+                yield b''.join(output)
+                output, output_size = [], 0
+        if output_size:
+            yield b''.join(output)
+
+    def flush(self) -> bytes:
+        return b''
+
+    @property
+    def complete(self) -> bool:
+        return self._decoder.eof
+
+def _decoder_for(encoding: str):
+    if encoding == 'gzip':
+        return _ZlibDecoder(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return _ZlibDecoder(zlib.MAX_WBITS)
+    if encoding == 'zstd' and zstandard is not None:
+        return _ZstdDecoder()
+    return None
+
+DECODE_ERRORS: Tuple[type, ...] = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+class DecompressionMiddleware:
+    """
+    Decompresses request bodies sent with Content-Encoding gzip, deflate or zstd
+    (with the zstandard package), so producers such as the log agent can ship
+    compressed batches. Bodies are decompressed as the app reads them, so
+    streaming endpoints never hold the whole body. The decompressed size is
+    capped at max_size to guard against decompression bombs, except on
+    unbounded_paths, whose endpoints process the body incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int, unbounded_paths: Iterable[str] = ()):
+        self.app = app
+        self.max_size = max_size
+        self.unbounded_paths = set(unbounded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope['headers'])
+        encoding = headers.get(b'content-encoding', b'').decode('latin-1').strip().lower()
+        if not encoding or encoding == 'identity':
+            await self.app(scope, receive, send)
+            return
+        decoder = _decoder_for(encoding)
+        if decoder is None:
+            await PlainTextResponse(f"Unsupported Content-Encoding: {encoding}", status_code=415)(scope, receive, send)
+            return
+
+        max_size = None if scope['path'] in self.unbounded_paths else self.max_size
+        scope = dict(scope)
+        # The decompressed length isn't known up front
+        scope['headers'] = [(name, value) for name, value in scope['headers']
+                            if name not in (b'content-encoding', b'content-length')]
+        chunks: Iterator[bytes] = iter(())
+        last_message = False
+        size = 0
+        done = False
+        # Set once this middleware answered the request itself
+        rejection: Optional[PlainTextResponse] = None
+
+        def next_chunk() -> Optional[bytes]:
+            nonlocal rejection
+            try:
+                return next(chunks)
+            except StopIteration:
+                return None
+            except DECODE_ERRORS as e:
+                logger.warning(f"Invalid {encoding} request body: {str(e)}")
+                rejection = PlainTextResponse(f"Invalid {encoding} request body", status_code=400)
+                return None
+
+        async def decompressed_receive() -> Message:
+            nonlocal chunks, last_message, size, done, rejection
+            if done:
+                # The body was fully read; later calls wait for the client to disconnect
+                return await receive()
+            chunk = next_chunk()
+            while chunk is None and rejection is None:
+                if last_message:
+                    chunk, done = decoder.flush(), True
+                    if not decoder.complete:
+                        logger.warning(f"Truncated {encoding} request body")
+                        rejection = PlainTextResponse(f"Truncated {encoding} request body", status_code=400)
+                    break
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return message
+                last_message = not message.get('more_body', False)
+                chunks = decoder.feed(message.get('body', b''))
+                chunk = next_chunk()
+            if rejection is None:
+                size += len(chunk)
+                if max_size is None or size <= max_size:
+                    return {'type': 'http.request', 'body': chunk, 'more_body': not done}
+                rejection = PlainTextResponse("Request body too large", status_code=413)
+            # The app sees a disconnected client, and the rejection is sent instead of its response
+            return {'type': 'http.disconnect'}
+
+        response_started = False
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if rejection is None:
+                response_started = True
+                await send(message)
+
+        try:
+            await self.app(scope, decompressed_receive, guarded_send)
+        except Exception:
+            if rejection is None:
+                raise
+        if rejection is not None and not response_started:
+            await rejection(scope, receive, send)
@@ -0,0 +1,43 @@
+from typing import AsyncIterator, Optional, Tuple
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, int, Optional[bytes]]]:
+    """
+    Splits a streamed newline-delimited body into (line number, byte offset,
+    line) without holding more than one line and one chunk. Lines longer than
+    max_line_bytes are skipped and yielded as None. Blank lines are skipped.
+    """
+    buffer = bytearray()
+    # Offset in the body of buffer[0]
+    offset = 0
+    line_number = 0
+    # Set while skipping the rest of an overlong line
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            newline = buffer.find(b'\n', start)
+            if newline == -1:
+                break
+            if skipping:
+                skipping = False
+            else:
+                line_number += 1
+                line = bytes(buffer[start:newline]).strip()
+                if len(line) > max_line_bytes:
+                    yield line_number, offset + start, None
+                elif line:
+                    yield line_number, offset + start, line
+            start = newline + 1
+        del buffer[:start]
+        offset += start
+        if len(buffer) > max_line_bytes and not skipping:
+            line_number += 1
+            skipping = True
+            yield line_number, offset, None
+        if skipping:
+            offset += len(buffer)
+            buffer.clear()
+    line = bytes(buffer).strip()
+    if line and not skipping:
+        yield line_number + 1, offset, line
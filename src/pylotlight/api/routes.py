@@ -1,12 +1,31 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from collections import Counter
+from typing import Dict, List, Literal, Optional, Tuple
+from datetime import datetime, timedelta
+import json
+import time
 import logging
+from fastapi.responses import JSONResponse
+from starlette.requests import ClientDisconnect
 from sse_starlette.sse import EventSourceResponse
 import asyncio
 import aioredis
 from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from pylotlight.config import Config
+from pylotlight.api.broadcaster import SSEBroadcaster, SSEFilter
+from pylotlight.api.ndjson import iter_lines
+from pylotlight.api.admission import (AdmissionController, AdmissionDecision, AdmissionRejected, REJECTIONS_KEY,
+                                      retry_after_header)
+from pylotlight.api.spill import SpillDrainer, SpillFull, SpillLog
+from pylotlight.sse_channels import SSE_CHANNEL_PATTERN, group_by_channel
 from pylotlight.sources import get_source_handler
+from pylotlight.database.session import get_db
+from pylotlight.database.queries import query_logs, count_logs, row_to_event, query_rollups
+from pylotlight.status import STATUS_KEY
+from pylotlight.log_stream import all_stream_keys, stream_key_for, stream_entry
+from pylotlight.worker.dedup import DEDUP_STATS_KEY
+from pylotlight.scheduler import TASK_DEFS_KEY, TASK_LEASES_KEY, TASK_SCHEDULE_KEY, TASK_STATE_PREFIX, summarize_task
 
 from pylotlight.schemas.log_events import (
     LogEvent,
@@ -16,7 +35,20 @@ from pylotlight.schemas.log_events import (
     BatchLogIngestionResponse,
     LogRetrievalResponse,
     LogLevel,
-    GenericLogEvent,
+    StatsBucket,
+    StatsResponse,
+    StatusSnapshotResponse,
+    WorkerStats,
+    StreamStats,
+    WorkerStatsResponse,
+    SchedulerTask,
+    SchedulerTasksResponse,
+    DedupStatsResponse,
+    IngestSourceStats,
+    IngestStatsResponse,
+    NdjsonLineError,
+    NdjsonIngestionResponse,
+    validate_log_event_json,
 )
 
 router = APIRouter()
@@ -31,53 +63,214 @@ async def get_redis():
         redis = await aioredis.from_url("redis://redis:6379/0")
     return redis
 
+# Redis client for queueing ingested events, see get_ingest_redis
+ingest_redis = None
+
+def ingest_redis_client(url: str):
+    """
+    Client whose reads and connects time out after INGEST_REDIS_TIMEOUT_MS. A
+    timed-out call drops its connection, so a slow Redis makes ingest fall back
+    to the spill log without leaving unread replies on a pooled connection.
+    """
+    timeout = Config.INGEST_REDIS_TIMEOUT_MS / 1000
+    return aioredis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+async def get_ingest_redis():
+    # Separate from get_redis: the SSE subscription blocks on reads indefinitely
+    global ingest_redis
+    if ingest_redis is None:
+        ingest_redis = await ingest_redis_client("redis://redis:6379/0")
+    return ingest_redis
+
+# One Redis subscription per process, shared by every /sse connection
+broadcaster = SSEBroadcaster(
+    get_redis,
+    SSE_CHANNEL_PATTERN,
+    queue_size=Config.SSE_CLIENT_QUEUE_SIZE,
+    overflow_policy=Config.SSE_OVERFLOW_POLICY,
+    max_coalesce=Config.SSE_MAX_COALESCE,
+    replay_size=Config.SSE_REPLAY_BUFFER_SIZE,
+)
+
+# Per-source rate limits and the queue high-watermark, shared with the other API replicas through Redis
+admission = AdmissionController(
+    get_ingest_redis,
+    all_stream_keys(),
+    Config.INGEST_RATE_LIMIT,
+    Config.INGEST_RATE_BURST,
+    source_limits=Config.INGEST_SOURCE_RATE_LIMITS,
+    high_watermark=Config.INGEST_QUEUE_HIGH_WATERMARK,
+    queue_retry_after=Config.INGEST_QUEUE_RETRY_AFTER,
+)
+
+# Local disk buffer for events Redis couldn't take, opened with start_spill() when the app starts
+spill: Optional[SpillLog] = None
+spill_drainer: Optional[SpillDrainer] = None
+
+def _spilling() -> bool:
+    return spill is not None and spill.pending
+
+def _rejection_message(decision: AdmissionDecision) -> str:
+    if decision.reason == 'queue_full':
+        return "Log queue is full, retry later"
+    return f"Rate limit exceeded for source {decision.source}"
+
+async def _admit(counts: Dict[str, int]):
+    """Raises a 429 with Retry-After unless admission control lets counts (events per source) in."""
+    if _spilling():
+        # Redis is failing; the spill's disk cap bounds ingest until it recovers
+        return
+    decision = await admission.admit(counts)
+    if not decision.admitted:
+        raise HTTPException(status_code=429, detail=_rejection_message(decision),
+                            headers={"Retry-After": retry_after_header(decision.retry_after)})
+
+def _process_log_event(log_event: LogEvent, warnings: List[str]):
+    """Run a parsed log event through its source handler, keeping the dispatched model."""
+    try:
+        source_handler = get_source_handler(log_event.source)
+        return source_handler.validate_and_process(log_event)
+    except ValueError as ve:
+        # Events without a dedicated handler were already validated as GenericLogEvent
+        warnings.append(str(ve))
+        return log_event
+
+async def _queue_events(payloads: List[Tuple[LogEvent, str, bytes]]) -> List[str]:
+    """
+    Appends (event, stream, JSON payload) triples to their streams and publishes
+    them, returning the entry ids. The entries are marked as validated and
+    published, so the worker stores them as they are.
+    """
+    redis_client = await get_ingest_redis()
+    messages = group_by_channel((event, payload) for event, _, payload in payloads)
+    # One round trip: every stream append plus one fan-out message per SSE channel in the batch
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for event, stream, payload in payloads:
+            pipe.xadd(stream, stream_entry(payload, event, published=True))
+        for channel, message in messages.items():
+            pipe.publish(channel, message)
+        results = await pipe.execute()
+    return [entry_id.decode() if isinstance(entry_id, bytes) else str(entry_id)
+            for entry_id in results[:len(payloads)]]
+
+async def _deliver(payloads: List[Tuple[LogEvent, str, bytes]]) -> Optional[List[str]]:
+    """
+    Queues payloads like _queue_events, or appends them to the spill log and
+    returns None when Redis fails or takes longer than INGEST_REDIS_TIMEOUT_MS.
+    While the spill holds events, new ones are spilled behind them to keep their
+    order. A push that timed out may still have reached Redis; the workers'
+    deduplication drops the copy re-queued from the spill.
+    """
+    if spill is None:
+        return await _queue_events(payloads)
+    if not spill.pending:
+        try:
+            return await _queue_events(payloads)
+        except Exception as e:
+            logger.warning(f"Failed to queue {len(payloads)} events ({type(e).__name__}: {str(e)}), "
+                           f"spilling them to disk")
+    spill.append([payload for _, _, payload in payloads])
+    spill_drainer.wake()
+    return None
+
+async def _requeue_spilled(payloads: List[bytes]):
+    events = []
+    for payload in payloads:
+        try:
+            log_event = validate_log_event_json(payload)
+        except (ValidationError, ValueError) as e:
+            logger.error(f"Dropping unreadable spilled event: {str(e)}")
+            continue
+        events.append((log_event, stream_key_for(log_event.source, log_event.source_type), payload))
+    if events:
+        await _queue_events(events)
+
+def start_spill():
+    """
+    Opens the spill log and starts re-queueing what it holds, unless SPILL_DIR
+    is empty. Raises SpillLocked if another process holds SPILL_DIR.
+    """
+    global spill, spill_drainer
+    if not Config.SPILL_DIR or spill is not None:
+        return
+    try:
+        spill = SpillLog(Config.SPILL_DIR, Config.SPILL_SEGMENT_BYTES, Config.SPILL_MAX_BYTES, Config.SPILL_FSYNC)
+    except OSError as e:
+        logger.error(f"Cannot open the spill log in {Config.SPILL_DIR}, ingest fails while Redis does: {str(e)}")
+        return
+    spill_drainer = SpillDrainer(spill, _requeue_spilled, batch_size=Config.SPILL_DRAIN_BATCH)
+    spill_drainer.start()
+
+async def stop_spill():
+    global spill, spill_drainer
+    if spill is not None:
+        await spill_drainer.stop()
+        spill.close()
+        spill, spill_drainer = None, None
+
 @router.post("/ingest", response_model=LogIngestionResponse)
 async def ingest_log(request: LogIngestionRequest):
     warnings = []
+    await _admit({request.log_event.source: 1})
     try:
-        log_event_dict = request.log_event.model_dump()
-        source = log_event_dict.get("source")
+        log_event = _process_log_event(request.log_event, warnings)
+
+        stream = stream_key_for(log_event.source, log_event.source_type)
+        event_ids = await _deliver([(log_event, stream, log_event.model_dump_json().encode("utf-8"))])
+        if event_ids is None:
+            return LogIngestionResponse(
+                success=True,
+                message="Log spilled to disk, it will be queued once Redis is available",
+                warnings=warnings,
+            )
 
-        try:
-            source_handler = get_source_handler(source)
-            log_event = source_handler.validate_and_process(log_event_dict)
-        except ValueError as ve:
-            warnings.append(str(ve))
-            log_event = GenericLogEvent(**log_event_dict)
-
-        log_json = log_event.model_dump_json()
-        redis_client = await get_redis()
-        event_id = await redis_client.lpush("log_queue", log_json)
-        
-        # Publish to SSE channel
-        await redis_client.publish('sse_channel', log_json)
-        
         return LogIngestionResponse(
             success=True,
-            message="Log pushed to queue and published to SSE channel",
-            event_id=str(event_id),
+            message="Log pushed to stream and published to SSE channel",
+            event_id=event_ids[0],
             warnings=warnings,
         )
+    except SpillFull as e:
+        raise HTTPException(status_code=503, detail=f"Failed to ingest log: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to ingest log: {str(e)}")
 
+def _line_error(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" if error['loc'] else error['msg']
+                         for error in e.errors()[:3])[:500]
+    return str(e)[:500]
+
 @router.post("/ingest/batch", response_model=BatchLogIngestionResponse)
 async def ingest_log_batch(request: BatchLogIngestionRequest):
+    await _admit(Counter(log_event.source for log_event in request.log_events))
     event_ids = []
     failed_events = []
-    redis_client = await get_redis()
+    payloads = []
 
+    # Validate and serialize the whole batch before touching Redis
     for index, log_event in enumerate(request.log_events):
         try:
-            log_json = log_event.model_dump_json()
-            event_id = await redis_client.lpush("log_queue", log_json)
-            await redis_client.publish('sse_channel', log_json)
-            event_ids.append(str(event_id))
-        except Exception:
+            processed_event = _process_log_event(log_event, [])
+            stream = stream_key_for(processed_event.source, processed_event.source_type)
+            payloads.append((processed_event, stream, processed_event.model_dump_json().encode("utf-8")))
+        except Exception as e:
+            logger.warning(f"Failed to process event {index} in batch: {str(e)}")
             failed_events.append(index)
 
+    if payloads:
+        try:
+            event_ids = await _deliver(payloads)
+        except Exception as e:
+            logger.error(f"Failed to push batch to queue: {str(e)}")
+            failed_events = list(range(len(request.log_events)))
+            event_ids = []
+
     success = len(failed_events) == 0
     message = "All logs ingested successfully" if success else f"{len(failed_events)} logs failed to ingest"
+    if event_ids is None:
+        message += ", spilled to disk until Redis is available"
+        event_ids = []
 
     return BatchLogIngestionResponse(
         success=success,
@@ -86,65 +279,242 @@ async def ingest_log_batch(request: BatchLogIngestionRequest):
         failed_events=failed_events,
     )
 
+@router.post("/ingest/ndjson", response_model=NdjsonIngestionResponse)
+async def ingest_ndjson(request: Request):
+    """
+    Ingests newline-delimited JSON log events, optionally gzip, deflate or zstd
+    compressed. The body is parsed and validated as it streams in and queued in
+    chunks of INGEST_CHUNK_SIZE events, so memory stays flat however large it is.
+    """
+    response = NdjsonIngestionResponse(success=True, message="")
+    payloads = []
+    last_line = 0
+
+    def fail(line_number: int, offset: int, error: str):
+        response.failed += 1
+        if len(response.errors) < Config.INGEST_MAX_ERRORS:
+            response.errors.append(NdjsonLineError(line=line_number, offset=offset, error=error))
+
+    async def flush():
+        if payloads:
+            counts = Counter(log_event.source for log_event, _, _ in payloads)
+            # Rate limits slow the upload down, up to INGEST_ADMISSION_MAX_WAIT per chunk, instead of failing it
+            decision = AdmissionDecision(True) if _spilling() else await admission.admit(counts)
+            waited = 0.0
+            while (not decision.admitted and decision.reason == 'rate_limited'
+                   and waited + decision.retry_after <= Config.INGEST_ADMISSION_MAX_WAIT):
+                await asyncio.sleep(decision.retry_after)
+                waited += decision.retry_after
+                decision = await admission.admit(counts)
+            if not decision.admitted:
+                raise AdmissionRejected(decision)
+            await _deliver(payloads)
+            response.accepted += len(payloads)
+            payloads.clear()
+        response.committed_lines = last_line
+
+    try:
+        async for line_number, offset, line in iter_lines(request.stream(), Config.INGEST_MAX_LINE_BYTES):
+            if line is None:
+                fail(line_number, offset, f"Line is longer than {Config.INGEST_MAX_LINE_BYTES} bytes")
+            else:
+                try:
+                    log_event = _process_log_event(validate_log_event_json(line), [])
+                    stream = stream_key_for(log_event.source, log_event.source_type)
+                    payloads.append((log_event, stream, log_event.model_dump_json().encode("utf-8")))
+                except (ValidationError, ValueError) as e:
+                    fail(line_number, offset, _line_error(e))
+            last_line = line_number
+            if len(payloads) >= Config.INGEST_CHUNK_SIZE:
+                await flush()
+        await flush()
+    except ClientDisconnect:
+        logger.warning(f"Client disconnected during NDJSON ingestion after {response.committed_lines} lines")
+        raise
+    except AdmissionRejected as e:
+        response.success = False
+        response.message = (f"{_rejection_message(e.decision)} after line {response.committed_lines}. "
+                            f"Resend the lines after it")
+        return JSONResponse(status_code=429, content=response.model_dump(),
+                            headers={"Retry-After": retry_after_header(e.decision.retry_after)})
+    except Exception as e:
+        logger.error(f"Failed to push NDJSON chunk to queue: {str(e)}")
+        response.success = False
+        response.message = (f"Failed to queue events after line {response.committed_lines}: {str(e)}. "
+                            f"Resend the lines after it")
+        return JSONResponse(status_code=503, content=response.model_dump())
+
+    response.success = response.failed == 0
+    response.message = (f"All {response.accepted} logs ingested successfully" if response.success
+                        else f"{response.failed} lines failed to ingest, {response.accepted} ingested")
+    return response
+
 @router.get("/logs", response_model=LogRetrievalResponse)
-async def retrieve_logs(
+def retrieve_logs(
     source: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     log_level: Optional[LogLevel] = None,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    level = log_level.value if log_level else None
+    try:
+        rows, next_cursor = query_logs(db, source, start_date, end_date, level, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    total_count = count_logs(db, source, start_date, end_date, level) if include_total else None
+    return LogRetrievalResponse(
+        logs=[row_to_event(row) for row in rows],
+        total_count=total_count,
+        has_more=next_cursor is not None,
+        next_cursor=next_cursor,
+    )
+
+@router.get("/stats", response_model=StatsResponse)
+def retrieve_stats(
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    source: Optional[str] = None,
+    source_type: Optional[str] = None,
+    status_type: Optional[str] = None,
+    log_level: Optional[LogLevel] = None,
+    db: Session = Depends(get_db),
 ):
-    # In a real-world scenario, you would query the database here
-    # For this example, we'll just return dummy data
-    dummy_log = GenericLogEvent(
-        timestamp=datetime.now(),
-        source="airflow_health_check",
-        status_type="normal",
-        log_level="INFO",
-        message="This is a dummy log message",
-        additional_data={
-            "metadatabase_status": "healthy",
-            "scheduler_status": "healthy",
-            "triggerer_status": "healthy"
-        }
+    end_date = end_date or datetime.utcnow()
+    start_date = start_date or end_date - timedelta(days=1)
+    rows = query_rollups(db, bucket, start_date, end_date, source, source_type, status_type,
+                         log_level.value if log_level else None)
+    return StatsResponse(
+        bucket_size=bucket,
+        start_date=start_date,
+        end_date=end_date,
+        buckets=[StatsBucket(**row._mapping) for row in rows],
+    )
+
+@router.get("/status", response_model=StatusSnapshotResponse)
+async def retrieve_status():
+    redis_client = await get_redis()
+    snapshot = await redis_client.hgetall(STATUS_KEY)
+    statuses = {}
+    for field, payload in snapshot.items():
+        service, component = field.decode().split(":", 1)
+        statuses.setdefault(service, {})[component] = json.loads(payload)
+    return StatusSnapshotResponse(statuses=statuses)
+
+@router.get("/workers/stats", response_model=WorkerStatsResponse)
+async def worker_stats():
+    redis_client = await get_redis()
+    consumers = []
+    async for key in redis_client.scan_iter(match="worker_stats:*"):
+        stats = await redis_client.hgetall(key)
+        if stats:
+            consumers.append(WorkerStats(**{k.decode(): v.decode() for k, v in stats.items()}))
+
+    streams = all_stream_keys()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for stream in streams:
+            pipe.xlen(stream)
+        lengths = await pipe.execute()
+
+    return WorkerStatsResponse(
+        consumers=sorted(consumers, key=lambda c: c.consumer),
+        streams=[StreamStats(stream=stream, length=length) for stream, length in zip(streams, lengths)],
+    )
+
+@router.get("/ingest/stats", response_model=IngestStatsResponse)
+async def ingest_stats():
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for stream in all_stream_keys():
+            pipe.xlen(stream)
+        pipe.hgetall(REJECTIONS_KEY)
+        results = await pipe.execute()
+
+    rejections: Dict[str, Dict[str, int]] = {}
+    for field, value in results[-1].items():
+        # "{source}:{reason}:{unit}", sources may themselves contain ':'
+        source, reason, unit = field.decode().rsplit(":", 2)
+        rejections.setdefault(source, {})[f"{reason}_{unit}"] = int(value)
+    sources = []
+    for source in sorted(set(rejections) | set(Config.INGEST_SOURCE_RATE_LIMITS)):
+        rate, burst = admission.limits(source)
+        sources.append(IngestSourceStats(source=source, rate_limit=rate, burst=burst, **rejections.get(source, {})))
+
+    return IngestStatsResponse(
+        queue_depth=sum(results[:-1]),
+        queue_high_watermark=Config.INGEST_QUEUE_HIGH_WATERMARK,
+        sources=sources,
+    )
+
+@router.get("/dedup/stats", response_model=DedupStatsResponse)
+async def dedup_stats():
+    redis_client = await get_redis()
+    stats = {k.decode(): v.decode() for k, v in (await redis_client.hgetall(DEDUP_STATS_KEY)).items()}
+    hits, misses = int(stats.get('hits', 0)), int(stats.get('misses', 0))
+    return DedupStatsResponse(
+        backend=stats.get('backend'),
+        mode=stats.get('mode'),
+        hits=hits,
+        misses=misses,
+        hit_ratio=hits / (hits + misses) if hits + misses else 0.0,
+        hits_by_source={field[len('hits:'):]: int(value) for field, value in stats.items() if field.startswith('hits:')},
     )
 
-    logs = [dummy_log] * min(limit, 10)  # Return at most 10 dummy logs
-    total_count = 100  # Dummy total count
-    has_more = (offset + limit) < total_count
+@router.get("/scheduler/tasks", response_model=SchedulerTasksResponse)
+async def scheduler_tasks():
+    redis_client = await get_redis()
+    definitions = await redis_client.hgetall(TASK_DEFS_KEY)
+    task_ids = sorted(task_id.decode() for task_id in definitions)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            pipe.zscore(TASK_SCHEDULE_KEY, task_id)
+            pipe.hget(TASK_LEASES_KEY, task_id)
+            pipe.hgetall(f"{TASK_STATE_PREFIX}{task_id}")
+        results = await pipe.execute()
 
-    return LogRetrievalResponse(logs=logs, total_count=total_count, has_more=has_more)
+    now = time.time()
+    tasks = []
+    for index, task_id in enumerate(task_ids):
+        next_run, lease, state = results[index * 3:index * 3 + 3]
+        tasks.append(SchedulerTask(**summarize_task(task_id, definitions[task_id.encode()], next_run, lease, state, now)))
+    return SchedulerTasksResponse(tasks=tasks)
 
 @router.get('/sse')
-async def sse(request: Request):
-    async def event_generator():
-        redis_client = await get_redis()
-        pubsub = redis_client.pubsub()
-        await pubsub.subscribe('sse_channel')
-        logger.info("Subscribed to sse_channel")
+async def sse(
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    source: Optional[List[str]] = Query(None),
+    source_type: Optional[List[str]] = Query(None),
+    min_log_level: Optional[LogLevel] = None,
+    status_type: Optional[List[str]] = Query(None),
+):
+    subscription_filter = SSEFilter(source, source_type, min_log_level.value if min_log_level else None, status_type)
+    client = broadcaster.subscribe(last_event_id, subscription_filter)
 
+    async def event_generator():
         try:
-            while True:
-                # Wait for a message to be received
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
-                if message is not None:
-                    logger.info(f"Received message: {message}")
-                    if message['type'] == 'message':
-                        try:
-                            data = message['data'].decode('utf-8')
-                            logger.info(f"Sending SSE event: {data}")
-                            yield {
-                                "event": "update",
-                                "data": data
-                            }
-                        except Exception as decode_error:
-                            logger.error(f"Failed to decode message: {decode_error}")
-                await asyncio.sleep(5)
+            async for sequence, frame in client.frames(broadcaster.max_coalesce):
+                if frame is None:
+                    # The missed events are no longer buffered; the client should reload /status
+                    yield {
+                        "id": broadcaster.event_id(sequence),
+                        "event": "reset",
+                        "data": ""
+                    }
+                    continue
+                yield {
+                    "id": broadcaster.event_id(sequence),
+                    "event": "update",
+                    "data": frame.decode('utf-8')
+                }
         except Exception as e:
             logger.error(f"Error in SSE event generator: {str(e)}")
         finally:
-            await pubsub.unsubscribe('sse_channel')
-            logger.info("Unsubscribed from sse_channel")
+            broadcaster.unsubscribe(client)
 
-    return EventSourceResponse(event_generator())
\ No newline at end of file
+    return EventSourceResponse(event_generator())
@@ -0,0 +1,205 @@
+"""
+Local disk spill log for ingested events that could not be queued in Redis.
+
+Events are appended to numbered segment files as length-prefixed, checksummed
+records. A drainer task re-queues them in order once Redis is back, keeping
+its read position in a checkpoint file and deleting segments it has finished.
+While the spill holds events, new events are spilled behind them rather than
+overtaking them.
+"""
+import os
+import json
+import zlib
+import fcntl
+import struct
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, IO, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Payload length and crc32
+RECORD_HEADER = struct.Struct('>II')
+SEGMENT_SUFFIX = '.spill'
+CHECKPOINT_FILE = 'checkpoint.json'
+LOCK_FILE = 'spill.lock'
+
+# (segment number, byte offset)
+Position = Tuple[int, int]
+
+class SpillFull(Exception):
+    pass
+
+class SpillLocked(RuntimeError):
+    pass
+
+class SpillLog:
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, max_bytes: int = 1024 * 1024 * 1024,
+                 fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        # Segment numbers and the checkpoint assume a single writer
+        self._lock = open(os.path.join(directory, LOCK_FILE), 'a')
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock.close()
+            raise SpillLocked(f"Spill log in {directory} is in use by another process, "
+                              f"give each API process its own SPILL_DIR")
+        self._sizes: Dict[int, int] = {}
+        for name in os.listdir(directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                segment = int(name[:-len(SEGMENT_SUFFIX)])
+                self._sizes[segment] = os.path.getsize(self._path(segment))
+        self._position = self._load_checkpoint()
+        # Always write to a new segment, in case the last one ends with a torn record
+        self._segment = max(self._sizes, default=0) + 1
+        self._sizes[self._segment] = 0
+        self._writer: IO[bytes] = open(self._path(self._segment), 'ab')
+        if self.pending:
+            logger.warning(f"Spill log holds {self.size_bytes} bytes of events from a previous run")
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _load_checkpoint(self) -> Position:
+        first = min(self._sizes, default=1)
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE)) as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return first, 0
+        if checkpoint['segment'] not in self._sizes:
+            return first, 0
+        return checkpoint['segment'], checkpoint['offset']
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({'segment': self._position[0], 'offset': self._position[1]}, f)
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @property
+    def pending(self) -> bool:
+        segment, offset = self._position
+        return segment < self._segment or offset < self._sizes[self._segment]
+
+    def _roll(self):
+        self._writer.close()
+        self._segment += 1
+        self._sizes[self._segment] = 0
+        self._writer = open(self._path(self._segment), 'ab')
+
+    def append(self, payloads: List[bytes]):
+        """Appends events; raises SpillFull if they would take the spill past max_bytes."""
+        records = b''.join(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload for payload in payloads)
+        if self.size_bytes + len(records) > self.max_bytes:
+            raise SpillFull(f"Spill log is full ({self.size_bytes} bytes)")
+        if self._sizes[self._segment] and self._sizes[self._segment] + len(records) > self.segment_bytes:
+            self._roll()
+        self._writer.write(records)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._sizes[self._segment] += len(records)
+
+    def read_batch(self, max_records: int) -> Tuple[List[bytes], Position]:
+        """Reads up to max_records events from the read position, and the position just past them."""
+        payloads: List[bytes] = []
+        segment, offset = self._position
+        while len(payloads) < max_records and segment <= self._segment:
+            end = self._sizes.get(segment, 0)
+            if offset >= end:
+                if segment == self._segment:
+                    break
+                segment, offset = segment + 1, 0
+                continue
+            with open(self._path(segment), 'rb') as f:
+                f.seek(offset)
+                while len(payloads) < max_records and offset < end:
+                    header = f.read(RECORD_HEADER.size)
+                    length, crc = RECORD_HEADER.unpack(header) if len(header) == RECORD_HEADER.size else (end, None)
+                    payload = f.read(length) if offset + RECORD_HEADER.size + length <= end else b''
+                    if crc is None or len(payload) != length or zlib.crc32(payload) != crc:
+                        logger.error(f"Skipping the corrupt end of spill segment {segment} at offset {offset}")
+                        offset = end
+                        break
+                    payloads.append(payload)
+                    offset += RECORD_HEADER.size + length
+        return payloads, (segment, offset)
+
+    def commit(self, position: Position):
+        """Marks everything before position as queued and deletes the segments that are done."""
+        self._position = position
+        for segment in [segment for segment in self._sizes if segment < position[0]]:
+            os.remove(self._path(segment))
+            del self._sizes[segment]
+        if not self.pending and self._sizes[self._segment]:
+            # Fully drained: start over on an empty segment to free the disk
+            old = self._segment
+            self._roll()
+            os.remove(self._path(old))
+            del self._sizes[old]
+            self._position = (self._segment, 0)
+        self._save_checkpoint()
+
+    def close(self):
+        self._writer.close()
+        self._lock.close()
+
+class SpillDrainer:
+    """Background task re-queueing spilled events in order, backing off while the queue is unavailable."""
+
+    def __init__(self, spill: SpillLog, deliver: Callable[[List[bytes]], Awaitable[None]], batch_size: int = 500,
+                 max_backoff: float = 30):
+        self.spill = spill
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            if not self.spill.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            payloads, position = self.spill.read_batch(self.batch_size)
+            try:
+                if payloads:
+                    await self.deliver(payloads)
+            except Exception as e:
+                logger.warning(f"Failed to re-queue {len(payloads)} spilled events ({type(e).__name__}: {str(e)}), "
+                               f"retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+            backoff = 1.0
+            self.spill.commit(position)
+            if payloads and not self.spill.pending:
+                logger.info("Drained the spill log")
@@ -1,31 +1,190 @@
 import os
-from typing import Dict, Any
+import json
+import socket
+from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+def _parse_rate_limits(value: str, default_burst: int) -> Dict[str, Tuple[float, int]]:
+    """Parses "source=rate[:burst],..." into {source: (rate, burst)}."""
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        source, _, limit = item.partition('=')
+        rate, _, burst = limit.partition(':')
+        limits[source.strip()] = (float(rate), int(burst) if burst.strip() else default_burst)
+    return limits
+
 class Config:
     REDIS_HOST = os.getenv('REDIS_HOST', 'redis')
     REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
     API_URL = os.getenv('API_URL', 'http://fastapi:8000')
+
+    # Log events are queued on a Redis Stream and shared by the workers in a consumer group
+    LOG_STREAM_KEY = os.getenv('LOG_STREAM_KEY', 'log_stream')
+    LOG_STREAM_GROUP = os.getenv('LOG_STREAM_GROUP', 'log_workers')
+    LOG_STREAM_SHARDS = int(os.getenv('LOG_STREAM_SHARDS', 1))
+    WORKER_CONSUMER_NAME = os.getenv('WORKER_CONSUMER_NAME', socket.gethostname())
+    # Pending entries idle for longer than this are reclaimed from dead consumers
+    WORKER_CLAIM_IDLE_MS = int(os.getenv('WORKER_CLAIM_IDLE_MS', 60000))
+    # Entries delivered more than this many times are moved to the dead-letter stream (0 retries forever)
+    WORKER_MAX_DELIVERIES = int(os.getenv('WORKER_MAX_DELIVERIES', 5))
+    LOG_STREAM_DEAD_LETTER_KEY = os.getenv('LOG_STREAM_DEAD_LETTER_KEY', 'log_stream_dead_letter')
+    # Number of consumer processes; shards are spread over them round-robin. Each
+    # shard has a single owner, so the pool is capped by LOG_STREAM_SHARDS (or WORKER_SHARDS)
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', 1))
+    # Comma-separated shards this worker replica owns (defaults to all of them).
+    # Give each replica a disjoint set to keep per-key ordering across replicas.
+    WORKER_SHARDS = [int(shard) for shard in os.getenv('WORKER_SHARDS', '').split(',') if shard.strip()]
+    WORKER_STATS_TTL = int(os.getenv('WORKER_STATS_TTL', 60))
+
+    # Log queue consumer batching: flush after this many events or this many milliseconds
+    WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', 500))
+    WORKER_BATCH_TIMEOUT_MS = int(os.getenv('WORKER_BATCH_TIMEOUT_MS', 200))
     
+    # SSE fan-out: each connected client gets a bounded queue of pending frames
+    SSE_CLIENT_QUEUE_SIZE = int(os.getenv('SSE_CLIENT_QUEUE_SIZE', 1000))
+    # 'drop_oldest' discards the oldest pending event of a slow client, 'disconnect' drops the client
+    SSE_OVERFLOW_POLICY = os.getenv('SSE_OVERFLOW_POLICY', 'drop_oldest')
+    # Most pending messages combined into a single SSE frame
+    SSE_MAX_COALESCE = int(os.getenv('SSE_MAX_COALESCE', 100))
+    # Messages kept per API process for clients resuming with Last-Event-ID
+    SSE_REPLAY_BUFFER_SIZE = int(os.getenv('SSE_REPLAY_BUFFER_SIZE', 10000))
+
+    # log_events is range-partitioned on timestamp; partitions span this many days
+    LOG_PARTITION_DAYS = int(os.getenv('LOG_PARTITION_DAYS', 1))
+    # How far ahead of today partitions are created
+    LOG_PARTITION_PREMAKE_DAYS = int(os.getenv('LOG_PARTITION_PREMAKE_DAYS', 3))
+    # Partitions entirely older than this are dropped; 0 keeps everything
+    LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 30))
+    PARTITION_MAINTENANCE_INTERVAL = int(os.getenv('PARTITION_MAINTENANCE_INTERVAL', 3600))
+
+    # How long hook events with a dedup_key are remembered, in seconds
+    HOOK_DEDUP_TTL = int(os.getenv('HOOK_DEDUP_TTL', 7 * 24 * 3600))
+
+    # The worker drops events whose fingerprint it stored within the last one to two windows
+    EVENT_DEDUP_ENABLED = os.getenv('EVENT_DEDUP_ENABLED', 'true').lower() == 'true'
+    # 'drop' discards duplicates, 'count' only counts them (to size the filter before enabling drops)
+    EVENT_DEDUP_MODE = os.getenv('EVENT_DEDUP_MODE', 'drop')
+    EVENT_DEDUP_WINDOW_SECONDS = int(os.getenv('EVENT_DEDUP_WINDOW_SECONDS', 3600))
+    # Bloom filter size per window; past capacity the false-positive rate goes up
+    EVENT_DEDUP_CAPACITY = int(os.getenv('EVENT_DEDUP_CAPACITY', 1000000))
+    EVENT_DEDUP_ERROR_RATE = float(os.getenv('EVENT_DEDUP_ERROR_RATE', 0.0001))
+
+    # Hook tasks are scheduled on a Redis sorted set and claimed by workers with leases.
+    # A lease should outlast the slowest run, or the task may be claimed again while running;
+    # tasks whose timeout plus TASK_LEASE_MARGIN is longer are leased for that long instead.
+    TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', 300))
+    TASK_LEASE_MARGIN = int(os.getenv('TASK_LEASE_MARGIN', 30))
+    # With catch_up='all', at most this many missed runs are made up
+    TASK_MAX_CATCH_UP = int(os.getenv('TASK_MAX_CATCH_UP', 10))
+    TASK_CLAIM_BATCH = int(os.getenv('TASK_CLAIM_BATCH', 10))
+    TASK_OVERDUE_WARNING = float(os.getenv('TASK_OVERDUE_WARNING', 30))
+    SCHEDULER_POLL_INTERVAL = float(os.getenv('SCHEDULER_POLL_INTERVAL', 1.0))
+    # Hooks run concurrently on an asyncio loop (sync hooks on a thread pool of this size)
+    TASK_MAX_CONCURRENCY = int(os.getenv('TASK_MAX_CONCURRENCY', 8))
+    # Default wall-clock limit on one hook run, in seconds
+    TASK_TIMEOUT = float(os.getenv('TASK_TIMEOUT', 60))
+    # Concurrent runs per hook class; overrides as "AirflowHook=1,AsyncAirflowHook=4"
+    HOOK_CONCURRENCY = int(os.getenv('HOOK_CONCURRENCY', 2))
+    HOOK_CLASS_CONCURRENCY = {
+        name.strip(): int(limit)
+        for name, _, limit in (item.partition('=') for item in os.getenv('HOOK_CLASS_CONCURRENCY', '').split(',') if '=' in item)
+    }
+
+    # Hooks only forward events whose state changed, plus a heartbeat of unchanged state this often (seconds)
+    HOOK_CHANGE_DETECTION = os.getenv('HOOK_CHANGE_DETECTION', 'true').lower() == 'true'
+    HOOK_HEARTBEAT_INTERVAL = int(os.getenv('HOOK_HEARTBEAT_INTERVAL', 3600))
+
     # Hook configurations
     HOOKS: Dict[str, Dict[str, Any]] = {
         'airflow': {
             'enabled': os.getenv('AIRFLOW_ENABLED', 'true').lower() == 'true',
             'polling_interval': int(os.getenv('AIRFLOW_POLLING_INTERVAL', 300)),
+            'polling_jitter': float(os.getenv('AIRFLOW_POLLING_JITTER', 5)),
+            # 'latest' runs once after missed polls, 'all' makes up every missed poll
+            'catch_up': os.getenv('AIRFLOW_CATCH_UP', 'latest'),
+            'timeout': float(os.getenv('AIRFLOW_TASK_TIMEOUT', 60)),
             'base_url': os.getenv('AIRFLOW_BASE_URL', 'http://airflow-webserver:8080/api/v1'),
             'api_user': os.getenv('AIRFLOW_API_USER','airflow'),
             'api_password': os.getenv('AIRFLOW_API_PASSWORD','airflow'),
+            # Fetch the Airflow endpoints concurrently over a pooled aiohttp session
+            'async': os.getenv('AIRFLOW_ASYNC', 'true').lower() == 'true',
+            'max_concurrency': int(os.getenv('AIRFLOW_MAX_CONCURRENCY', 4)),
+            'request_timeout': int(os.getenv('AIRFLOW_REQUEST_TIMEOUT', 10)),
+            # Failed DAG runs are fetched incrementally; the first poll looks back this far
+            'initial_lookback_hours': int(os.getenv('AIRFLOW_INITIAL_LOOKBACK_HOURS', 24)),
+        },
+        'dbt': {
+            'enabled': os.getenv('DBT_ENABLED', 'false').lower() == 'true',
+            'polling_interval': int(os.getenv('DBT_POLLING_INTERVAL', 60)),
+            'polling_jitter': float(os.getenv('DBT_POLLING_JITTER', 0)),
+            # dbt target directory holding run_results.json and manifest.json
+            'target_dir': os.getenv('DBT_TARGET_DIR', '/dbt/target'),
+            'timeout': float(os.getenv('DBT_TASK_TIMEOUT', 300)),
         },
         # Add other hooks here as needed
     }
 
+    # Several instances of a hook, as a JSON list of parameters overriding its config above, e.g.
+    # AIRFLOW_INSTANCES='[{"instance_id": "airflow_staging", "base_url": "...", "api_password_env": "STAGING_PASSWORD"}]'
+    HOOK_INSTANCES: Dict[str, List[Dict[str, Any]]] = {
+        'airflow': json.loads(os.getenv('AIRFLOW_INSTANCES', '[]')),
+        'dbt': json.loads(os.getenv('DBT_INSTANCES', '[]')),
+    }
+
+    # Log file agent: tails files given as "source=glob" pairs, e.g. "dbt=/dbt/logs/dbt.log,airflow=/airflow/logs/**/*.log"
+    AGENT_FILES = [
+        (source.strip(), pattern.strip())
+        for source, _, pattern in (item.partition('=') for item in os.getenv('AGENT_FILES', '').split(',') if '=' in item)
+    ]
+    AGENT_CHECKPOINT_PATH = os.getenv('AGENT_CHECKPOINT_PATH', '/var/lib/pylotlight/agent_checkpoints.json')
+    # Batches are sent when they reach either size, or after AGENT_FLUSH_INTERVAL seconds
+    AGENT_BATCH_SIZE = int(os.getenv('AGENT_BATCH_SIZE', 1000))
+    AGENT_BATCH_BYTES = int(os.getenv('AGENT_BATCH_BYTES', 1000000))
+    AGENT_FLUSH_INTERVAL = float(os.getenv('AGENT_FLUSH_INTERVAL', 1.0))
+    AGENT_POLL_INTERVAL = float(os.getenv('AGENT_POLL_INTERVAL', 0.25))
+    # 'end' skips what files found at first startup already hold, 'start' ingests it
+    AGENT_START_AT = os.getenv('AGENT_START_AT', 'end')
+    AGENT_COMPRESS = os.getenv('AGENT_COMPRESS', 'true').lower() == 'true'
+    # Largest request body the API accepts, after decompression (/ingest/ndjson streams and has no limit)
+    INGEST_MAX_BODY_BYTES = int(os.getenv('INGEST_MAX_BODY_BYTES', 64 * 1024 * 1024))
+    # Ingest admission: a token bucket per source, in events per second (0 disables), shared by the API replicas
+    INGEST_RATE_LIMIT = float(os.getenv('INGEST_RATE_LIMIT', 1000))
+    INGEST_RATE_BURST = int(os.getenv('INGEST_RATE_BURST', 10000))
+    # Per-source overrides as "airflow=200,dbt=500:2000" (events per second[:burst])
+    INGEST_SOURCE_RATE_LIMITS = _parse_rate_limits(os.getenv('INGEST_SOURCE_RATE_LIMITS', ''), INGEST_RATE_BURST)
+    # Ingest is refused while the log streams hold this many queued or pending entries (0 disables)
+    INGEST_QUEUE_HIGH_WATERMARK = int(os.getenv('INGEST_QUEUE_HIGH_WATERMARK', 1000000))
+    INGEST_QUEUE_RETRY_AFTER = float(os.getenv('INGEST_QUEUE_RETRY_AFTER', 5))
+    # /ingest/ndjson waits out rate limits up to this long per chunk before answering 429
+    INGEST_ADMISSION_MAX_WAIT = float(os.getenv('INGEST_ADMISSION_MAX_WAIT', 10))
+    # /ingest/ndjson queues events in chunks of this many, and reports at most INGEST_MAX_ERRORS failed lines
+    INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 500))
+    INGEST_MAX_LINE_BYTES = int(os.getenv('INGEST_MAX_LINE_BYTES', 1024 * 1024))
+    INGEST_MAX_ERRORS = int(os.getenv('INGEST_MAX_ERRORS', 100))
+    # Events are spilled to local disk when queueing them in Redis fails or takes longer than this
+    INGEST_REDIS_TIMEOUT_MS = int(os.getenv('INGEST_REDIS_TIMEOUT_MS', 250))
+    # Spill log of the API process; events beyond SPILL_MAX_BYTES are refused with a 503 (empty disables spilling)
+    SPILL_DIR = os.getenv('SPILL_DIR', '/var/lib/pylotlight/spill')
+    SPILL_SEGMENT_BYTES = int(os.getenv('SPILL_SEGMENT_BYTES', 64 * 1024 * 1024))
+    SPILL_MAX_BYTES = int(os.getenv('SPILL_MAX_BYTES', 1024 * 1024 * 1024))
+    SPILL_FSYNC = os.getenv('SPILL_FSYNC', 'false').lower() == 'true'
+    # Spilled events are re-queued in batches of this many once Redis is back
+    SPILL_DRAIN_BATCH = int(os.getenv('SPILL_DRAIN_BATCH', 500))
+
     @classmethod
     def get_hook_config(cls, hook_name: str) -> Dict[str, Any]:
         return cls.HOOKS.get(hook_name, {})
 
+    @classmethod
+    def get_hook_instances(cls, hook_name: str) -> List[Dict[str, Any]]:
+        """Parameters of each configured instance of a hook; a single default instance unless overridden."""
+        return cls.HOOK_INSTANCES.get(hook_name) or [{}]
+
 # Example usage:
 # config = Config()
 # airflow_config = config.get_hook_config('airflow')
\ No newline at end of file
@@ -1,14 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
 from pylotlight.database.session import Base
 
 class LogEvent(Base):
     __tablename__ = "log_events"
 
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, index=True)
+    # Postgres requires the partition key (timestamp) to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    timestamp = Column(DateTime, primary_key=True)
     source = Column(String, index=True)
     source_type = Column(String, index=True)
     log_level = Column(String, index=True)
     message = Column(String)
     status_type = Column(String)
     additional_data = Column(JSON)
+
+    # Keyset pagination on GET /logs walks (timestamp, id), optionally within one source or log level
+    __table_args__ = (
+        Index("ix_log_events_timestamp_id", "timestamp", "id"),
+        Index("ix_log_events_source_timestamp_id", "source", "timestamp", "id"),
+        Index("ix_log_events_log_level_timestamp_id", "log_level", "timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
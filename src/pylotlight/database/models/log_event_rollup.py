@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, BigInteger
+from pylotlight.database.session import Base
+
+class LogEventRollup(Base):
+    """Per-minute event counts, maintained by the worker as it stores events."""
+    __tablename__ = "log_event_rollups"
+
+    bucket = Column(DateTime, primary_key=True)
+    source = Column(String, primary_key=True)
+    source_type = Column(String, primary_key=True)
+    status_type = Column(String, primary_key=True)
+    log_level = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,111 @@
+"""
+Maintenance for the range-partitioned log_events table.
+
+Partitions cover fixed windows of LOG_PARTITION_DAYS days aligned on the Unix
+epoch, and are named after the day they start on (log_events_p20240827).
+Rows that fall outside every partition land in log_events_default, and are
+moved into their partition when it gets created.
+"""
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "log_events"
+DEFAULT_PARTITION = "log_events_default"
+EPOCH = datetime(1970, 1, 1)
+# Key for the advisory lock that keeps worker replicas from maintaining partitions concurrently
+MAINTENANCE_LOCK_ID = 7301981
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def partition_start(moment: datetime, interval_days: int) -> datetime:
+    days = (moment.replace(tzinfo=None) - EPOCH).days
+    return EPOCH + timedelta(days=days - days % interval_days)
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT_TABLE}_p{start:%Y%m%d}"
+
+def list_partitions(conn: Connection) -> List[Tuple[str, datetime, datetime]]:
+    """Returns (name, start, end) for every range partition of log_events."""
+    rows = conn.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE}).fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_PATTERN.search(bound or "")
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def ensure_default_partition(conn: Connection):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+
+def create_partition(conn: Connection, start: datetime, end: datetime):
+    name = partition_name(start)
+    bounds = {"start": start, "end": end}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    # Attaching fails while the default partition still holds rows for this range
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+    ))
+    logger.info(f"Created partition {name} for [{start}, {end})")
+
+def ensure_partitions(conn: Connection, start: datetime, end: datetime, interval_days: int) -> List[str]:
+    """Creates any missing partitions needed to cover [start, end)."""
+    ensure_default_partition(conn)
+    existing = {name for name, _, _ in list_partitions(conn)}
+    created = []
+    window_start = partition_start(start, interval_days)
+    while window_start < end.replace(tzinfo=None):
+        window_end = window_start + timedelta(days=interval_days)
+        if partition_name(window_start) not in existing:
+            create_partition(conn, window_start, window_end)
+            created.append(partition_name(window_start))
+        window_start = window_end
+    return created
+
+def drop_expired_partitions(conn: Connection, cutoff: datetime) -> List[str]:
+    """
+    Drops every partition that ends at or before cutoff. Dropping a partition
+    is a catalog operation, so retention costs the same however many rows expire.
+    """
+    cutoff = cutoff.replace(tzinfo=None)
+    dropped = []
+    for name, _, end in list_partitions(conn):
+        if end <= cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+            logger.info(f"Dropped expired partition {name}")
+    # Late stragglers older than every partition sit in the default partition
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff})
+    return dropped
+
+def maintain_partitions(conn: Connection, interval_days: int, premake_days: int, retention_days: int,
+                        now: Optional[datetime] = None) -> bool:
+    """
+    Creates upcoming partitions and drops expired ones. Returns False without
+    doing anything if another worker holds the maintenance lock.
+    """
+    if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": MAINTENANCE_LOCK_ID}).scalar():
+        return False
+    now = now or datetime.utcnow()
+    ensure_partitions(conn, now, now + timedelta(days=premake_days + 1), interval_days)
+    if retention_days > 0:
+        drop_expired_partitions(conn, now - timedelta(days=retention_days))
+    return True
@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+from pylotlight.database.models.log_event import LogEvent as DBLogEvent
+from pylotlight.database.models.log_event_rollup import LogEventRollup
+from pylotlight.schemas.log_events import LogEventBase, validate_log_event
+
+def encode_cursor(timestamp: datetime, event_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{event_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError if the cursor wasn't produced by encode_cursor."""
+    try:
+        timestamp, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def row_to_event(row: DBLogEvent) -> LogEventBase:
+    additional_data = row.additional_data or {}
+    if isinstance(additional_data, str):
+        # Rows written before additional_data was stored as a JSON object
+        additional_data = json.loads(additional_data)
+    return validate_log_event({
+        **additional_data,
+        "timestamp": row.timestamp,
+        "source": row.source,
+        "source_type": row.source_type,
+        "status_type": row.status_type,
+        "log_level": row.log_level,
+        "message": row.message,
+    })
+
+def _filters(source: Optional[str], start_date: Optional[datetime], end_date: Optional[datetime],
+             log_level: Optional[str]) -> List[Any]:
+    filters = []
+    if source:
+        filters.append(DBLogEvent.source == source)
+    if start_date:
+        filters.append(DBLogEvent.timestamp >= start_date)
+    if end_date:
+        filters.append(DBLogEvent.timestamp <= end_date)
+    if log_level:
+        filters.append(DBLogEvent.log_level == log_level)
+    return filters
+
+def query_logs(db: Session, source: Optional[str] = None, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, log_level: Optional[str] = None,
+               limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[DBLogEvent], Optional[str]]:
+    """
+    Returns one page of log events, newest first, and the cursor for the next page.
+
+    Pages are keyed on (timestamp, id) rather than an offset, so every page is an
+    index range scan no matter how deep into the results it is. Every time bound
+    is also a plain comparison on timestamp, so only the partitions in range are scanned.
+    """
+    filters = _filters(source, start_date, end_date, log_level)
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        # The plain bound on timestamp lets Postgres prune partitions past the cursor
+        filters.append(DBLogEvent.timestamp <= cursor_timestamp)
+        filters.append(tuple_(DBLogEvent.timestamp, DBLogEvent.id) < tuple_(cursor_timestamp, cursor_id))
+
+    statement = (
+        select(DBLogEvent)
+        .where(*filters)
+        .order_by(DBLogEvent.timestamp.desc(), DBLogEvent.id.desc())
+        .limit(limit + 1)
+    )
+    rows = db.execute(statement).scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor
+
+def count_logs(db: Session, source: Optional[str] = None, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, log_level: Optional[str] = None) -> int:
+    statement = select(func.count()).select_from(DBLogEvent).where(*_filters(source, start_date, end_date, log_level))
+    return db.execute(statement).scalar_one()
+
+def query_rollups(db: Session, bucket_size: str, start_date: datetime, end_date: datetime,
+                  source: Optional[str] = None, source_type: Optional[str] = None,
+                  status_type: Optional[str] = None, log_level: Optional[str] = None) -> List[Any]:
+    """
+    Sums the per-minute rollups into bucket_size ('minute', 'hour' or 'day') buckets.
+    Coarser buckets are derived here on read; only minute rows are stored.
+    """
+    bucket = func.date_trunc(bucket_size, LogEventRollup.bucket).label("bucket")
+    dimensions = [LogEventRollup.source, LogEventRollup.source_type, LogEventRollup.status_type, LogEventRollup.log_level]
+    filters = [LogEventRollup.bucket >= start_date, LogEventRollup.bucket < end_date]
+    for column, value in zip(dimensions, (source, source_type, status_type, log_level)):
+        if value:
+            filters.append(column == value)
+
+    statement = (
+        select(bucket, *dimensions, func.sum(LogEventRollup.count).label("count"))
+        .where(*filters)
+        .group_by(bucket, *dimensions)
+        .order_by(bucket, *dimensions)
+    )
+    return db.execute(statement).all()
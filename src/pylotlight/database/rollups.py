@@ -0,0 +1,37 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from pylotlight.database.models.log_event_rollup import LogEventRollup
+
+ROLLUP_DIMENSIONS = ('source', 'source_type', 'status_type', 'log_level')
+
+def minute_bucket(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(second=0, microsecond=0)
+
+def rollup_counts(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregates a batch of log_events rows into one count per minute bucket and dimension."""
+    counts = Counter(
+        (minute_bucket(row['timestamp']),) + tuple(row[dimension] for dimension in ROLLUP_DIMENSIONS)
+        for row in rows
+    )
+    # Sorted so concurrent workers lock rollup rows in the same order
+    return [
+        dict(zip(('bucket',) + ROLLUP_DIMENSIONS, key), count=count)
+        for key, count in sorted(counts.items())
+    ]
+
+def upsert_rollups(db: Session, rows: List[Dict[str, Any]]):
+    """Adds a batch's counts to log_event_rollups with a single upsert."""
+    rollups = rollup_counts(rows)
+    if not rollups:
+        return
+    statement = pg_insert(LogEventRollup).values(rollups)
+    statement = statement.on_conflict_do_update(
+        index_elements=['bucket', *ROLLUP_DIMENSIONS],
+        set_={'count': LogEventRollup.count + statement.excluded['count']},
+    )
+    db.execute(statement)
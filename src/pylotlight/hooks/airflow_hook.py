@@ -1,9 +1,13 @@
+import os
 import requests
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 import base64
 import logging
 from pylotlight.hooks.base_hook import BaseHook
+from pylotlight.hooks.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from pylotlight.hooks.state import HookState
+from redis import Redis
 from pylotlight.config import Config
 from pylotlight.schemas.log_events import AirflowHealthCheckEvent, AirflowImportErrorEvent, AirflowFailedDagEvent, AirflowConnectionErrorEvent
 import json 
@@ -12,31 +16,58 @@ from requests.exceptions import RequestException
 
 logger = logging.getLogger(__name__)
 
+THROTTLED_STATUSES = (429, 503)
+FAILED_DAGS_WATERMARK = 'failed_dags'
+
 class AirflowHook(BaseHook):
-    def __init__(self):
-        config = Config.get_hook_config('airflow')
+    def __init__(self, redis_client: Optional[Redis] = None, **params):
+        # Instance parameters override the hook's configuration in Config.HOOKS
+        self.params = params
+        config = {**Config.get_hook_config('airflow'), **params}
+        if config.get('api_password_env'):
+            # Keeps instance passwords out of the task definitions stored in Redis
+            config['api_password'] = os.getenv(config['api_password_env'], '')
+        self.config = config
+        self.instance_id = config.get('instance_id', 'airflow')
         self.base_url = config['base_url']
         self.auth = base64.b64encode(f"{config['api_user']}:{config['api_password']}".encode()).decode()
-        self.request_delay = 1  # Delay between requests in seconds
+        self.request_timeout = config.get('request_timeout', 10)
+        self.retry_backoff = 1  # Base delay before retrying a failed request, in seconds
         self.max_retries = 3  # Maximum number of retries for a request
+        self.rate_limiter = AdaptiveRateLimiter()
+        # One keep-alive connection pool for every request this hook makes
+        self.session = requests.Session()
+        self.session.headers.update(self._headers())
+        # Failed DAG runs are polled incrementally from a watermark on their end_date
+        self.state = HookState(redis_client, self.instance_id)
+        self.initial_lookback = timedelta(hours=config.get('initial_lookback_hours', 24))
+        # Re-read runs ending this close to the watermark; their dedup keys drop the repeats
+        self.watermark_overlap = timedelta(seconds=60)
+        self.page_limit = 100
+        self._pending_watermark: Optional[datetime] = None
 
-    def _make_request(self, endpoint: str, method: str = 'GET', params: Dict[str, Any] = None, payload: Dict[str, Any] = None) -> Dict[str, Any]:
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             'Authorization': f'Basic {self.auth}',
             'Content-Type': 'application/json'
         }
+
+    def _make_request(self, endpoint: str, method: str = 'GET', params: Dict[str, Any] = None, payload: Dict[str, Any] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{endpoint}"
         
         for attempt in range(self.max_retries):
             try:
-                response = requests.request(method, url, headers=headers, params=params, json=payload, timeout=10)
+                time.sleep(self.rate_limiter.reserve())
+                response = self.session.request(method, url, params=params, json=payload, timeout=self.request_timeout)
+                if response.status_code in THROTTLED_STATUSES:
+                    self.rate_limiter.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
                 response.raise_for_status()
-                time.sleep(self.request_delay)  # Delay between requests
+                self.rate_limiter.on_success()
                 return response.json()
             except RequestException as e:
                 logger.warning(f"Request failed (attempt {attempt + 1}/{self.max_retries}): {str(e)}")
                 if attempt < self.max_retries - 1:
-                    wait_time = (2 ** attempt) * self.request_delay
+                    wait_time = (2 ** attempt) * self.retry_backoff
                     logger.info(f"Retrying in {wait_time} seconds...")
                     time.sleep(wait_time)
                 else:
@@ -60,36 +91,83 @@ class AirflowHook(BaseHook):
     def get_import_errors(self) -> List[Dict[str, Any]]:
         return self._make_request('/importErrors')
 
-    def get_failed_dags(self) -> List[Dict[str, Any]]:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(hours=24)
-        start_date_str = start_date.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    def _failed_dags_since(self) -> datetime:
+        self._pending_watermark = None
+        watermark = self.state.get_watermark(FAILED_DAGS_WATERMARK)
+        if watermark is None:
+            return datetime.now(timezone.utc) - self.initial_lookback
+        return watermark - self.watermark_overlap
 
-        payload = {
+    def _failed_dags_payload(self, since: datetime, offset: int = 0) -> Dict[str, Any]:
+        return {
             "states": ["failed"],
-            "start_date_gte": start_date_str,
+            "end_date_gte": since.astimezone(timezone.utc).isoformat(),
+            "page_offset": offset,
+            "page_limit": self.page_limit,
         }
 
-        response = self._make_request('/dags/~/dagRuns/list', 'POST', payload=payload)
-        dag_runs = response.get('dag_runs', [])
-        logger.info(f"Found {len(dag_runs)} failed DAG runs in the last 24 hours.")
+    def _collect_failed_dags(self, response: Dict[str, Any], dag_runs: List[Dict[str, Any]], offset: int) -> Tuple[Optional[int], bool]:
+        """Adds one page of dag runs; returns the next page offset (None when done) and whether the page was fetched."""
+        if 'error' in response:
+            return None, False
+        page = response.get('dag_runs', [])
+        dag_runs.extend(page)
+        next_offset = offset + len(page)
+        if len(page) < self.page_limit or next_offset >= response.get('total_entries', 0):
+            return None, True
+        return next_offset, True
+
+    def _advance_watermark(self, dag_runs: List[Dict[str, Any]], complete: bool):
+        """Remembers the latest end_date seen, to be saved once the events are pushed."""
+        logger.info(f"Found {len(dag_runs)} failed DAG runs since the last poll.")
+        end_dates = [datetime.fromisoformat(dag_run['end_date']) for dag_run in dag_runs if dag_run.get('end_date')]
+        # Never move past runs that a failed page may have held
+        self._pending_watermark = max(end_dates) if complete and end_dates else None
+
+    def get_failed_dags(self) -> List[Dict[str, Any]]:
+        since = self._failed_dags_since()
+        dag_runs: List[Dict[str, Any]] = []
+        offset, complete = 0, True
+        while offset is not None:
+            response = self._make_request('/dags/~/dagRuns/list', 'POST', payload=self._failed_dags_payload(since, offset))
+            offset, complete = self._collect_failed_dags(response, dag_runs, offset)
+        self._advance_watermark(dag_runs, complete)
         return dag_runs
 
+    def commit_state(self):
+        if self._pending_watermark is not None:
+            self.state.set_watermark(FAILED_DAGS_WATERMARK, self._pending_watermark)
+            self._pending_watermark = None
+
     def push_events(self) -> List[Union[AirflowHealthCheckEvent, AirflowImportErrorEvent, AirflowFailedDagEvent,AirflowConnectionErrorEvent]]:
+        # The health check doubles as the connection check, so it is only called once per cycle
+        health_check = self.get_health_check()
+        if 'error' in health_check:
+            return self._connection_error_events(health_check['error'])
+        return self._build_events(health_check, self.get_import_errors(), self.get_failed_dags())
+
+    def close(self):
+        self.session.close()
+
+    def _dedup_key(self, dag_run: Dict[str, Any]) -> str:
+        # dagRuns have no try number: a cleared run that fails again keeps its dag_run_id but gets a new end_date
+        attempt = dag_run.get('end_date') or dag_run.get('start_date')
+        return f"{self.instance_id}:failed_dag:{dag_run['dag_id']}:{dag_run.get('dag_run_id')}:{attempt}"
+
+    def _connection_error_events(self, error: str) -> List[AirflowConnectionErrorEvent]:
+        logger.error(f"Connection to Airflow failed: {error}. Aborting push_events().")
+        return [AirflowConnectionErrorEvent(
+            timestamp=datetime.now(timezone.utc),
+            status_type="critical",
+            log_level="ERROR",
+            message=f"Failed to establish connection with Airflow at the specified URL: {self.base_url}",
+        )]
+
+    def _build_events(self, health_check: Dict[str, Any], import_errors: Dict[str, Any],
+                      failed_dagruns: List[Dict[str, Any]]) -> List[Union[AirflowHealthCheckEvent, AirflowImportErrorEvent, AirflowFailedDagEvent]]:
         events = []
-        
-        if not self.check_connection():
-            logger.error("Failed to establish connection with Airflow. Aborting push_events().")
-            events.append(AirflowConnectionErrorEvent(
-                timestamp=datetime.now(timezone.utc),
-                status_type="critical",
-                log_level="ERROR",
-                message=f"Failed to establish connection with Airflow at the specified URL: {self.base_url}",
-            ))
-            return events
 
         # Health check event
-        health_check = self.get_health_check()
         metadata_health_check = health_check.get('metadatabase', {}).get('status', '')
         scheduler_health_check = health_check.get('scheduler', {}).get('status', '')
         triggerer_health_check = health_check.get('triggerer', {}).get('status', '')
@@ -110,7 +188,6 @@ class AirflowHook(BaseHook):
         ))
 
         # Import errors event
-        import_errors = self.get_import_errors()
         list_of_import_errors = import_errors.get('import_errors', [])
         if list_of_import_errors:
             for error in list_of_import_errors:
@@ -137,7 +214,6 @@ class AirflowHook(BaseHook):
             ))
 
         # Failed DAGs event
-        failed_dagruns = self.get_failed_dags()
         for dag_run in failed_dagruns:
             events.append(AirflowFailedDagEvent(
                 timestamp=datetime.fromisoformat(dag_run['execution_date']),
@@ -147,8 +223,10 @@ class AirflowHook(BaseHook):
                 log_level='ERROR',
                 message=f"DAG failed: {dag_run['dag_id']}",
                 dag_id=dag_run['dag_id'],
+                run_id=dag_run.get('dag_run_id'),
                 execution_date=datetime.fromisoformat(dag_run['execution_date']),
-                try_number=1
+                try_number=dag_run.get('try_number', 1),
+                dedup_key=self._dedup_key(dag_run),
             ))
 
         return events
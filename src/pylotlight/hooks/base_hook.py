@@ -2,6 +2,17 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Any
 
 class BaseHook(ABC):
+    # Hooks providing a native push_events_async coroutine set this, so the worker awaits it on its event loop
+    is_async = False
+
     @abstractmethod
     def push_events(self) -> List[Dict[str, Any]]:
-        pass
\ No newline at end of file
+        pass
+
+    def commit_state(self):
+        """Called once the events from push_events are queued, to persist polling state such as watermarks."""
+        pass
+
+    def close(self):
+        """Releases connections and other resources held by the hook."""
+        pass
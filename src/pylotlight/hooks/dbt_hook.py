@@ -0,0 +1,150 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import ijson
+from redis import Redis
+from pylotlight.hooks.base_hook import BaseHook
+from pylotlight.hooks.state import HookState
+from pylotlight.config import Config
+from pylotlight.schemas.log_events import DbtLogEvent
+
+logger = logging.getLogger(__name__)
+
+RUN_RESULTS_FILE = 'run_results.json'
+MANIFEST_FILE = 'manifest.json'
+RUN_RESULTS_HASH = 'artifact_hash:run_results'
+
+# dbt result status -> (status_type, log_level)
+RESULT_STATUSES = {
+    'success': ('normal', 'INFO'),
+    'pass': ('normal', 'INFO'),
+    'warn': ('incident', 'WARNING'),
+    'skipped': ('incident', 'WARNING'),
+    'error': ('failure', 'ERROR'),
+    'fail': ('failure', 'ERROR'),
+    'runtime error': ('failure', 'ERROR'),
+}
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DbtArtifactHook(BaseHook):
+    """
+    Watches a dbt target directory and emits one DbtLogEvent per node result
+    in run_results.json, named from manifest.json.
+
+    Both artifacts are read with a streaming JSON parser, so only one result or
+    manifest node is held in memory at a time. run_results.json is only parsed
+    when its content hash differs from the last one ingested, and the manifest
+    is only re-read when a new run needs it and it has changed.
+    """
+
+    def __init__(self, redis_client: Optional[Redis] = None, **params):
+        self.params = params
+        config = {**Config.get_hook_config('dbt'), **params}
+        self.config = config
+        self.instance_id = config.get('instance_id', 'dbt')
+        self.target_dir = config['target_dir']
+        self.state = HookState(redis_client, self.instance_id)
+        # (mtime, size) of run_results.json when it was last hashed, to skip re-hashing unchanged files
+        self._run_results_stat: Optional[Tuple[float, int]] = None
+        self._manifest_hash: Optional[str] = None
+        self._node_names: Dict[str, str] = {}
+        self._pending_stat: Optional[Tuple[float, int]] = None
+        self._pending_hash: Optional[str] = None
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.target_dir, filename)
+
+    def _new_run_results_hash(self) -> Optional[str]:
+        """Hash of run_results.json if it holds results not ingested yet, otherwise None."""
+        path = self._path(RUN_RESULTS_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime, stat.st_size) == self._run_results_stat:
+            return None
+        digest = file_digest(path)
+        if digest == self.state.get_value(RUN_RESULTS_HASH):
+            self._run_results_stat = (stat.st_mtime, stat.st_size)
+            return None
+        # Only marked as seen once its events are queued, in case dbt was still writing it
+        self._pending_stat = (stat.st_mtime, stat.st_size)
+        return digest
+
+    def _load_node_names(self):
+        path = self._path(MANIFEST_FILE)
+        if not os.path.exists(path):
+            return
+        digest = file_digest(path)
+        if digest == self._manifest_hash:
+            return
+        node_names = {}
+        with open(path, 'rb') as f:
+            for unique_id, node in ijson.kvitems(f, 'nodes'):
+                node_names[unique_id] = node.get('name', unique_id)
+        self._node_names = node_names
+        self._manifest_hash = digest
+        logger.info(f"Loaded {len(node_names)} nodes from {path}")
+
+    def _read_metadata(self) -> Dict[str, Any]:
+        # metadata comes first in run_results.json, so this stops after the first few bytes
+        with open(self._path(RUN_RESULTS_FILE), 'rb') as f:
+            return next(ijson.items(f, 'metadata'), None) or {}
+
+    def _build_event(self, result: Dict[str, Any], run_id: Optional[str], generated_at: datetime) -> DbtLogEvent:
+        node_id = result.get('unique_id')
+        model_name = self._node_names.get(node_id) or (node_id or '').rsplit('.', 1)[-1]
+        status = str(result.get('status', '')).lower()
+        status_type, log_level = RESULT_STATUSES.get(status, ('incident', 'WARNING'))
+        completed_at = next((timing.get('completed_at') for timing in reversed(result.get('timing') or [])
+                             if timing.get('completed_at')), None)
+        timestamp = datetime.fromisoformat(completed_at.replace('Z', '+00:00')) if completed_at else generated_at
+        message = f"{node_id} {status} in {float(result.get('execution_time') or 0):.2f}s"
+        if result.get('message'):
+            message = f"{message}: {result['message']}"
+        return DbtLogEvent(
+            timestamp=timestamp,
+            source="dbt",
+            source_type="dbt",
+            status_type=status_type,
+            log_level=log_level,
+            message=message,
+            model_name=model_name,
+            node_id=node_id,
+            run_id=run_id,
+            dedup_key=f"{self.instance_id}:dbt:{run_id}:{node_id}",
+        )
+
+    def push_events(self) -> List[DbtLogEvent]:
+        self._pending_hash = None
+        digest = self._new_run_results_hash()
+        if digest is None:
+            return []
+
+        self._load_node_names()
+        metadata = self._read_metadata()
+        run_id = metadata.get('invocation_id')
+        generated_at = metadata.get('generated_at')
+        generated_at = datetime.fromisoformat(generated_at.replace('Z', '+00:00')) if generated_at else datetime.now(timezone.utc)
+
+        events = []
+        with open(self._path(RUN_RESULTS_FILE), 'rb') as f:
+            for result in ijson.items(f, 'results.item'):
+                events.append(self._build_event(result, run_id, generated_at))
+        logger.info(f"Read {len(events)} node results of dbt run {run_id}")
+        self._pending_hash = digest
+        return events
+
+    def commit_state(self):
+        if self._pending_hash is not None:
+            self.state.set_value(RUN_RESULTS_HASH, self._pending_hash)
+            self._run_results_stat = self._pending_stat
+            self._pending_hash = None
@@ -0,0 +1,48 @@
+import time
+from typing import Optional
+
+class AdaptiveRateLimiter:
+    """
+    Spaces out requests to an API only while it is pushing back.
+
+    Requests go out back to back until a response is throttled (429/503); the
+    interval between requests then doubles on every throttled response, up to
+    max_interval, honouring Retry-After when given, and decays again on each
+    success. reserve() does no waiting itself, so it works for sync and async
+    callers alike.
+    """
+
+    def __init__(self, min_interval: float = 0.0, max_interval: float = 30.0,
+                 initial_backoff: float = 0.5, decay: float = 0.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_backoff = initial_backoff
+        self.decay = decay
+        self.interval = min_interval
+        self._next_allowed = 0.0
+
+    def reserve(self) -> float:
+        """Books the next request slot and returns how many seconds to wait for it."""
+        now = time.monotonic()
+        start = max(now, self._next_allowed)
+        self._next_allowed = start + self.interval
+        return start - now
+
+    def on_success(self):
+        self.interval *= self.decay
+        if self.interval < max(self.min_interval, 0.01):
+            self.interval = self.min_interval
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        self.interval = min(self.max_interval, max(self.interval * 2, self.initial_backoff, self.min_interval))
+        now = time.monotonic()
+        self._next_allowed = max(self._next_allowed, now + self.interval)
+        if retry_after:
+            self._next_allowed = max(self._next_allowed, now + min(retry_after, self.max_interval))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds; the HTTP-date form is ignored."""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
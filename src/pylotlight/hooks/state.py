@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+from redis import Redis
+from pylotlight.config import Config
+
+class HookState:
+    """Small per-hook-instance state kept in Redis, such as polling watermarks and artifact hashes."""
+    KEY_PREFIX = 'hook_state:'
+
+    def __init__(self, redis_client: Optional[Redis], instance_id: str):
+        self.redis = redis_client or Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT)
+        self.key = f"{self.KEY_PREFIX}{instance_id}"
+
+    def get_watermark(self, name: str) -> Optional[datetime]:
+        value = self.redis.hget(self.key, f"watermark:{name}")
+        return datetime.fromisoformat(value.decode()) if value else None
+
+    def set_watermark(self, name: str, value: datetime):
+        self.redis.hset(self.key, f"watermark:{name}", value.isoformat())
+
+    def get_value(self, name: str) -> Optional[str]:
+        value = self.redis.hget(self.key, name)
+        return value.decode() if value else None
+
+    def set_value(self, name: str, value: str):
+        self.redis.hset(self.key, name, value)
@@ -0,0 +1,83 @@
+"""
+Layout of the Redis Streams that carry log events from the producers (the API
+and the task queue) to the workers. Each entry holds one JSON-encoded event.
+
+Events are sharded over LOG_STREAM_SHARDS streams by (source, source_type), and
+each shard is read by a single consumer process, so events for one key are
+stored and published in the order they were produced.
+
+Entries are versioned envelopes: the event's JSON plus a small header, so the
+worker can route and store events without validating them again:
+
+    v      envelope version
+    src    source, st: source_type
+    val    "1" if the JSON was dumped from a validated event model
+    pub    "1" if the producer already published the event to SSE
+    event  the event's JSON, published to SSE as-is
+
+Entries without a version (written before the envelope) are treated as
+unvalidated and unpublished.
+"""
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+from pylotlight.config import Config
+
+LOG_STREAM_KEY = Config.LOG_STREAM_KEY
+LOG_STREAM_GROUP = Config.LOG_STREAM_GROUP
+LOG_STREAM_SHARDS = Config.LOG_STREAM_SHARDS
+EVENT_FIELD = "event"
+# Redis list the events were queued on before the streams, drained into them by the worker at startup
+LEGACY_QUEUE_KEY = "log_queue"
+ENVELOPE_VERSION = "1"
+
+def shard_for(source: Optional[str], source_type: Optional[str]) -> int:
+    # crc32 rather than hash() so every process agrees on the shard
+    return zlib.crc32(f"{source}:{source_type}".encode()) % LOG_STREAM_SHARDS
+
+def stream_key(shard: int) -> str:
+    # An unsharded deployment keeps the single stream it had before sharding, with its pending entries
+    if LOG_STREAM_SHARDS == 1:
+        return LOG_STREAM_KEY
+    return f"{LOG_STREAM_KEY}:{shard}"
+
+def stream_key_for(source: Optional[str], source_type: Optional[str]) -> str:
+    return stream_key(shard_for(source, source_type))
+
+def all_stream_keys() -> List[str]:
+    return [stream_key(shard) for shard in range(LOG_STREAM_SHARDS)]
+
+@dataclass
+class EventEnvelope:
+    payload: bytes
+    source: Optional[str] = None
+    source_type: Optional[str] = None
+    validated: bool = False
+    published: bool = False
+
+def stream_entry(log_json: Union[str, bytes], event: Optional[Any] = None, published: bool = False) -> dict:
+    """
+    Envelope for one event. Pass the validated model log_json was dumped from as
+    event to let the worker trust the payload.
+    """
+    entry = {'v': ENVELOPE_VERSION, 'val': '1' if event is not None else '0', 'pub': '1' if published else '0',
+             EVENT_FIELD: log_json}
+    if event is not None:
+        entry['src'] = event.source
+        entry['st'] = event.source_type
+    return entry
+
+def read_entry(fields: Dict[bytes, bytes]) -> EventEnvelope:
+    """Decodes a stream entry; raises KeyError for entries without an event."""
+    payload = fields[EVENT_FIELD.encode()]
+    if fields.get(b'v', b'').decode() != ENVELOPE_VERSION:
+        # Legacy or unknown envelope: only the payload can be relied on
+        return EventEnvelope(payload)
+    source, source_type = fields.get(b'src'), fields.get(b'st')
+    return EventEnvelope(
+        payload,
+        source.decode() if source is not None else None,
+        source_type.decode() if source_type is not None else None,
+        validated=fields.get(b'val') == b'1',
+        published=fields.get(b'pub') == b'1',
+    )
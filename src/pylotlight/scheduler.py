@@ -0,0 +1,185 @@
+"""
+Distributed task scheduler: the next run time of every registered task is kept
+in a Redis sorted set, and workers claim due tasks with short leases, so any
+number of workers can share the tasks without running one twice.
+"""
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from redis import Redis
+
+TASK_DEFS_KEY = 'scheduler:tasks'
+TASK_SCHEDULE_KEY = 'scheduler:schedule'
+TASK_LEASES_KEY = 'scheduler:leases'
+TASK_STATE_PREFIX = 'scheduler:state:'
+
+# Run every missed interval, up to max_catch_up of them
+CATCH_UP_ALL = 'all'
+# Run once for all missed intervals
+CATCH_UP_LATEST = 'latest'
+
+# Claimed tasks are pushed out to the lease expiry, so they become due again if their worker dies.
+# A task's lease lasts at least its timeout plus a margin, so a slow run is not claimed twice.
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[4]))
+local claimed = {}
+for i = 1, #due, 2 do
+    local expires = now + tonumber(ARGV[2])
+    local definition = redis.call('HGET', KEYS[3], due[i])
+    if definition then
+        local timeout = tonumber(cjson.decode(definition)['timeout'])
+        if timeout then
+            expires = math.max(expires, now + timeout + tonumber(ARGV[5]))
+        end
+    end
+    redis.call('ZADD', KEYS[1], expires, due[i])
+    redis.call('HSET', KEYS[2], due[i], ARGV[3])
+    table.insert(claimed, due[i])
+    table.insert(claimed, due[i + 1])
+end
+return claimed
+"""
+
+# Only the current lease holder may reschedule a task
+_COMPLETE_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+@dataclass
+class TaskClaim:
+    task_id: str
+    due_at: float
+    claimed_at: float
+    lease: str
+
+    @property
+    def overdue(self) -> float:
+        return max(0.0, self.claimed_at - self.due_at)
+
+def next_slot(anchor: float, interval: int, last_slot: int, now: float, catch_up: str, max_catch_up: int) -> int:
+    """
+    Index of the next interval slot (anchor + slot * interval) to run after
+    last_slot has completed at now.
+    """
+    current = math.floor((now - anchor) / interval) if interval > 0 else last_slot
+    if catch_up == CATCH_UP_ALL:
+        return max(last_slot + 1, current + 1 - max_catch_up)
+    return max(last_slot + 1, current + 1)
+
+class TaskScheduler:
+    def __init__(self, redis_client: Redis, lease_seconds: int = 300, max_catch_up: int = 10,
+                 lease_margin: int = 30):
+        self.redis = redis_client
+        self.lease_seconds = lease_seconds
+        self.lease_margin = lease_margin
+        self.max_catch_up = max_catch_up
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._complete = self.redis.register_script(_COMPLETE_SCRIPT)
+
+    def register(self, task_id: str, definition: Dict[str, Any]):
+        """
+        Adds or updates a task. Registering an existing task keeps its schedule,
+        so every worker can register the same tasks at startup.
+        """
+        state_key = f"{TASK_STATE_PREFIX}{task_id}"
+        previous = self.redis.hget(TASK_DEFS_KEY, task_id)
+        if previous is not None and json.loads(previous).get('interval') != definition['interval']:
+            # Slots are counted in intervals, so start a new grid
+            self.redis.hdel(state_key, 'anchor', 'slot')
+        self.redis.hset(TASK_DEFS_KEY, task_id, json.dumps(definition))
+        now = time.time()
+        if self.redis.hsetnx(state_key, 'anchor', now):
+            self.redis.hset(state_key, 'slot', 0)
+            self.redis.zadd(TASK_SCHEDULE_KEY, {task_id: now + random.uniform(0, definition.get('jitter', 0))})
+        else:
+            self.redis.zadd(TASK_SCHEDULE_KEY, {task_id: now}, nx=True)
+
+    def unregister(self, task_id: str):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hdel(TASK_DEFS_KEY, task_id)
+        pipe.zrem(TASK_SCHEDULE_KEY, task_id)
+        pipe.hdel(TASK_LEASES_KEY, task_id)
+        pipe.delete(f"{TASK_STATE_PREFIX}{task_id}")
+        pipe.execute()
+
+    def definition(self, task_id: str) -> Optional[Dict[str, Any]]:
+        definition = self.redis.hget(TASK_DEFS_KEY, task_id)
+        return json.loads(definition) if definition else None
+
+    def claim_due(self, owner: str, limit: int = 10) -> List[TaskClaim]:
+        now = time.time()
+        lease = f"{owner}:{uuid.uuid4().hex[:8]}"
+        response = self._claim(keys=[TASK_SCHEDULE_KEY, TASK_LEASES_KEY, TASK_DEFS_KEY],
+                               args=[now, self.lease_seconds, lease, limit, self.lease_margin])
+        claims = []
+        for i in range(0, len(response), 2):
+            task_id = response[i].decode() if isinstance(response[i], bytes) else response[i]
+            claims.append(TaskClaim(task_id, float(response[i + 1]), now, lease))
+        return claims
+
+    def seconds_until_next(self) -> Optional[float]:
+        head = self.redis.zrange(TASK_SCHEDULE_KEY, 0, 0, withscores=True)
+        return max(0.0, head[0][1] - time.time()) if head else None
+
+    def complete(self, claim: TaskClaim, definition: Dict[str, Any], duration: float, error: Optional[str] = None) -> bool:
+        """
+        Records the run's metrics and reschedules the task on its interval grid.
+        Returns False if the lease had expired and another worker owns the task.
+        """
+        state_key = f"{TASK_STATE_PREFIX}{claim.task_id}"
+        state = {k.decode(): v.decode() for k, v in self.redis.hgetall(state_key).items()}
+        now = time.time()
+        anchor = float(state.get('anchor', claim.due_at))
+        slot = next_slot(anchor, definition['interval'], int(state.get('slot', 0)), now,
+                         definition.get('catch_up', CATCH_UP_LATEST), self.max_catch_up)
+        run_at = anchor + slot * definition['interval'] + random.uniform(0, definition.get('jitter', 0))
+        if not self._complete(keys=[TASK_SCHEDULE_KEY, TASK_LEASES_KEY], args=[claim.task_id, claim.lease, run_at]):
+            return False
+
+        overdue_ms = int(claim.overdue * 1000)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(state_key, mapping={
+            'anchor': anchor,
+            'slot': slot,
+            'last_run': int(claim.claimed_at),
+            'last_duration_ms': int(duration * 1000),
+            'overdue_ms': overdue_ms,
+            'last_error': error or '',
+        })
+        pipe.hincrby(state_key, 'runs', 1)
+        if error:
+            pipe.hincrby(state_key, 'failures', 1)
+        pipe.execute()
+        if overdue_ms > int(state.get('max_overdue_ms', 0)):
+            self.redis.hset(state_key, 'max_overdue_ms', overdue_ms)
+        return True
+
+def summarize_task(task_id: str, definition: bytes, next_run: Optional[float], lease: Optional[bytes],
+                   state: Dict[bytes, bytes], now: float) -> Dict[str, Any]:
+    """Definition, next run, lease holder and run metrics of one task, from its raw Redis entries."""
+    state = {k.decode(): v.decode() for k, v in state.items()}
+    return {
+        'task_id': task_id,
+        **json.loads(definition),
+        'next_run': next_run,
+        'leased_by': lease.decode() if lease else None,
+        # How far past its due time a task still waiting to be claimed is
+        'overdue_ms': int((now - next_run) * 1000) if next_run and not lease and next_run < now else 0,
+        'last_overdue_ms': int(state.get('overdue_ms', 0)),
+        'max_overdue_ms': int(state.get('max_overdue_ms', 0)),
+        'last_run': int(state['last_run']) if state.get('last_run') else None,
+        'last_duration_ms': int(state.get('last_duration_ms', 0)),
+        'runs': int(state.get('runs', 0)),
+        'failures': int(state.get('failures', 0)),
+        'last_error': state.get('last_error') or None,
+    }
@@ -1,7 +1,7 @@
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, Discriminator, Tag, TypeAdapter, WrapValidator
 from datetime import datetime
-from typing import Optional, List, Union, Dict, Any, Literal
+from typing import Optional, List, Union, Dict, Any, Literal, Annotated, Tuple, Type
 from pydantic.json import pydantic_encoder
 
 class LogEventBase(BaseModel):
@@ -34,8 +34,17 @@ class AirflowImportErrorEvent(AirflowLogEvent):
 class AirflowFailedDagEvent(AirflowLogEvent):
     source_type: Literal["airflow_failed_dag"] = Field(default="airflow_failed_dag")
     dag_id: str
+    run_id: Optional[str] = None
     execution_date: datetime
     try_number: int
+    dedup_key: Optional[str] = Field(default=None, description="Stable key of the failed run attempt, so re-polls are idempotent")
+
+class AirflowTaskLogEvent(AirflowLogEvent):
+    source_type: Literal["airflow_task_log"] = Field(default="airflow_task_log")
+    dag_id: Optional[str] = None
+    run_id: Optional[str] = None
+    task_id: Optional[str] = None
+    try_number: Optional[int] = None
 
 class AirflowConnectionErrorEvent(AirflowLogEvent):
     source_type: Literal["airflow_connection_error"] = Field(default="airflow_connection_error")
@@ -46,11 +55,77 @@ class DbtLogEvent(LogEventBase):
     model_name: Optional[str] = None
     node_id: Optional[str] = None
     run_id: Optional[str] = None
+    dedup_key: Optional[str] = Field(default=None, description="Stable key of the node result, so re-ingestion is idempotent")
 
 class GenericLogEvent(LogEventBase):
     additional_data: Dict[str, Any] = Field(default_factory=dict)
 
-LogEvent = Union[AirflowHealthCheckEvent, AirflowImportErrorEvent, AirflowFailedDagEvent, AirflowConnectionErrorEvent, DbtLogEvent, GenericLogEvent]
+# Dispatch table for the LogEvent family, keyed on (source, source_type).
+# Anything not listed here validates as a GenericLogEvent.
+EVENT_MODELS: Dict[Tuple[str, str], Type[LogEventBase]] = {
+    ("airflow", "health_check"): AirflowHealthCheckEvent,
+    ("airflow", "airflow_import_error"): AirflowImportErrorEvent,
+    ("airflow", "airflow_failed_dag"): AirflowFailedDagEvent,
+    ("airflow", "airflow_connection_error"): AirflowConnectionErrorEvent,
+    ("airflow", "airflow_task_log"): AirflowTaskLogEvent,
+    ("dbt", "dbt"): DbtLogEvent,
+    ("dbt", "dbt_log"): DbtLogEvent,
+}
+
+GENERIC_TAG = "generic"
+_EVENT_TAGS: Dict[Tuple[str, str], str] = {key: ":".join(key) for key in EVENT_MODELS}
+_MODEL_TAGS: Dict[Type[LogEventBase], str] = {}
+for _key, _model in EVENT_MODELS.items():
+    _MODEL_TAGS.setdefault(_model, _EVENT_TAGS[_key])
+
+def _log_event_tag(value: Any) -> str:
+    if isinstance(value, dict):
+        return _EVENT_TAGS.get((value.get("source"), value.get("source_type")), GENERIC_TAG)
+    return _MODEL_TAGS.get(type(value), GENERIC_TAG)
+
+def _fallback_to_generic(value: Any, handler):
+    try:
+        return handler(value)
+    except ValueError:
+        # A payload that doesn't satisfy its specific model is still kept as a GenericLogEvent
+        if isinstance(value, LogEventBase):
+            value = value.model_dump()
+        return GenericLogEvent.model_validate(value)
+
+LogEvent = Annotated[
+    Union[
+        Annotated[AirflowHealthCheckEvent, Tag("airflow:health_check")],
+        Annotated[AirflowImportErrorEvent, Tag("airflow:airflow_import_error")],
+        Annotated[AirflowFailedDagEvent, Tag("airflow:airflow_failed_dag")],
+        Annotated[AirflowConnectionErrorEvent, Tag("airflow:airflow_connection_error")],
+        Annotated[AirflowTaskLogEvent, Tag("airflow:airflow_task_log")],
+        Annotated[DbtLogEvent, Tag("dbt:dbt")],
+        Annotated[DbtLogEvent, Tag("dbt:dbt_log")],
+        Annotated[GenericLogEvent, Tag(GENERIC_TAG)],
+    ],
+    Discriminator(_log_event_tag),
+    WrapValidator(_fallback_to_generic),
+]
+
+# Built once and shared by the API, the worker and the source handlers
+_log_event_adapter: TypeAdapter = TypeAdapter(LogEvent)
+
+def resolve_event_model(source: Optional[str], source_type: Optional[str]) -> Type[LogEventBase]:
+    return EVENT_MODELS.get((source, source_type), GenericLogEvent)
+
+def validate_log_event(data: Union[Dict[str, Any], LogEventBase]) -> LogEventBase:
+    """
+    Validates a log event dictionary straight into the model registered for its
+    (source, source_type), falling back to GenericLogEvent. Events that are
+    already the resolved model are returned as-is.
+    """
+    if isinstance(data, LogEventBase) and type(data) is resolve_event_model(data.source, data.source_type):
+        return data
+    return _log_event_adapter.validate_python(data)
+
+def validate_log_event_json(data: Union[str, bytes]) -> LogEventBase:
+    """Same as validate_log_event, but parses the event from raw JSON."""
+    return _log_event_adapter.validate_json(data)
 
 # API-specific models
 class LogIngestionRequest(BaseModel):
@@ -87,6 +162,19 @@ class BatchLogIngestionResponse(BaseModel):
         "protected_namespaces": ()
     }
 
+class NdjsonLineError(BaseModel):
+    line: int = Field(..., description="1-based line number in the decompressed body")
+    offset: int = Field(..., description="Byte offset of the line in the decompressed body")
+    error: str
+
+class NdjsonIngestionResponse(BaseModel):
+    success: bool
+    message: str
+    accepted: int = 0
+    failed: int = 0
+    errors: List[NdjsonLineError] = Field(default_factory=list, description="The first failed lines, up to INGEST_MAX_ERRORS")
+    committed_lines: int = Field(0, description="Lines up to this one were all queued or rejected; resume after it on failure")
+
 class LogLevel(str, Enum):
     DEBUG = "DEBUG"
     INFO = "INFO"
@@ -101,7 +189,8 @@ class LogRetrievalRequest(BaseModel):
     log_level: Optional[LogLevel] = None
     filters: Dict[str, Any] = Field(default_factory=dict, description="Source-specific filters")
     limit: int = Field(100, ge=1, le=1000)
-    offset: int = Field(0, ge=0)
+    cursor: Optional[str] = Field(None, description="next_cursor from the previous page")
+    include_total: bool = Field(False, description="Also count every matching log (slow on large ranges)")
 
     model_config = {
         "protected_namespaces": ()
@@ -109,13 +198,94 @@ class LogRetrievalRequest(BaseModel):
 
 class LogRetrievalResponse(BaseModel):
     logs: List[LogEvent]
-    total_count: int
+    total_count: Optional[int] = None
     has_more: bool
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to fetch the next page")
 
     model_config = {
         "protected_namespaces": ()
     }
 
+class StatsBucket(BaseModel):
+    bucket: datetime
+    source: str
+    source_type: str
+    status_type: str
+    log_level: str
+    count: int
+
+class StatsResponse(BaseModel):
+    bucket_size: Literal["minute", "hour", "day"]
+    start_date: datetime
+    end_date: datetime
+    buckets: List[StatsBucket]
+
+class StatusSnapshotResponse(BaseModel):
+    statuses: Dict[str, Dict[str, Dict[str, Any]]] = Field(
+        ..., description="Latest event per component, keyed by service and then component"
+    )
+
+class WorkerStats(BaseModel):
+    consumer: str
+    pid: int
+    streams: str
+    events_total: int
+    batches_total: int
+    events_per_sec: float
+    lag_ms: int = Field(..., description="Time the oldest event of the last batch spent queued")
+    updated_at: int
+
+class StreamStats(BaseModel):
+    stream: str
+    length: int = Field(..., description="Entries queued or pending on this shard")
+
+class WorkerStatsResponse(BaseModel):
+    consumers: List[WorkerStats]
+    streams: List[StreamStats]
+
+class IngestSourceStats(BaseModel):
+    source: str
+    rate_limit: float = Field(..., description="Events per second; 0 means unlimited")
+    burst: int
+    rate_limited_requests: int = 0
+    rate_limited_events: int = 0
+    queue_full_requests: int = 0
+    queue_full_events: int = 0
+
+class IngestStatsResponse(BaseModel):
+    queue_depth: int = Field(..., description="Entries queued or pending on all log streams")
+    queue_high_watermark: int
+    sources: List[IngestSourceStats]
+
+class DedupStatsResponse(BaseModel):
+    backend: Optional[str] = Field(None, description="'bloom' or 'set', as last reported by a worker")
+    mode: Optional[str] = Field(None, description="'drop' or 'count'")
+    hits: int = Field(..., description="Events found to be duplicates")
+    misses: int = Field(..., description="Events seen for the first time")
+    hit_ratio: float
+    hits_by_source: Dict[str, int] = Field(default_factory=dict, description="Duplicates per source:source_type")
+
+class SchedulerTask(BaseModel):
+    task_id: str
+    hook_class: str
+    interval: int
+    jitter: float = 0
+    catch_up: str
+    timeout: Optional[float] = None
+    next_run: Optional[float] = Field(None, description="Epoch seconds the task is due (or its lease expires, while running)")
+    leased_by: Optional[str] = Field(None, description="Lease of the worker currently running the task")
+    overdue_ms: int = Field(..., description="How long a due task has been waiting to be claimed")
+    last_overdue_ms: int = Field(..., description="How late the last run started")
+    max_overdue_ms: int
+    last_run: Optional[int] = None
+    last_duration_ms: int
+    runs: int
+    failures: int
+    last_error: Optional[str] = None
+
+class SchedulerTasksResponse(BaseModel):
+    tasks: List[SchedulerTask]
+
 # SSE-specific model
 class SSEMessage(BaseModel):
     event: str = Field(..., description="The type of SSE event")
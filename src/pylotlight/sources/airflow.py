@@ -1,33 +1,53 @@
-from typing import Dict, Any, Type
-from pydantic import ValidationError
-from .base import BaseSource
+import re
+from typing import Any, Dict, Optional, Type
+from .base import BaseSource, line_level
 from pylotlight.schemas.log_events import (
     LogEventBase,
     AirflowHealthCheckEvent,
     AirflowImportErrorEvent,
     AirflowFailedDagEvent,
-    GenericLogEvent
+    AirflowConnectionErrorEvent,
+    AirflowTaskLogEvent,
 )
 
+# [2024-05-01T10:00:00.123+0000] {taskinstance.py:1234} ERROR - Task failed with exception
+_TASK_LOG_LINE = re.compile(r'^\[(?P<timestamp>[^\]]+)\] \{[^}]*\} (?P<level>[A-Z]+) - (?P<message>.*)$')
+# .../dag_id=my_dag/run_id=scheduled__2024-05-01/task_id=my_task[/map_index=0]/attempt=1.log
+_TASK_LOG_PATH = re.compile(r'dag_id=(?P<dag_id>[^/]+)/run_id=(?P<run_id>[^/]+)/task_id=(?P<task_id>[^/]+)'
+                            r'(?:/map_index=-?\d+)?/attempt=(?P<try_number>\d+)\.log$')
+
 class AirflowSource(BaseSource):
+    name = "Airflow"
+
     @property
     def source_types(self) -> Dict[str, Type[LogEventBase]]:
         return {
             "health_check": AirflowHealthCheckEvent,
             "airflow_import_error": AirflowImportErrorEvent,
             "airflow_failed_dag": AirflowFailedDagEvent,
+            "airflow_connection_error": AirflowConnectionErrorEvent,
+            "airflow_task_log": AirflowTaskLogEvent,
         }
 
-    def validate_and_process(self, log_event_dict: Dict[str, Any]) -> LogEventBase:
-        source_type = log_event_dict.get("source_type")
-        if source_type not in self.source_types:
-            raise ValueError(f"Unknown Airflow source type: {source_type}")
-        
-        event_class = self.source_types[source_type]
-        try:
-            return event_class(**log_event_dict)
-        except ValidationError as e:
-            # Log the validation error
-            print(f"Validation error for {source_type}: {str(e)}, falling back to GenericLogEvent")
-            # Fall back to GenericLogEvent
-            return GenericLogEvent(**log_event_dict)
\ No newline at end of file
+    def parse_line(self, line: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Parses Airflow task log lines; the task is taken from the log file's path."""
+        match = _TASK_LOG_LINE.match(line)
+        if not match:
+            return None
+        if 'task' not in context:
+            path_match = _TASK_LOG_PATH.search(context.get('path', ''))
+            context['task'] = path_match.groupdict() if path_match else {}
+        timestamp = match.group('timestamp')
+        # Airflow writes offsets without a colon (+0000)
+        if re.search(r'[+-]\d{4}$', timestamp):
+            timestamp = f"{timestamp[:-2]}:{timestamp[-2:]}"
+        log_level, status_type = line_level(match.group('level'))
+        return {
+            'timestamp': timestamp,
+            'source': 'airflow',
+            'source_type': 'airflow_task_log',
+            'status_type': status_type,
+            'log_level': log_level,
+            'message': match.group('message'),
+            **context['task'],
+        }
@@ -1,23 +1,73 @@
+import json
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional, Tuple, Union
 from pydantic import BaseModel
+from pylotlight.schemas.log_events import LogEventBase, validate_log_event
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = {'debug': 'DEBUG', 'info': 'INFO', 'warn': 'WARNING', 'warning': 'WARNING',
+              'error': 'ERROR', 'critical': 'CRITICAL', 'fatal': 'CRITICAL'}
+
+def line_level(level: Optional[str]) -> Tuple[str, str]:
+    """Maps a log line's level to the (log_level, status_type) of its event."""
+    log_level = LOG_LEVELS.get((level or '').strip().lower(), 'INFO')
+    if log_level in ('ERROR', 'CRITICAL'):
+        return log_level, 'failure'
+    if log_level == 'WARNING':
+        return log_level, 'incident'
+    return log_level, 'normal'
 
 class BaseSource(ABC):
+    name: str = ""
+
     @property
     @abstractmethod
     def source_types(self) -> Dict[str, type]:
         pass
 
-    @abstractmethod
-    def validate_and_process(self, log_event_dict: Dict[str, Any]) -> BaseModel:
+    def validate_and_process(self, log_event: Union[Dict[str, Any], LogEventBase]) -> BaseModel:
+        """
+        Validates the given log event and processes it into a pydantic model.
+
+        Args:
+            log_event: The log event dictionary, or an already parsed log event model.
+
+        Returns:
+            A pydantic model representing the validated log event. Models that are
+            already of the right type are returned without being rebuilt.
+        """
+        source_type = log_event.source_type if isinstance(log_event, LogEventBase) else log_event.get("source_type")
+        if source_type not in self.source_types:
+            raise ValueError(f"Unknown {self.name} source type: {source_type}")
+
+        parsed_log = validate_log_event(log_event)
+        if not isinstance(parsed_log, self.source_types[source_type]):
+            logger.warning(f"Validation failed for {self.name} {source_type} event, falling back to GenericLogEvent")
+        return parsed_log
+
+    def parse_line(self, line: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Validates the given log event dictionary and processes it into a
-        pydantic model.
+        Parses one line of a log file tailed by the agent into a log event dictionary.
 
         Args:
-            log_event_dict: The log event dictionary to validate and process.
+            line: The line, without its trailing newline.
+            context: Per-file state kept across lines. It holds the file's 'path',
+                and the agent keeps the file's previous event under 'last_event'.
 
         Returns:
-            A pydantic model representing the validated log event.
+            The event, or None for lines that are not events of their own. The agent
+            appends those to context['last_event'] (e.g. traceback lines), if set.
+            By default, lines holding a JSON object are taken as events.
         """
-        pass
\ No newline at end of file
+        if not line.startswith('{'):
+            return None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(event, dict):
+            return None
+        event.setdefault('source', self.name.lower())
+        return event
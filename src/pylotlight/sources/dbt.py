@@ -1,28 +1,76 @@
-from typing import Dict, Any, Type
-from pydantic import ValidationError
-from .base import BaseSource
+import re
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Type
+from .base import BaseSource, line_level
 from pylotlight.schemas.log_events import (
     LogEventBase,
     DbtLogEvent,
-    GenericLogEvent
 )
+
+# ============================== 2024-05-01 10:00:00.123456 | 1f2e3d4c-... ==============================
+_RUN_HEADER = re.compile(r'^=+ (?P<date>\d{4}-\d{2}-\d{2}) [\d:.]+ \| (?P<run_id>[0-9a-fA-F-]+) =+$')
+# 10:00:01.123456 [info ] [MainThread]: Running with dbt=1.7.0
+_TEXT_LINE = re.compile(r'^(?P<time>\d{2}:\d{2}:\d{2}(?:\.\d+)?)\s+\[(?P<level>\w+)\s*\]\s+\[[^\]]*\]:\s?(?P<message>.*)$')
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+
 class DbtSource(BaseSource):
+    name = "dbt"
+
     @property
     def source_types(self) -> Dict[str, Type[LogEventBase]]:
         return {
             "dbt": DbtLogEvent,
+            "dbt_log": DbtLogEvent,
+        }
+
+    def parse_line(self, line: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Parses dbt.log lines, in either dbt's text or JSON (--log-format json) format."""
+        if line.startswith('{'):
+            return self._parse_json_line(line)
+
+        line = _ANSI.sub('', line)
+        header = _RUN_HEADER.match(line)
+        if header:
+            # Each invocation starts with a header carrying the date and invocation id
+            context['date'] = header.group('date')
+            context['run_id'] = header.group('run_id')
+            context['last_event'] = None
+            return None
+
+        match = _TEXT_LINE.match(line)
+        if not match:
+            return None
+        date = context.get('date') or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        log_level, status_type = line_level(match.group('level'))
+        return {
+            'timestamp': f"{date}T{match.group('time')}",
+            'source': 'dbt',
+            'source_type': 'dbt_log',
+            'status_type': status_type,
+            'log_level': log_level,
+            'message': match.group('message'),
+            'run_id': context.get('run_id'),
         }
 
-    def validate_and_process(self, log_event_dict: Dict[str, Any]) -> LogEventBase:
-        source_type = log_event_dict.get("source_type")
-        if source_type not in self.source_types:
-            raise ValueError(f"Unknown dbt source type: {source_type}")
-        
-        event_class = self.source_types[source_type]
+    def _parse_json_line(self, line: str) -> Optional[Dict[str, Any]]:
         try:
-            return event_class(**log_event_dict)
-        except ValidationError as e:
-            # Log the validation error
-            print(f"Validation error for {source_type}: {str(e)}")
-            # Fall back to GenericLogEvent
-            return GenericLogEvent(**log_event_dict)
\ No newline at end of file
+            record = json.loads(line)
+        except ValueError:
+            return None
+        info = record.get('info') if isinstance(record, dict) else None
+        if not isinstance(info, dict):
+            return None
+        node_info = (record.get('data') or {}).get('node_info') or {}
+        log_level, status_type = line_level(info.get('level'))
+        return {
+            'timestamp': info.get('ts'),
+            'source': 'dbt',
+            'source_type': 'dbt_log',
+            'status_type': status_type,
+            'log_level': log_level,
+            'message': info.get('msg', ''),
+            'model_name': node_info.get('node_name'),
+            'node_id': node_info.get('unique_id'),
+            'run_id': info.get('invocation_id'),
+        }
@@ -0,0 +1,40 @@
+"""
+Redis pubsub channels for SSE fan-out. Events are published per
+(source, source_type, status_type, log_level), so SSE subscribers can be
+filtered on the channel name alone, without decoding any payloads.
+
+Components are producer-controlled, so '%' and ':' in them are percent-escaped
+to keep the channel's four parts apart.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+SSE_CHANNEL = 'sse_channel'
+SSE_CHANNEL_PATTERN = f"{SSE_CHANNEL}:*"
+
+ChannelKey = Tuple[str, str, str, str]
+
+def _escape(component: str) -> str:
+    return str(component).replace('%', '%25').replace(':', '%3A')
+
+def channel_for(source: str, source_type: str, status_type: str, log_level: str) -> str:
+    return ":".join([SSE_CHANNEL, *map(_escape, (source, source_type, status_type, log_level))])
+
+def parse_channel(channel: str) -> Optional[ChannelKey]:
+    """Returns (source, source_type, status_type, log_level)."""
+    prefix = f"{SSE_CHANNEL}:"
+    if not channel.startswith(prefix):
+        return None
+    parts = channel[len(prefix):].split(":")
+    return tuple(unquote(part) for part in parts) if len(parts) == 4 else None
+
+def batch_payload(payloads: List[bytes]) -> bytes:
+    return payloads[0] if len(payloads) == 1 else b"[" + b",".join(payloads) + b"]"
+
+def group_by_channel(events: Iterable[Tuple[object, bytes]]) -> Dict[str, bytes]:
+    """Groups (log event, JSON payload) pairs into one message per channel, keeping their order."""
+    grouped: Dict[str, List[bytes]] = {}
+    for event, payload in events:
+        channel = channel_for(event.source, event.source_type, event.status_type, event.log_level)
+        grouped.setdefault(channel, []).append(payload)
+    return {channel: batch_payload(payloads) for channel, payloads in grouped.items()}
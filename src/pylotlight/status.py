@@ -0,0 +1,57 @@
+"""
+Current status snapshot: the latest event for every service/component, kept in
+a Redis hash so the UI can load the full platform state in a single read.
+"""
+import calendar
+from datetime import datetime
+from typing import Any, Dict, Iterable, Tuple, Union
+from redis import Redis
+
+STATUS_KEY = 'status_snapshot'
+# Timestamps of the stored events, so a late batch never overwrites a newer status
+STATUS_TIMESTAMPS_KEY = 'status_snapshot:timestamps'
+
+# Services shown by the UI; keep in sync with get_status_key in ui/app.py
+SERVICES = ['airflow', 'dbt', 'database', 'ci']
+
+_UPDATE_SCRIPT = """
+for i = 1, #ARGV, 3 do
+    local current = tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '-1')
+    if tonumber(ARGV[i + 1]) >= current then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+    end
+end
+return 1
+"""
+
+def get_status_key(source: str) -> Tuple[str, str]:
+    """Maps an event's source to the (service, component) it updates, as the UI's process_update does."""
+    service = next((s for s in SERVICES if s in source), source)
+    component = source.replace(f"{service}_", "")
+    return service, component
+
+def _epoch_ms(timestamp: datetime) -> int:
+    # Naive timestamps are taken as UTC
+    return calendar.timegm(timestamp.utctimetuple()) * 1000 + timestamp.microsecond // 1000
+
+def update_status_snapshot(redis_client: Redis, events: Iterable[Tuple[Any, Union[str, bytes]]]):
+    """
+    Records the newest event for each service/component in one atomic script call.
+
+    Args:
+        events: (parsed log event, JSON payload) pairs from a persisted batch.
+    """
+    latest: Dict[str, Tuple[int, str]] = {}
+    for parsed_log, payload in events:
+        service, component = get_status_key(parsed_log.source)
+        field = f"{service}:{component}"
+        timestamp = _epoch_ms(parsed_log.timestamp)
+        if field not in latest or timestamp >= latest[field][0]:
+            latest[field] = (timestamp, payload)
+    if not latest:
+        return
+    args = []
+    for field, (timestamp, payload) in latest.items():
+        args.extend([field, timestamp, payload])
+    redis_client.eval(_UPDATE_SCRIPT, 2, STATUS_KEY, STATUS_TIMESTAMPS_KEY, *args)
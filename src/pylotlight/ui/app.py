@@ -68,9 +68,16 @@ def get_status_icon_and_color(status_type: str) -> Tuple[str, str]:
     else:
         return "🔧", "blue"  # For maintenance or unknown status
 
-async def fetch_sse_events() -> Any:
+# Sent by the API when the events since our Last-Event-ID can't be replayed
+RESET_EVENT = "reset"
+
+async def fetch_sse_events(last_event_id: Optional[str] = None) -> Any:
+    headers = {'Accept': 'text/event-stream'}
+    if last_event_id:
+        # Resume where the previous connection left off
+        headers['Last-Event-ID'] = last_event_id
     async with aiohttp.ClientSession() as session:
-        async with session.get(f"{API_BASE_URL}/sse", headers={'Accept': 'text/event-stream'}) as response:
+        async with session.get(f"{API_BASE_URL}/sse", headers=headers) as response:
             buffer = ""
             async for line in response.content:
                 if line:
@@ -78,12 +85,13 @@ async def fetch_sse_events() -> Any:
                     buffer += decoded_line + "\n"
                     
                     if buffer.endswith("\n\n"):
+                        event_id = next((l.split(":", 1)[1].strip() for l in buffer.split("\n") if l.startswith("id:")), None)
                         event = parse_sse_event(buffer.strip())
                         if event:
-                            yield event
+                            yield event_id, event
                         buffer = ""
 
-def parse_sse_event(event_data: str) -> Optional[Dict[str, Any]]:
+def parse_sse_event(event_data: str) -> Optional[Any]:
     lines = event_data.split("\n")
     event_type = None
     data = []
@@ -97,6 +105,8 @@ def parse_sse_event(event_data: str) -> Optional[Dict[str, Any]]:
     if event_type == "ping":
         logger.debug("Received ping event")
         return None
+    elif event_type == RESET_EVENT:
+        return RESET_EVENT
     elif event_type == "update" and data:
         full_data = " ".join(data).strip()
         if full_data:
@@ -126,14 +136,35 @@ def get_severity(status_type: str) -> int:
     else:
         return Severity.NO_ISSUES.value
 
+def get_status_key(source: str) -> Tuple[str, str]:
+    # Keep in sync with get_status_key in pylotlight/status.py, which keys the /status snapshot
+    service = next((s for s in ['airflow', 'dbt', 'database', 'ci'] if s in source), source)
+    component = source.replace(f"{service}_", "")
+    return service, component
+
+async def fetch_status_snapshot() -> List[Dict[str, Any]]:
+    """Returns the latest event of every component, oldest first, for replay through process_update."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{API_BASE_URL}/status") as response:
+            response.raise_for_status()
+            snapshot = await response.json()
+    events = [event for components in snapshot.get('statuses', {}).values() for event in components.values()]
+    return sorted(events, key=lambda event: event.get('timestamp', ''))
+
+async def hydrate_statuses() -> None:
+    try:
+        for event in await fetch_status_snapshot():
+            process_update(event)
+    except aiohttp.ClientError as e:
+        logger.error(f"Failed to load status snapshot: {e}")
+
 def process_update(update: Dict[str, Any]) -> bool:
     if 'source' in update and 'status_type' in update:
         source = update['source']
         status_type = update['status_type']
         
         # Map the source to the correct key in st.session_state.statuses
-        service = next((s for s in ['airflow', 'dbt', 'database', 'ci'] if s in source), source)
-        component = source.replace(f"{service}_", "")
+        service, component = get_status_key(source)
         
         if service in st.session_state.statuses:
             severity = get_severity(status_type)
@@ -285,6 +316,10 @@ async def main() -> None:
         st.session_state.timelines= {service: EventTimeline() for service in st.session_state.statuses}
     if 'error_states' not in st.session_state:
         st.session_state.error_states = {service: ErrorState() for service in st.session_state.statuses}
+    if 'hydrated' not in st.session_state:
+        # Start from the current state instead of waiting for the next events
+        await hydrate_statuses()
+        st.session_state.hydrated = True
 
     # Main Streamlit UI
     st.title("Pylot Light Status Page")
@@ -298,8 +333,17 @@ async def main() -> None:
             update_ui()
         
         try:
-            async for event in fetch_sse_events():
-                if event and process_update(event):
+            async for event_id, event in fetch_sse_events(st.session_state.get('last_event_id')):
+                if event_id:
+                    st.session_state.last_event_id = event_id
+                if event == RESET_EVENT:
+                    # Missed events are gone from the API's replay buffer, reload the snapshot
+                    await hydrate_statuses()
+                    st.rerun()
+                # Frames can carry several coalesced events as a JSON array
+                updates = event if isinstance(event, list) else [event]
+                updated = [process_update(update) for update in updates if update]
+                if any(updated):
                     st.rerun()
         except aiohttp.ClientError as e:
             logger.error(f"Connection error: {e}")
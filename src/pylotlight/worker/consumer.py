@@ -0,0 +1,234 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from redis import Redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+# (stream, entry id, fields)
+StreamEntry = Tuple[str, bytes, Optional[dict]]
+
+def entry_time_ms(entry_id: bytes) -> int:
+    """Stream entry ids start with the millisecond timestamp they were added at."""
+    return int(entry_id.split(b'-', 1)[0])
+
+def _id_key(entry_id: bytes) -> Tuple[int, int]:
+    milliseconds, _, sequence = entry_id.partition(b'-')
+    return int(milliseconds), int(sequence or 0)
+
+class LogStreamConsumer:
+    """
+    Reads log events from one or more Redis Streams as a member of a consumer group.
+
+    Entries stay in the group's pending list until they are acked, so an event
+    is only dropped from the stream once the worker has persisted it. Entries
+    left pending by a consumer that died are reclaimed after claim_idle_ms.
+    Entries delivered more than max_deliveries times are moved to the
+    dead_letter_stream instead of being retried again.
+    """
+
+    def __init__(self, redis_client: Redis, streams: List[str], group: str, consumer: str,
+                 claim_idle_ms: int = 60000, claim_interval: float = 30.0, max_deliveries: int = 5,
+                 dead_letter_stream: Optional[str] = None, dead_letter_maxlen: int = 100000):
+        self.redis = redis_client
+        self.streams = streams
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.max_deliveries = max_deliveries
+        self.dead_letter_stream = dead_letter_stream
+        self.dead_letter_maxlen = dead_letter_maxlen
+        # Start by re-reading our own pending entries, left over from a previous run
+        self._read_ids: Dict[str, str] = {stream: '0' for stream in streams}
+        self._claim_cursors: Dict[str, str] = {stream: '0-0' for stream in streams}
+        self._last_claim = 0.0
+        # Set after a failed batch: pending entries are retried one at a time
+        self._isolate = False
+
+    def reset(self):
+        """
+        Re-reads this consumer's pending entries from the start after a batch
+        failed, so they are retried before newer entries and keep their order.
+        They are retried one at a time, so an entry that keeps failing only
+        holds back itself until it is dead-lettered.
+        """
+        self._read_ids = {stream: '0' for stream in self.streams}
+        self._isolate = True
+
+    def ensure_group(self):
+        for stream in self.streams:
+            try:
+                self.redis.xgroup_create(stream, self.group, id='0', mkstream=True)
+                logger.info(f"Created consumer group {self.group} on {stream}")
+            except ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    def _backlog_pending(self) -> bool:
+        return any(read_id != '>' for read_id in self._read_ids.values())
+
+    def claim_stale(self, count: int) -> List[StreamEntry]:
+        """Takes over entries that another consumer read but never acked."""
+        self._last_claim = time.monotonic()
+        claimed: List[StreamEntry] = []
+        for stream in self.streams:
+            if len(claimed) >= count:
+                break
+            response = self.redis.xautoclaim(stream, self.group, self.consumer,
+                                             min_idle_time=self.claim_idle_ms,
+                                             start_id=self._claim_cursors[stream], count=count - len(claimed))
+            self._claim_cursors[stream] = response[0]
+            claimed.extend((stream, entry_id, fields) for entry_id, fields in response[1])
+        if claimed:
+            logger.warning(f"Reclaimed {len(claimed)} stale entries for {self.consumer}")
+        return self._dead_letter(claimed)
+
+    def _dead_letter(self, entries: List[StreamEntry]) -> List[StreamEntry]:
+        """Moves redelivered entries past max_deliveries to the dead-letter stream, returning the others."""
+        if not entries or self.dead_letter_stream is None or self.max_deliveries <= 0:
+            return entries
+        by_stream: Dict[str, List[bytes]] = {}
+        for stream, entry_id, _ in entries:
+            by_stream.setdefault(stream, []).append(entry_id)
+        deliveries: Dict[Tuple[str, bytes], int] = {}
+        for stream, entry_ids in by_stream.items():
+            pending = self.redis.xpending_range(stream, self.group, min=min(entry_ids, key=_id_key),
+                                               max=max(entry_ids, key=_id_key), count=len(entry_ids),
+                                               consumername=self.consumer)
+            for item in pending:
+                deliveries[(stream, item['message_id'])] = item['times_delivered']
+        dead = [entry for entry in entries if deliveries.get(entry[:2], 0) > self.max_deliveries]
+        if not dead:
+            return entries
+        pipe = self.redis.pipeline(transaction=False)
+        for stream, entry_id, fields in dead:
+            pipe.xadd(self.dead_letter_stream, {**(fields or {}), 'stream': stream, 'entry_id': entry_id},
+                      maxlen=self.dead_letter_maxlen, approximate=True)
+            pipe.xack(stream, self.group, entry_id)
+            pipe.xdel(stream, entry_id)
+        pipe.execute()
+        logger.error(f"Moved {len(dead)} entries delivered more than {self.max_deliveries} times "
+                     f"to {self.dead_letter_stream}")
+        return [entry for entry in entries if deliveries.get(entry[:2], 0) <= self.max_deliveries]
+
+    def _read(self, count: int, block_ms: Optional[int]) -> List[StreamEntry]:
+        # Streams still replaying their pending backlog are read without blocking
+        backlog = {stream: read_id for stream, read_id in self._read_ids.items() if read_id != '>'}
+        response = self.redis.xreadgroup(self.group, self.consumer, backlog or self._read_ids,
+                                         count=count, block=None if backlog else block_ms)
+        entries: List[StreamEntry] = []
+        for stream, stream_entries in response or []:
+            stream = stream.decode() if isinstance(stream, bytes) else stream
+            entries.extend((stream, entry_id, fields) for entry_id, fields in stream_entries)
+            if stream in backlog and stream_entries:
+                self._read_ids[stream] = stream_entries[-1][0]
+                del backlog[stream]
+        for stream in backlog:
+            # Nothing left pending on this stream, switch to new entries
+            self._read_ids[stream] = '>'
+        return entries
+
+    def read_batch(self, max_size: int, max_wait_ms: int, idle_block_ms: int = 5000) -> List[StreamEntry]:
+        """
+        Waits up to idle_block_ms for the first entry, then keeps reading until
+        max_size entries are collected or max_wait_ms has passed. XREADGROUP
+        applies its count per stream, so a read over several shards can return
+        a little more than max_size.
+        """
+        batch: List[StreamEntry] = []
+        backlog_size = 1 if self._isolate else max_size
+        while self._backlog_pending() and len(batch) < backlog_size:
+            batch.extend(self._dead_letter(self._read(backlog_size - len(batch), None)))
+        if self._isolate:
+            if batch:
+                return batch
+            self._isolate = False
+
+        # Claimed entries join our own pending list, so only claim once that backlog is read
+        if len(batch) < max_size and time.monotonic() - self._last_claim >= self.claim_interval:
+            batch.extend(self.claim_stale(max_size - len(batch)))
+
+        if not batch:
+            batch.extend(self._read(max_size, idle_block_ms))
+            if not batch:
+                return batch
+
+        deadline = time.monotonic() + max_wait_ms / 1000
+        while len(batch) < max_size:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            entries = self._read(max_size - len(batch), remaining_ms)
+            if not entries:
+                break
+            batch.extend(entries)
+        return batch
+
+    def ack(self, entries: List[StreamEntry]):
+        """Acks a processed batch and drops it from its streams in one round trip."""
+        if not entries:
+            return
+        by_stream: Dict[str, List[bytes]] = {}
+        for stream, entry_id, _ in entries:
+            by_stream.setdefault(stream, []).append(entry_id)
+        pipe = self.redis.pipeline(transaction=False)
+        for stream, entry_ids in by_stream.items():
+            pipe.xack(stream, self.group, *entry_ids)
+            pipe.xdel(stream, *entry_ids)
+        pipe.execute()
+
+class ConsumerStats:
+    """
+    Throughput and queue-lag counters for one consumer process, published to a
+    Redis hash so the API can report on the whole pool.
+    """
+    KEY_PREFIX = 'worker_stats:'
+
+    def __init__(self, redis_client: Redis, consumer: str, streams: List[str],
+                 ttl: int = 60, flush_interval: float = 1.0):
+        self.redis = redis_client
+        self.key = f"{self.KEY_PREFIX}{consumer}"
+        self.consumer = consumer
+        self.streams = streams
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.events_total = 0
+        self.batches_total = 0
+        self.lag_ms = 0
+        self._window_events = 0
+        self._window_start = time.monotonic()
+
+    def record_batch(self, entries: List[StreamEntry]):
+        self.batches_total += 1
+        self.events_total += len(entries)
+        self._window_events += len(entries)
+        if entries:
+            # How long the oldest entry in the batch waited in the queue before it was committed
+            self.lag_ms = max(0, int(time.time() * 1000) - min(entry_time_ms(entry_id) for _, entry_id, _ in entries))
+        self.flush()
+
+    def flush(self, force: bool = False):
+        elapsed = time.monotonic() - self._window_start
+        if not force and elapsed < self.flush_interval:
+            return
+        events_per_sec = self._window_events / elapsed if elapsed > 0 else 0.0
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.key, mapping={
+            'consumer': self.consumer,
+            'pid': os.getpid(),
+            'streams': ','.join(self.streams),
+            'events_total': self.events_total,
+            'batches_total': self.batches_total,
+            'events_per_sec': round(events_per_sec, 2),
+            'lag_ms': self.lag_ms,
+            'updated_at': int(time.time()),
+        })
+        pipe.expire(self.key, self.ttl)
+        pipe.execute()
+        self._window_events = 0
+        self._window_start = time.monotonic()
+        if not events_per_sec:
+            self.lag_ms = 0
@@ -0,0 +1,153 @@
+"""
+Worker-side event deduplication. Every event gets a stable fingerprint, which
+is checked against a time-windowed filter in Redis before the event is stored,
+so repeated hook polls, producer retries and re-sent batches don't add rows or
+SSE frames.
+
+Fingerprints are kept in one RedisBloom filter per window (bounded memory,
+with a small false-positive rate), or in a plain set per window when the
+server has no Bloom module. A fingerprint is remembered for between one and
+two windows.
+"""
+import time
+import hashlib
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from redis import Redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+DEDUP_FILTER_PREFIX = 'event_dedup_filter:'
+DEDUP_STATS_KEY = 'event_dedup:stats'
+
+# Fields identifying one occurrence, per (source, source_type). Events with a
+# dedup_key use it instead; other events, and events missing one of their
+# identity fields, are only duplicates when their whole payload is identical.
+# Import errors are left out: "No import errors found." events all share their
+# placeholder filename and stack_trace, and an error that comes back must be kept.
+IDENTITY_FIELDS: Dict[Tuple[str, str], Tuple[str, ...]] = {
+    ('airflow', 'airflow_failed_dag'): ('dag_id', 'execution_date', 'try_number'),
+    ('dbt', 'dbt'): ('run_id', 'node_id'),
+}
+
+def event_fingerprint(row: Dict[str, Any], payload: bytes) -> str:
+    """Fingerprint of a stored event, from its database row and JSON payload."""
+    details = row.get('additional_data') or {}
+    source_key = f"{row['source']}\x00{row['source_type']}"
+    values = [details.get(field) for field in IDENTITY_FIELDS.get((row['source'], row['source_type']), ())]
+    if details.get('dedup_key'):
+        identity = f"{source_key}\x00key\x00{details['dedup_key']}".encode()
+    elif values and all(value is not None for value in values):
+        identity = "\x00".join([source_key, 'fields', *map(str, values)]).encode()
+    else:
+        # Without all of its identity fields, an event only matches an identical payload
+        identity = b"payload\x00" + payload
+    return hashlib.sha1(identity).hexdigest()
+
+class EventDeduplicator:
+    """
+    Checks fingerprints against the current and previous window's filter.
+    Fingerprints are only added once their events are stored, so a batch that
+    failed to commit is not taken for a duplicate when it is redelivered.
+    Redis errors fail open: events are stored rather than dropped. With mode
+    'count', duplicates are only counted and still stored.
+    """
+
+    def __init__(self, redis_client: Redis, window_seconds: int = 3600, capacity: int = 1000000,
+                 error_rate: float = 0.0001, mode: str = 'drop'):
+        self.redis = redis_client
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.use_bloom = True
+        self._reserved_window: Optional[int] = None
+
+    def _window(self, now: float) -> int:
+        return int(now // self.window_seconds)
+
+    def _key(self, window: int) -> str:
+        return f"{DEDUP_FILTER_PREFIX}{window}"
+
+    def _ttl(self) -> int:
+        return self.window_seconds * 2 + 60
+
+    def _fall_back(self, e: ResponseError) -> bool:
+        if self.use_bloom and 'unknown command' in str(e).lower():
+            logger.warning("Redis has no Bloom filter module, deduplicating events with sets")
+            self.use_bloom = False
+            return True
+        return False
+
+    def _reserve(self, window: int):
+        """Creates the window's Bloom filter with the configured size, once."""
+        if window == self._reserved_window:
+            return
+        key = self._key(window)
+        try:
+            self.redis.execute_command('BF.RESERVE', key, self.error_rate, self.capacity)
+        except ResponseError as e:
+            if 'exists' not in str(e).lower():
+                raise
+        self.redis.expire(key, self._ttl())
+        self._reserved_window = window
+
+    def duplicates(self, fingerprints: List[str], now: Optional[float] = None) -> List[bool]:
+        """Flags the fingerprints already seen in the filter or earlier in the list."""
+        if not fingerprints:
+            return []
+        window = self._window(time.time() if now is None else now)
+        keys = [self._key(window), self._key(window - 1)]
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                if self.use_bloom:
+                    pipe.execute_command('BF.MEXISTS', key, *fingerprints)
+                else:
+                    pipe.execute_command('SMISMEMBER', key, *fingerprints)
+            found = pipe.execute()
+        except ResponseError as e:
+            if self._fall_back(e):
+                return self.duplicates(fingerprints, now)
+            logger.error(f"Event deduplication check failed, keeping every event: {str(e)}")
+            return [False] * len(fingerprints)
+        except Exception as e:
+            logger.error(f"Event deduplication check failed, keeping every event: {str(e)}")
+            return [False] * len(fingerprints)
+
+        seen = set()
+        flags = []
+        for index, fingerprint in enumerate(fingerprints):
+            flags.append(fingerprint in seen or any(int(result[index]) for result in found))
+            seen.add(fingerprint)
+        return flags
+
+    def remember(self, fingerprints: List[str], hits: Counter, misses: int, now: Optional[float] = None):
+        """Adds the stored events' fingerprints to the current window and counts the batch's hits and misses."""
+        window = self._window(time.time() if now is None else now)
+        key = self._key(window)
+        try:
+            if self.use_bloom:
+                self._reserve(window)
+            pipe = self.redis.pipeline(transaction=False)
+            if fingerprints:
+                if self.use_bloom:
+                    pipe.execute_command('BF.MADD', key, *fingerprints)
+                else:
+                    pipe.sadd(key, *fingerprints)
+                    pipe.expire(key, self._ttl())
+            pipe.hincrby(DEDUP_STATS_KEY, 'misses', misses)
+            pipe.hincrby(DEDUP_STATS_KEY, 'hits', sum(hits.values()))
+            for source_key, count in hits.items():
+                pipe.hincrby(DEDUP_STATS_KEY, f"hits:{source_key}", count)
+            pipe.hset(DEDUP_STATS_KEY, mapping={'backend': 'bloom' if self.use_bloom else 'set', 'mode': self.mode})
+            pipe.execute()
+        except ResponseError as e:
+            if self._fall_back(e):
+                self.remember(fingerprints, hits, misses, now)
+                return
+            logger.error(f"Failed to record event fingerprints: {str(e)}")
+        except Exception as e:
+            logger.error(f"Failed to record event fingerprints: {str(e)}")
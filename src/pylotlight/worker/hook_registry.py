@@ -0,0 +1,62 @@
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple, Type
+from redis import Redis
+from pylotlight.hooks.base_hook import BaseHook
+
+logger = logging.getLogger(__name__)
+
+class HookRegistry:
+    """
+    Keeps one long-lived hook object per hook instance, so HTTP sessions and
+    incremental polling state survive across runs. An instance is closed and
+    rebuilt only when its class or parameters change.
+    """
+
+    def __init__(self, redis_client: Redis):
+        self.redis = redis_client
+        self.hook_classes: Dict[str, Type[BaseHook]] = {}
+        self._instances: Dict[str, Tuple[str, BaseHook]] = {}
+        self._lock = threading.Lock()
+
+    def register_class(self, hook_class: Type[BaseHook]):
+        self.hook_classes[hook_class.__name__] = hook_class
+
+    @staticmethod
+    def fingerprint(hook_class: str, params: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps([hook_class, params], sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, instance_id: str, hook_class: str, params: Optional[Dict[str, Any]] = None) -> BaseHook:
+        params = params or {}
+        fingerprint = self.fingerprint(hook_class, params)
+        with self._lock:
+            current = self._instances.get(instance_id)
+            if current is not None and current[0] == fingerprint:
+                return current[1]
+            if hook_class not in self.hook_classes:
+                raise ValueError(f"Unknown hook class: {hook_class}")
+            hook = self.hook_classes[hook_class](self.redis, **params)
+            self._instances[instance_id] = (fingerprint, hook)
+        if current is not None:
+            logger.info(f"Configuration of hook {instance_id} changed, rebuilding it")
+            self._close(instance_id, current[1])
+        return hook
+
+    def discard(self, instance_id: str):
+        with self._lock:
+            current = self._instances.pop(instance_id, None)
+        if current is not None:
+            self._close(instance_id, current[1])
+
+    def close_all(self):
+        for instance_id in list(self._instances):
+            self.discard(instance_id)
+
+    @staticmethod
+    def _close(instance_id: str, hook: BaseHook):
+        try:
+            hook.close()
+        except Exception as e:
+            logger.warning(f"Error closing hook {instance_id}: {str(e)}")
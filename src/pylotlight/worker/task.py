@@ -1,14 +1,24 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pylotlight.hooks.base_hook import BaseHook
+from pylotlight.scheduler import CATCH_UP_LATEST
+from pylotlight.config import Config
 
 class Task:
-    def __init__(self, hook: BaseHook, interval: int):
+    def __init__(self, hook: BaseHook, interval: int, task_id: Optional[str] = None, jitter: float = 0,
+                 catch_up: str = CATCH_UP_LATEST, timeout: float = Config.TASK_TIMEOUT):
         self.hook = hook
         self.interval = interval
+        self.task_id = task_id or getattr(hook, 'instance_id', hook.__class__.__name__)
+        # Up to this many seconds are added at random to each run time, to spread out load
+        self.jitter = jitter
+        # What to do about runs missed while no worker was available, see pylotlight.scheduler
+        self.catch_up = catch_up
+        # Wall-clock limit on a single run of the hook, in seconds
+        self.timeout = timeout
         self.last_run = 0
 
     def should_run(self, current_time: int) -> bool:
         return current_time - self.last_run >= self.interval
 
     def run(self) -> List[Dict[str, Any]]:
-        return self.hook.push_events()
\ No newline at end of file
+        return self.hook.push_events()
@@ -1,12 +1,21 @@
 import json
 import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 from redis import Redis
 from datetime import datetime
 from pylotlight.worker.task import Task
 from pylotlight.hooks.base_hook import BaseHook
 from pylotlight.hooks.airflow_hook import AirflowHook
+from pylotlight.hooks.async_airflow_hook import AsyncAirflowHook
+from pylotlight.hooks.dbt_hook import DbtArtifactHook
+from pylotlight.log_stream import stream_key_for, stream_entry
+from pylotlight.config import Config
+from pylotlight.scheduler import CATCH_UP_LATEST, TaskClaim, TaskScheduler
+from pylotlight.worker.hook_registry import HookRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -16,65 +25,252 @@ class DateTimeEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
+class ChangeDetector:
+    """
+    Forwards hook events only when the state they report changes.
+
+    A hook's events are grouped by (source, source_type), and each group is
+    fingerprinted on everything except its timestamps. A group is forwarded
+    when its fingerprint differs from the last one sent. Otherwise only its
+    first event is re-sent, as a heartbeat, once heartbeat_interval has
+    passed. Groups missing from a poll are forgotten, so they count as a
+    transition when they come back. Events with a dedup_key are one-off
+    occurrences rather than state, and are always forwarded.
+    """
+    KEY_PREFIX = 'hook_change_state:'
+
+    def __init__(self, redis_client: Redis, heartbeat_interval: int):
+        self.redis = redis_client
+        self.heartbeat_interval = heartbeat_interval
+
+    @staticmethod
+    def fingerprint(events: List[Any]) -> str:
+        members = sorted(json.dumps(event.model_dump(mode='json', exclude={'timestamp'}), sort_keys=True) for event in events)
+        return hashlib.sha1("\n".join(members).encode()).hexdigest()
+
+    def filter(self, hook_id: str, events: List[Any], current_time: int) -> Tuple[List[Any], Dict[str, Any]]:
+        """Returns the events to forward, and the state changes to commit once they are queued."""
+        groups: Dict[str, List[Any]] = {}
+        forwarded = []
+        for event in events:
+            if getattr(event, 'dedup_key', None):
+                forwarded.append(event)
+            else:
+                groups.setdefault(f"{event.source}:{event.source_type}", []).append(event)
+
+        known = {field.decode(): value.decode() for field, value in self.redis.hgetall(f"{self.KEY_PREFIX}{hook_id}").items()}
+        updates: Dict[str, Any] = {'set': {}, 'delete': [key for key in known if key not in groups]}
+        for key, group in groups.items():
+            fingerprint = self.fingerprint(group)
+            last_fingerprint, _, sent_at = known.get(key, '').partition('|')
+            if fingerprint != last_fingerprint:
+                forwarded.extend(group)
+            elif current_time - int(sent_at) >= self.heartbeat_interval:
+                forwarded.append(group[0])
+            else:
+                continue
+            updates['set'][key] = f"{fingerprint}|{current_time}"
+        return forwarded, updates
+
+    def commit(self, hook_id: str, updates: Dict[str, Any]):
+        key = f"{self.KEY_PREFIX}{hook_id}"
+        pipe = self.redis.pipeline(transaction=False)
+        if updates['set']:
+            pipe.hset(key, mapping=updates['set'])
+        if updates['delete']:
+            pipe.hdel(key, *updates['delete'])
+        pipe.execute()
+
 class TaskQueue:
-    def __init__(self, redis_client: Redis):
+    """
+    Runs hook tasks on the shared Redis schedule. Every worker registers its
+    configured tasks, then claims whichever tasks are due, so tasks are spread
+    over the workers and none is polled twice.
+    """
+
+    def __init__(self, redis_client: Redis, worker_id: str = Config.WORKER_CONSUMER_NAME):
         self.redis = redis_client
-        self.task_queue_key = 'task_queue'
-        self.hook_classes: Dict[str, Type[BaseHook]] = {}
+        self.worker_id = worker_id
+        self.scheduler = TaskScheduler(redis_client, lease_seconds=Config.TASK_LEASE_SECONDS,
+                                       max_catch_up=Config.TASK_MAX_CATCH_UP, lease_margin=Config.TASK_LEASE_MARGIN)
+        self.dedup_key_prefix = 'event_dedup:'
+        # Hooks are kept across runs so their connection pools and polling state stay warm
+        self.registry = HookRegistry(redis_client)
+        self._class_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Tasks whose hook is still running in a thread, possibly past its timeout
+        self._busy: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.change_detector = ChangeDetector(redis_client, Config.HOOK_HEARTBEAT_INTERVAL) if Config.HOOK_CHANGE_DETECTION else None
         self.register_hook(AirflowHook)
+        self.register_hook(AsyncAirflowHook)
+        self.register_hook(DbtArtifactHook)
         # Register other hooks as needed
 
     def register_hook(self, hook_class: Type[BaseHook]):
-        self.hook_classes[hook_class.__name__] = hook_class
+        self.registry.register_class(hook_class)
 
     def add_task(self, task: Task):
-        task_data = {
+        self.scheduler.register(task.task_id, {
             'hook_class': task.hook.__class__.__name__,
-            'hook_params': {},  # We don't need to store hook params anymore
+            'hook_params': getattr(task.hook, 'params', {}),
             'interval': task.interval,
-            'last_run': task.last_run
+            'jitter': task.jitter,
+            'catch_up': task.catch_up,
+            'timeout': task.timeout,
+        })
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        """Builds the task for a claimed task id, reusing its hook unless the definition changed."""
+        definition = self.scheduler.definition(task_id)
+        if definition is None:
+            self.registry.discard(task_id)
+            return None
+        hook = self.registry.get(task_id, definition['hook_class'], definition.get('hook_params'))
+        return Task(hook, definition['interval'], task_id, definition.get('jitter', 0),
+                    definition.get('catch_up', CATCH_UP_LATEST), definition.get('timeout', Config.TASK_TIMEOUT))
+
+    def drop_duplicates(self, events: List[Any]) -> List[Any]:
+        """Drops events whose dedup_key was already queued, claiming the keys of the rest."""
+        keyed = [(index, event.dedup_key) for index, event in enumerate(events) if getattr(event, 'dedup_key', None)]
+        if not keyed:
+            return events
+        pipe = self.redis.pipeline(transaction=False)
+        for _, dedup_key in keyed:
+            pipe.set(f"{self.dedup_key_prefix}{dedup_key}", 1, nx=True, ex=Config.HOOK_DEDUP_TTL)
+        duplicates = {index for (index, _), claimed in zip(keyed, pipe.execute()) if not claimed}
+        if duplicates:
+            logger.info(f"Dropped {len(duplicates)} already queued events")
+        return [event for index, event in enumerate(events) if index not in duplicates]
+
+    def release_dedup_keys(self, events: List[Any]):
+        """Frees the keys of events that could not be queued, so the next poll emits them again."""
+        dedup_keys = [f"{self.dedup_key_prefix}{event.dedup_key}" for event in events if getattr(event, 'dedup_key', None)]
+        if dedup_keys:
+            self.redis.delete(*dedup_keys)
+
+    def queue_events(self, task: Task, events: List[Any], current_time: int):
+        """Filters a finished run's events and adds them to the log streams."""
+        hook_id = getattr(task.hook, 'instance_id', task.task_id)
+        if self.change_detector is not None:
+            events, state_updates = self.change_detector.filter(hook_id, events, current_time)
+        events = self.drop_duplicates(events)
+        pipe = self.redis.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(stream_key_for(event.source, event.source_type), stream_entry(event.model_dump_json(), event))
+        try:
+            pipe.execute()
+        except Exception:
+            self.release_dedup_keys(events)
+            raise
+        task.hook.commit_state()
+        if self.change_detector is not None:
+            self.change_detector.commit(hook_id, state_updates)
+        task.last_run = current_time
+
+    def report_error(self, task: Task, error: str):
+        logger.error(f"Error running task for hook {task.hook.__class__.__name__}: {error}")
+        error_event = {
+            'timestamp': datetime.now().isoformat(),
+            'source': task.hook.__class__.__name__,
+            'source_type': 'task_error',
+            'status_type': 'failure',
+            'log_level': 'ERROR',
+            'message': f"Error running task: {error}",
         }
-        self.redis.lpush(self.task_queue_key, json.dumps(task_data, cls=DateTimeEncoder))
-
-    def get_next_task(self) -> Task:
-        _, task_data = self.redis.brpop(self.task_queue_key)
-        task_dict = json.loads(task_data)
-        hook_class = self.hook_classes.get(task_dict['hook_class'])
-        if hook_class is None:
-            raise ValueError(f"Unknown hook class: {task_dict['hook_class']}")
-        hook = hook_class()  # Initialize hook without parameters
-        task = Task(hook, task_dict['interval'])
-        task.last_run = task_dict.get('last_run', 0)
-        return task
-
-    def run_task(self, task: Task):
-        current_time = int(time.time())
-        if task.should_run(current_time):
+        self.redis.xadd(stream_key_for(error_event['source'], error_event['source_type']),
+                       stream_entry(json.dumps(error_event, cls=DateTimeEncoder)))
+
+    def run_task(self, task: Task) -> Optional[str]:
+        """Runs a task in the calling thread and queues its events; returns the error, if any."""
+        try:
+            self.queue_events(task, task.run(), int(time.time()))
+            return None
+        except Exception as e:
+            self.report_error(task, str(e))
+            return str(e)
+
+    def _class_semaphore(self, hook_class: str) -> asyncio.Semaphore:
+        if hook_class not in self._class_semaphores:
+            limit = Config.HOOK_CLASS_CONCURRENCY.get(hook_class, Config.HOOK_CONCURRENCY)
+            self._class_semaphores[hook_class] = asyncio.Semaphore(limit)
+        return self._class_semaphores[hook_class]
+
+    async def _collect(self, task: Task) -> List[Any]:
+        """Runs the hook under its class's concurrency cap and the task's timeout."""
+        semaphore = self._class_semaphore(task.hook.__class__.__name__)
+        await semaphore.acquire()
+        if task.hook.is_async:
+            # Native coroutines are cancelled outright on timeout
             try:
-                events = task.run()
-                for event in events:
-                    self.redis.lpush('log_queue', json.dumps(event.dict(), cls=DateTimeEncoder))
-                task.last_run = current_time
-            except Exception as e:
-                logger.error(f"Error running task for hook {task.hook.__class__.__name__}: {str(e)}")
-                error_event = {
-                    'timestamp': datetime.now().isoformat(),
-                    'source': task.hook.__class__.__name__,
-                    'status_type': 'failure',
-                    'log_level': 'ERROR',
-                    'message': f"Error running task: {str(e)}",
-                }
-                self.redis.lpush('log_queue', json.dumps(error_event, cls=DateTimeEncoder))
-        
-        # Re-add the task to the queue
-        self.add_task(task)
+                return await asyncio.wait_for(task.hook.push_events_async(), task.timeout)
+            finally:
+                semaphore.release()
 
-    def run(self):
+        # A thread cannot be killed, so a timed-out sync hook keeps its slot and
+        # its task stays busy until the call actually returns
+        self._busy.add(task.task_id)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, task.run)
+
+        def release(_):
+            semaphore.release()
+            self._busy.discard(task.task_id)
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.shield(future), task.timeout)
+
+    async def run_claimed(self, claim: TaskClaim):
+        task = await asyncio.to_thread(self.get_task, claim.task_id)
+        if task is None:
+            # Unregistered while it was queued
+            return
+        if claim.overdue > Config.TASK_OVERDUE_WARNING:
+            logger.warning(f"Task {claim.task_id} started {claim.overdue:.1f}s late")
+        started = time.monotonic()
+        error = None
+        try:
+            if task.task_id in self._busy:
+                raise RuntimeError("Previous run has not returned yet")
+            events = await self._collect(task)
+            # Queued as soon as this hook is done, whatever the other hooks are doing
+            await asyncio.to_thread(self.queue_events, task, events, int(time.time()))
+        except asyncio.TimeoutError:
+            error = f"Timed out after {task.timeout}s"
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        if error:
+            await asyncio.to_thread(self.report_error, task, error)
+        definition = {'interval': task.interval, 'jitter': task.jitter, 'catch_up': task.catch_up}
+        if not await asyncio.to_thread(self.scheduler.complete, claim, definition, time.monotonic() - started, error):
+            logger.warning(f"Lease on task {claim.task_id} expired before it finished; it may have run twice")
+
+    async def run_async(self):
+        """Claims due tasks while there is capacity, and runs each as its own asyncio task."""
+        self._executor = ThreadPoolExecutor(max_workers=Config.TASK_MAX_CONCURRENCY, thread_name_prefix='hook')
+        running: Set[asyncio.Task] = set()
         while True:
             try:
-                task = self.get_next_task()
-                self.run_task(task)
-                time.sleep(max(0, task.interval - (int(time.time()) - task.last_run)))
+                capacity = Config.TASK_MAX_CONCURRENCY - len(running)
+                claims = []
+                if capacity > 0:
+                    claims = await asyncio.to_thread(self.scheduler.claim_due, self.worker_id,
+                                                     min(capacity, Config.TASK_CLAIM_BATCH))
+                for claim in claims:
+                    running_task = asyncio.create_task(self.run_claimed(claim))
+                    running.add(running_task)
+                    running_task.add_done_callback(running.discard)
+                if claims:
+                    continue
+                wait = await asyncio.to_thread(self.scheduler.seconds_until_next)
+                timeout = min(Config.SCHEDULER_POLL_INTERVAL, wait if wait is not None else Config.SCHEDULER_POLL_INTERVAL)
+                if running:
+                    await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(timeout)
             except Exception as e:
                 logger.error(f"Error processing task: {str(e)}")
-                time.sleep(5)  # Wait 5 seconds before retrying after an error
\ No newline at end of file
+                await asyncio.sleep(5)  # Wait 5 seconds before retrying after an error
+
+    def run(self):
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            self.registry.close_all()
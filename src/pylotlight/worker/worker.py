@@ -1,16 +1,33 @@
 import json
+import multiprocessing
 import threading
 import time
 import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 from redis import Redis
+from redis.exceptions import WatchError
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from pylotlight.database.session import SessionLocal, engine
 from pylotlight.database.models.log_event import LogEvent as DBLogEvent
-from pylotlight.schemas.log_events import LogEvent as SchemaLogEvent, GenericLogEvent
+from pylotlight.database.partitions import maintain_partitions
+from pylotlight.database.rollups import upsert_rollups
+from pylotlight.schemas.log_events import LogEventBase, validate_log_event
 from pylotlight.worker.task_queue import TaskQueue
+from pylotlight.worker.consumer import LogStreamConsumer, ConsumerStats
+from pylotlight.worker.dedup import EventDeduplicator, event_fingerprint
+from pylotlight.log_stream import (LEGACY_QUEUE_KEY, LOG_STREAM_GROUP, LOG_STREAM_SHARDS, EventEnvelope, read_entry,
+                                  stream_entry, stream_key, stream_key_for)
 from pylotlight.worker.task import Task
 from pylotlight.hooks.airflow_hook import AirflowHook
+from pylotlight.hooks.async_airflow_hook import AsyncAirflowHook
+from pylotlight.hooks.dbt_hook import DbtArtifactHook
 from pylotlight.config import Config
+from pylotlight.status import update_status_snapshot
+from pylotlight.sse_channels import group_by_channel
 from pydantic import ValidationError
 from pylotlight.sources import get_source_handler, BaseSource
 
@@ -20,65 +37,253 @@ logger = logging.getLogger(__name__)
 config = Config()
 redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT)
 
-def process_event(event: dict):
+deduplicator = (EventDeduplicator(redis, config.EVENT_DEDUP_WINDOW_SECONDS, config.EVENT_DEDUP_CAPACITY,
+                                  config.EVENT_DEDUP_ERROR_RATE, config.EVENT_DEDUP_MODE)
+                if config.EVENT_DEDUP_ENABLED else None)
+
+BASE_FIELDS = {'timestamp', 'source', 'source_type', 'status_type', 'log_level', 'message'}
+
+class EventHeader(NamedTuple):
+    """The fields the status snapshot and SSE routing read from a stored event."""
+    source: str
+    source_type: str
+    status_type: str
+    log_level: str
+    timestamp: datetime
+
+def parse_event(event: dict) -> LogEventBase:
+    # Get the appropriate log source handler
+    source = event.get('source')
     try:
-        # Ensure required fields are present
-        required_fields = ['timestamp', 'source', 'source_type', 'status_type', 'log_level', 'message']
-        for field in required_fields:
-            if field not in event:
-                raise ValidationError(f"Missing required field: {field}")
-
-        # Get the appropriate log source handler
-        source = event['source']
+        return get_source_handler(source).validate_and_process(event)
+    except ValueError as e:
+        logger.warning(f"{str(e)}. Using GenericLogEvent.")
+        return validate_log_event(event)
+
+def to_db_row(parsed_log: LogEventBase) -> Dict[str, Any]:
+    return {
+        'timestamp': parsed_log.timestamp,
+        'source': parsed_log.source,
+        'source_type': parsed_log.source_type,
+        'status_type': parsed_log.status_type,
+        'log_level': parsed_log.log_level,
+        'message': parsed_log.message,
+        'additional_data': parsed_log.model_dump(mode='json', exclude=BASE_FIELDS),
+    }
+
+def trusted_db_row(payload: bytes) -> Dict[str, Any]:
+    """Row of an event dumped from a validated model, read without validating it again."""
+    event = json.loads(payload)
+    row = {field: event[field] for field in BASE_FIELDS}
+    row['timestamp'] = datetime.fromisoformat(event['timestamp'].replace('Z', '+00:00'))
+    row['additional_data'] = {key: value for key, value in event.items() if key not in BASE_FIELDS}
+    return row
+
+def decode_envelope(envelope: EventEnvelope) -> Tuple[Dict[str, Any], Any, bytes]:
+    """
+    Returns the database row, header and SSE payload of an event. Validated
+    payloads are trusted and published as they are; others are validated and
+    re-encoded from their model.
+    """
+    if envelope.validated:
+        row = trusted_db_row(envelope.payload)
+        header = EventHeader(row['source'], row['source_type'], row['status_type'], row['log_level'], row['timestamp'])
+        return row, header, envelope.payload
+    parsed_log = parse_event(json.loads(envelope.payload))
+    return to_db_row(parsed_log), parsed_log, parsed_log.model_dump_json().encode()
+
+def process_events(envelopes: List[EventEnvelope]):
+    """
+    Stores a batch of events in one transaction, then publishes the ones their
+    producer did not already publish to SSE. Invalid events are logged and
+    skipped, and events seen recently are dropped as duplicates; a storage
+    failure is raised so the caller can leave the batch unacknowledged.
+    """
+    decoded = []
+    for envelope in envelopes:
         try:
-            source_handler = get_source_handler(source)
-        except ValueError:
-            logger.warning(f"No specific LogSource handler found for source: {source}. Using GenericLogEvent.")
-            source_handler = None
+            decoded.append((*decode_envelope(envelope), envelope.published))
+        except ValidationError as e:
+            logger.error(f"Validation error processing event: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error processing event: {str(e)}")
 
-        if source_handler:
-            try:
-                parsed_log = source_handler.validate_and_process(event)
-            except Exception as e:
-                logger.error(f"Error processing log with {source} source: {str(e)}")
-                parsed_log = GenericLogEvent(**event)
-        else:
-            parsed_log = GenericLogEvent(**event)
-
-        # Store in database
+    fingerprints = []
+    hits = Counter()
+    misses = 0
+    if deduplicator is not None and decoded:
+        fingerprints = [event_fingerprint(row, payload) for row, _, payload, _ in decoded]
+        flags = deduplicator.duplicates(fingerprints)
+        for (row, _, _, _), duplicate in zip(decoded, flags):
+            if duplicate:
+                hits[f"{row['source']}:{row['source_type']}"] += 1
+        misses = len(flags) - sum(hits.values())
+        if deduplicator.mode == 'drop' and hits:
+            decoded = [event for event, duplicate in zip(decoded, flags) if not duplicate]
+            fingerprints = [fingerprint for fingerprint, duplicate in zip(fingerprints, flags) if not duplicate]
+            logger.info(f"Dropped {sum(hits.values())} duplicate events")
+
+    rows = [row for row, _, _, _ in decoded]
+    stored = [(header, payload) for _, header, payload, _ in decoded]
+    unpublished = [(header, payload) for _, header, payload, published in decoded if not published]
+    if rows:
+        # Store the whole batch with one multi-row INSERT and its rollup counts in a single transaction
         db = SessionLocal()
         try:
-            db_log = DBLogEvent(
-                timestamp=parsed_log.timestamp,
-                source=parsed_log.source,
-                source_type=parsed_log.source_type,
-                status_type=parsed_log.status_type,
-                log_level=parsed_log.log_level,
-                message=parsed_log.message,
-                additional_data=parsed_log.model_dump_json(exclude={'timestamp', 'source', 'source_type', 'status_type', 'log_level', 'message'})
-            )
-            db.add(db_log)
+            db.execute(insert(DBLogEvent), rows)
+            upsert_rollups(db, rows)
             db.commit()
-            # Publish to SSE channel
-            redis.publish('sse_channel', json.dumps(event))
-            logger.info(f"Published event to SSE channel: {json.dumps(event)}")
         finally:
             db.close()
-    except ValidationError as e:
-        logger.error(f"Validation error processing event: {str(e)}")
+    if deduplicator is not None and (fingerprints or hits):
+        deduplicator.remember(fingerprints, hits, misses)
+
+    if not rows:
+        return
+
+    try:
+        update_status_snapshot(redis, stored)
+    except Exception as e:
+        logger.error(f"Error updating status snapshot: {str(e)}")
+
+    if not unpublished:
+        logger.info(f"Stored a batch of {len(rows)} events")
+        return
+    try:
+        # Publish the batch with one message per SSE channel
+        pipe = redis.pipeline(transaction=False)
+        for channel, message in group_by_channel(unpublished).items():
+            pipe.publish(channel, message)
+        pipe.execute()
+        logger.info(f"Stored a batch of {len(rows)} events and published {len(unpublished)}")
     except Exception as e:
-        logger.error(f"Error processing event: {str(e)}")
+        logger.error(f"Error publishing batch of {len(unpublished)} events: {str(e)}")
 
-def process_log_queue():
+def process_event(event: dict):
+    process_events([EventEnvelope(json.dumps(event).encode())])
+
+def process_log_queue(consumer_name: str = config.WORKER_CONSUMER_NAME, shards: Optional[List[int]] = None):
+    streams = [stream_key(shard) for shard in (shards if shards is not None else range(LOG_STREAM_SHARDS))]
+    consumer = LogStreamConsumer(redis, streams, LOG_STREAM_GROUP, consumer_name,
+                                 claim_idle_ms=config.WORKER_CLAIM_IDLE_MS,
+                                 max_deliveries=config.WORKER_MAX_DELIVERIES,
+                                 dead_letter_stream=config.LOG_STREAM_DEAD_LETTER_KEY)
+    stats = ConsumerStats(redis, consumer_name, streams, ttl=config.WORKER_STATS_TTL)
     while True:
         try:
-            # Pop item from Redis list
-            _, log_json = redis.brpop('log_queue')
-            log_data = json.loads(log_json)
-            process_event(log_data)
+            consumer.ensure_group()
+            while True:
+                entries = consumer.read_batch(config.WORKER_BATCH_SIZE, config.WORKER_BATCH_TIMEOUT_MS)
+                if not entries:
+                    stats.flush()
+                    continue
+                envelopes = []
+                for _, _, fields in entries:
+                    try:
+                        # Entries deleted while pending come back without fields
+                        if fields:
+                            envelopes.append(read_entry(fields))
+                    except KeyError as e:
+                        logger.error(f"Dropping entry without an event: {str(e)}")
+                process_events(envelopes)
+                # Only ack once the batch is committed; unacked entries get redelivered
+                consumer.ack(entries)
+                stats.record_batch(entries)
         except Exception as e:
             logger.error(f"Error in process_log_queue: {str(e)}")
             time.sleep(5)  # Wait for 5 seconds before trying again
+            if isinstance(e, OperationalError):
+                # Retrying against a database that is down would only use up the entries' deliveries
+                wait_for_database()
+            # Retry the unacked entries before reading newer ones
+            consumer.reset()
+
+def wait_for_database(interval: float = 5):
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            return
+        except OperationalError as e:
+            logger.warning(f"Waiting for the database: {str(e)}")
+            time.sleep(interval)
+
+def drain_legacy_queue(redis_client: Redis, batch_size: int = 500) -> int:
+    """
+    Moves events left on the pre-stream log_queue list onto the log streams,
+    oldest first. Each batch is appended and trimmed from the list in one
+    transaction, so events are neither lost nor moved twice when several
+    workers start at once.
+    """
+    moved = 0
+    while True:
+        with redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(LEGACY_QUEUE_KEY)
+                # Producers LPUSHed, so the oldest events are at the tail
+                payloads = pipe.lrange(LEGACY_QUEUE_KEY, -batch_size, -1)
+                if not payloads:
+                    break
+                pipe.multi()
+                for payload in reversed(payloads):
+                    try:
+                        event = json.loads(payload)
+                        stream = stream_key_for(event.get('source'), event.get('source_type'))
+                    except (ValueError, AttributeError):
+                        # Let the worker log and skip it like any other invalid event
+                        stream = stream_key(0)
+                    pipe.xadd(stream, stream_entry(payload))
+                pipe.ltrim(LEGACY_QUEUE_KEY, 0, -len(payloads) - 1)
+                pipe.execute()
+                moved += len(payloads)
+            except WatchError:
+                continue
+    if moved:
+        logger.info(f"Moved {moved} events from {LEGACY_QUEUE_KEY} to the log streams")
+    return moved
+
+def assign_shards(shards: List[int], processes: int) -> List[List[int]]:
+    """Spreads shards round-robin over the pool; a shard is only ever owned by one process."""
+    return [shards[index::processes] for index in range(min(processes, len(shards)))]
+
+def run_consumer_process(index: int, shards: List[int]):
+    # Don't reuse database connections inherited from the supervisor
+    engine.dispose()
+    process_log_queue(f"{config.WORKER_CONSUMER_NAME}-{index}", shards)
+
+def run_supervisor(processes: int, shards: List[int]):
+    """
+    Runs one consumer process per shard assignment and restarts any that exit.
+    Consumer names are derived from the process index, so a restarted process
+    picks up the pending entries its predecessor left behind.
+    """
+    context = multiprocessing.get_context('spawn')
+    assignments = assign_shards(shards, processes)
+    children: Dict[int, multiprocessing.Process] = {}
+    while True:
+        for index, assigned in enumerate(assignments):
+            child = children.get(index)
+            if child is None or not child.is_alive():
+                if child is not None:
+                    logger.warning(f"Consumer process {index} exited with code {child.exitcode}, restarting")
+                child = context.Process(target=run_consumer_process, args=(index, assigned),
+                                        name=f"log-consumer-{index}", daemon=True)
+                child.start()
+                children[index] = child
+                logger.info(f"Started consumer process {index} (pid {child.pid}) for shards {assigned}")
+        time.sleep(5)
+
+def run_partition_maintenance():
+    """Keeps upcoming log_events partitions created and drops expired ones."""
+    while True:
+        try:
+            if engine.dialect.name == 'postgresql':
+                with engine.begin() as conn:
+                    maintain_partitions(conn, config.LOG_PARTITION_DAYS, config.LOG_PARTITION_PREMAKE_DAYS,
+                                        config.LOG_RETENTION_DAYS)
+        except Exception as e:
+            logger.error(f"Error in run_partition_maintenance: {str(e)}")
+        time.sleep(config.PARTITION_MAINTENANCE_INTERVAL)
 
 def run_task_queue():
     task_queue = TaskQueue(redis)
@@ -86,11 +291,20 @@ def run_task_queue():
     # Add tasks to the queue based on configuration
     for hook_name, hook_config in config.HOOKS.items():
         if hook_config['enabled']:
+            hook_class = None
             if hook_name == 'airflow':
-                hook = AirflowHook()
-                task = Task(hook, interval=hook_config['polling_interval'])
-                task_queue.add_task(task)
+                hook_class = AsyncAirflowHook if hook_config.get('async') else AirflowHook
+            elif hook_name == 'dbt':
+                hook_class = DbtArtifactHook
             # Add other hooks here as they are implemented
+            if hook_class is not None:
+                for params in config.get_hook_instances(hook_name):
+                    instance_config = {**hook_config, **params}
+                    hook = task_queue.registry.get(instance_config.get('instance_id', hook_name), hook_class.__name__, params)
+                    task = Task(hook, interval=instance_config['polling_interval'], jitter=instance_config.get('polling_jitter', 0),
+                                catch_up=instance_config.get('catch_up', 'latest'),
+                                timeout=instance_config.get('timeout', config.TASK_TIMEOUT))
+                    task_queue.add_task(task)
 
     # Run the task queue
     while True:
@@ -101,12 +315,25 @@ def run_task_queue():
             time.sleep(5)  # Wait for 5 seconds before trying again
 
 def run_worker():
-    # Start the log queue processing thread
-    log_thread = threading.Thread(target=process_log_queue)
+    drain_legacy_queue(redis)
+    shards = config.WORKER_SHARDS or list(range(LOG_STREAM_SHARDS))
+    if config.WORKER_PROCESSES > len(shards):
+        logger.warning(f"WORKER_PROCESSES is {config.WORKER_PROCESSES} but this worker owns {len(shards)} "
+                       f"shard(s); only {len(shards)} consumer process(es) will run. Raise LOG_STREAM_SHARDS "
+                       f"to use more processes")
+    if config.WORKER_PROCESSES > 1:
+        # Supervise a pool of consumer processes, sharded by source/source_type
+        log_thread = threading.Thread(target=run_supervisor, args=(config.WORKER_PROCESSES, shards), daemon=True)
+    else:
+        # Start the log queue processing thread
+        log_thread = threading.Thread(target=process_log_queue, args=(config.WORKER_CONSUMER_NAME, shards))
     log_thread.start()
 
+    maintenance_thread = threading.Thread(target=run_partition_maintenance, daemon=True)
+    maintenance_thread.start()
+
     # Run the task queue in the main thread
     run_task_queue()
 
 if __name__ == "__main__":
-    run_worker()
\ No newline at end of file
+    run_worker()
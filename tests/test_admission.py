@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+import fakeredis.aioredis
+from pylotlight.api.admission import REJECTIONS_KEY, AdmissionController, retry_after_header
+from pylotlight.config import _parse_rate_limits
+
+try:
+    import aioredis
+except (ImportError, TypeError):
+    # aioredis 2.0 does not import on Python 3.11+
+    aioredis = None
+
+def test_source_rate_limits_parse_with_default_burst():
+    assert _parse_rate_limits("airflow=200, dbt=50.5:100,broken", 1000) == {"airflow": (200.0, 1000), "dbt": (50.5, 100)}
+    assert _parse_rate_limits("", 1000) == {}
+
+def test_retry_after_is_whole_seconds_of_at_least_one():
+    assert retry_after_header(0.01) == "1"
+    assert retry_after_header(2.1) == "3"
+
+def _controller(redis_client, **kwargs):
+    async def factory():
+        return redis_client
+    return AdmissionController(factory, ["log_stream"], rate=10, burst=5, **kwargs)
+
+def test_bucket_drains_refills_and_goes_into_debt_for_large_batches():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        admission = _controller(redis_client)
+        assert (await admission.admit({"dbt": 5})).admitted
+        limited = await admission.admit({"dbt": 1})
+        await asyncio.sleep(0.15)
+        refilled = await admission.admit({"dbt": 1})
+        # A batch larger than the burst passes on a full bucket and leaves it in debt
+        assert (await admission.admit({"ci": 8})).admitted
+        in_debt = await admission.admit({"ci": 1})
+        rejections = await redis_client.hgetall(REJECTIONS_KEY)
+        return limited, refilled, in_debt, rejections
+
+    limited, refilled, in_debt, rejections = asyncio.run(run())
+    assert (limited.admitted, limited.reason, limited.source) == (False, "rate_limited", "dbt")
+    assert 0 < limited.retry_after <= 0.1
+    assert refilled.admitted
+    assert not in_debt.admitted and 0.3 < in_debt.retry_after <= 0.4
+    assert rejections[b"dbt:rate_limited:requests"] == b"1"
+
+def test_queue_full_above_high_watermark_rejects_every_source():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        admission = _controller(redis_client, high_watermark=2, queue_retry_after=7)
+        assert (await admission.admit({"dbt": 1})).admitted
+        for _ in range(2):
+            await redis_client.xadd("log_stream", {"event": b"{}"})
+        return await admission.admit({"dbt": 1, "ci": 2}), await redis_client.hgetall(REJECTIONS_KEY)
+
+    decision, rejections = asyncio.run(run())
+    assert (decision.admitted, decision.reason, decision.retry_after) == (False, "queue_full", 7)
+    assert rejections[b"ci:queue_full:events"] == b"2"
+
+@pytest.mark.skipif(aioredis is None, reason="aioredis is not importable")
+def test_rejected_requests_get_429_with_retry_after(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from pylotlight.api import routes
+    redis_client = fakeredis.aioredis.FakeRedis()
+
+    async def factory():
+        return redis_client
+    monkeypatch.setattr(routes, "get_ingest_redis", factory)
+    monkeypatch.setattr(routes, "admission", _controller(redis_client))
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(app)
+    event = {"timestamp": "2024-05-01T10:00:00Z", "source": "ci", "source_type": "build", "status_type": "normal",
+             "log_level": "INFO", "message": "m"}
+
+    assert client.post("/ingest/batch", json={"log_events": [event] * 5}).json()["success"]
+    rejected = client.post("/ingest", json={"log_event": event})
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "1"
+    assert rejected.json()["detail"] == "Rate limit exceeded for source ci"
@@ -0,0 +1,9 @@
+import fakeredis
+from pylotlight.hooks.airflow_hook import AirflowHook
+
+def test_failed_run_attempts_get_their_own_dedup_key():
+    hook = AirflowHook(fakeredis.FakeRedis(), base_url="http://airflow/api/v1")
+    run = {"dag_id": "etl", "dag_run_id": "scheduled__2024-08-27", "end_date": "2024-08-27T01:00:00+00:00"}
+    cleared = {**run, "end_date": "2024-08-27T03:00:00+00:00"}
+    assert hook._dedup_key(run) == hook._dedup_key(dict(run))
+    assert hook._dedup_key(run) != hook._dedup_key(cleared)
@@ -0,0 +1,75 @@
+import asyncio
+from pylotlight.api.broadcaster import SSEBroadcaster, SSEClient, SSEFilter, DISCONNECT, coalesce
+from pylotlight.sse_channels import channel_for, parse_channel
+
+AIRFLOW = channel_for("airflow", "health_check", "normal", "INFO")
+DBT_FAILURE = channel_for("dbt", "dbt", "failure", "ERROR")
+
+def test_coalesce_splices_events_and_batches():
+    assert coalesce([b'{"a": 1}']) == b'{"a": 1}'
+    assert coalesce([b'{"a": 1}', b'[{"b": 2}, {"c": 3}]']) == b'[{"a": 1},{"b": 2}, {"c": 3}]'
+
+def test_drop_oldest_keeps_newest_events():
+    async def run():
+        client = SSEClient(2)
+        for sequence, payload in enumerate((b"1", b"2", b"3"), 1):
+            client.put((sequence, payload))
+        assert client.dropped == 1
+        return await client.frames(10).__anext__()
+    assert asyncio.run(run()) == (3, b"[2,3]")
+
+def test_disconnect_policy_closes_slow_client():
+    async def run():
+        broadcaster = SSEBroadcaster(None, "sse_channel", queue_size=1, overflow_policy=DISCONNECT)
+        client = SSEClient(1, DISCONNECT)
+        broadcaster._clients.add(client)
+        broadcaster.broadcast(AIRFLOW, b"1")
+        broadcaster.broadcast(AIRFLOW, b"2")
+        return client, broadcaster, [frame async for frame in client.frames(10)]
+    client, broadcaster, frames = asyncio.run(run())
+    assert client.closed and frames == []
+    assert client not in broadcaster._clients
+
+def test_resume_replays_missed_events_or_resets():
+    async def run():
+        broadcaster = SSEBroadcaster(None, "sse_channel", replay_size=3)
+        broadcaster.start = lambda: None
+        for payload in (b"1", b"2", b"3", b"4"):
+            broadcaster.broadcast(AIRFLOW, payload)
+        resumed = await broadcaster.subscribe(broadcaster.event_id(2)).frames(10).__anext__()
+        # Event 1 has already left the buffer
+        expired = await broadcaster.subscribe(broadcaster.event_id(0)).frames(10).__anext__()
+        foreign = await broadcaster.subscribe("other-4").frames(10).__anext__()
+        return resumed, expired, foreign
+    resumed, expired, foreign = asyncio.run(run())
+    assert resumed == (4, b"[3,4]")
+    assert expired == (4, None) and foreign == (4, None)
+
+def test_filters_match_on_channel():
+    dbt_failures = SSEFilter(sources=["dbt"], min_log_level="WARNING", status_types=["failure"])
+    assert dbt_failures.matches(DBT_FAILURE)
+    assert not dbt_failures.matches(AIRFLOW)
+    assert not SSEFilter(min_log_level="ERROR").matches(AIRFLOW)
+    assert SSEFilter(source_types=["health_check"]).matches(AIRFLOW)
+
+def test_channel_components_may_contain_separators():
+    key = ("ci:prod", "build:nightly", "fail%ure", "ERROR")
+    assert parse_channel(channel_for(*key)) == key
+    assert SSEFilter(source_types=["build:nightly"]).matches(channel_for(*key))
+
+def test_filter_cache_is_bounded():
+    subscription_filter = SSEFilter(sources=["dbt"])
+    for index in range(SSEFilter.MAX_CACHED_CHANNELS + 10):
+        subscription_filter.matches(channel_for(f"source-{index}", "x", "normal", "INFO"))
+    assert len(subscription_filter._matches) == SSEFilter.MAX_CACHED_CHANNELS
+    assert subscription_filter.matches(DBT_FAILURE)
+
+def test_filtered_clients_only_receive_matching_events():
+    async def run():
+        broadcaster = SSEBroadcaster(None, "sse_channel:*")
+        broadcaster.start = lambda: None
+        client = broadcaster.subscribe(subscription_filter=SSEFilter(sources=["dbt"]))
+        broadcaster.broadcast(AIRFLOW, b"1")
+        broadcaster.broadcast(DBT_FAILURE, b"2")
+        return await client.frames(10).__anext__()
+    assert asyncio.run(run()) == (2, b"2")
@@ -0,0 +1,57 @@
+import json
+import fakeredis
+from pylotlight.worker.consumer import LogStreamConsumer
+
+def _consumer(redis_client, max_deliveries=3):
+    consumer = LogStreamConsumer(redis_client, ["log_stream"], "log_workers", "worker-0", claim_interval=3600,
+                                 max_deliveries=max_deliveries, dead_letter_stream="log_stream_dead_letter")
+    consumer.ensure_group()
+    return consumer
+
+def _events(entries):
+    return [fields[b"event"] for _, _, fields in entries]
+
+def test_failed_batch_is_retried_before_newer_entries():
+    redis_client = fakeredis.FakeRedis()
+    consumer = _consumer(redis_client)
+    for event in (b"1", b"2"):
+        redis_client.xadd("log_stream", {"event": event})
+    assert _events(consumer.read_batch(10, 0, idle_block_ms=0)) == [b"1", b"2"]
+
+    consumer.reset()
+    redis_client.xadd("log_stream", {"event": b"3"})
+    for expected in ([b"1"], [b"2"], [b"3"]):
+        entries = consumer.read_batch(10, 0, idle_block_ms=0)
+        assert _events(entries) == expected
+        consumer.ack(entries)
+
+def test_entry_failing_past_max_deliveries_is_dead_lettered():
+    redis_client = fakeredis.FakeRedis()
+    consumer = _consumer(redis_client)
+    redis_client.xadd("log_stream", {"event": b"poison"})
+    redis_client.xadd("log_stream", {"event": b"good"})
+    consumer.read_batch(10, 0, idle_block_ms=0)
+
+    # Delivered once above and twice more here; the fourth delivery moves it aside
+    for _ in range(2):
+        consumer.reset()
+        assert _events(consumer.read_batch(10, 0, idle_block_ms=0)) == [b"poison"]
+    consumer.reset()
+    entries = consumer.read_batch(10, 0, idle_block_ms=0)
+    assert _events(entries) == [b"good"]
+    consumer.ack(entries)
+
+    dead = redis_client.xrange("log_stream_dead_letter")
+    assert [fields[b"event"] for _, fields in dead] == [b"poison"]
+    assert dead[0][1][b"stream"] == b"log_stream"
+    assert redis_client.xlen("log_stream") == 0
+
+def test_legacy_queue_is_drained_into_the_streams_oldest_first():
+    from pylotlight.worker.worker import drain_legacy_queue
+    redis_client = fakeredis.FakeRedis()
+    for message in ("a", "b", "c"):
+        redis_client.lpush("log_queue", f'{{"source": "dbt", "source_type": "dbt", "message": "{message}"}}')
+    assert drain_legacy_queue(redis_client, batch_size=2) == 3
+    assert redis_client.llen("log_queue") == 0
+    entries = [fields for key in redis_client.keys("log_stream*") for _, fields in redis_client.xrange(key)]
+    assert [json.loads(fields[b"event"])["message"] for fields in entries] == ["a", "b", "c"]
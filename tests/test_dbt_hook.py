@@ -0,0 +1,44 @@
+import json
+import fakeredis
+from pylotlight.hooks.dbt_hook import DbtArtifactHook
+
+MANIFEST = {"nodes": {"model.shop.orders": {"name": "orders"}, "test.shop.not_null": {"name": "not_null_orders_id"}}}
+RUN_RESULTS = {
+    "metadata": {"invocation_id": "run-1", "generated_at": "2024-08-27T17:24:52Z"},
+    "results": [
+        {"unique_id": "model.shop.orders", "status": "success", "execution_time": 1.5,
+         "timing": [{"name": "execute", "completed_at": "2024-08-27T17:24:50Z"}]},
+        {"unique_id": "test.shop.not_null", "status": "fail", "execution_time": 0.2, "message": "Got 3 results"},
+    ],
+}
+
+def _target_dir(tmp_path):
+    (tmp_path / "manifest.json").write_text(json.dumps(MANIFEST))
+    (tmp_path / "run_results.json").write_text(json.dumps(RUN_RESULTS))
+    return str(tmp_path)
+
+def test_emits_named_results_once_per_committed_run(tmp_path):
+    redis_client = fakeredis.FakeRedis()
+    target_dir = _target_dir(tmp_path)
+    hook = DbtArtifactHook(redis_client, target_dir=target_dir)
+
+    events = hook.push_events()
+    assert [(event.model_name, event.node_id, event.run_id) for event in events] == [
+        ("orders", "model.shop.orders", "run-1"),
+        ("not_null_orders_id", "test.shop.not_null", "run-1"),
+    ]
+    assert [(event.status_type, event.log_level) for event in events] == [("normal", "INFO"), ("failure", "ERROR")]
+    assert events[1].message == "test.shop.not_null fail in 0.20s: Got 3 results"
+
+    hook.commit_state()
+    assert hook.push_events() == []
+    assert DbtArtifactHook(redis_client, target_dir=target_dir).push_events() == []
+
+def test_run_is_emitted_again_until_committed(tmp_path):
+    redis_client = fakeredis.FakeRedis()
+    target_dir = _target_dir(tmp_path)
+    assert len(DbtArtifactHook(redis_client, target_dir=target_dir).push_events()) == 2
+
+    hook = DbtArtifactHook(redis_client, target_dir=target_dir)
+    assert len(hook.push_events()) == 2
+    assert len(hook.push_events()) == 2
@@ -0,0 +1,44 @@
+from collections import Counter
+import fakeredis
+from pylotlight.hooks.airflow_hook import AirflowHook
+from pylotlight.worker.dedup import EventDeduplicator, event_fingerprint
+from pylotlight.worker.worker import to_db_row
+
+def _row(source, source_type, **details):
+    return {'source': source, 'source_type': source_type, 'additional_data': details}
+
+def test_identity_fields_ignore_timestamps_and_messages():
+    first = _row('airflow', 'airflow_failed_dag', dag_id='d', execution_date='2024-08-27T00:00:00Z', try_number=1)
+    repeat = _row('airflow', 'airflow_failed_dag', dag_id='d', execution_date='2024-08-27T00:00:00Z', try_number=1)
+    retry = _row('airflow', 'airflow_failed_dag', dag_id='d', execution_date='2024-08-27T00:00:00Z', try_number=2)
+    assert event_fingerprint(first, b'{"message": "a"}') == event_fingerprint(repeat, b'{"message": "b"}')
+    assert event_fingerprint(first, b'{}') != event_fingerprint(retry, b'{}')
+
+def test_other_events_are_fingerprinted_on_their_payload_or_dedup_key():
+    row = _row('ci', 'build')
+    assert event_fingerprint(row, b'{"a": 1}') == event_fingerprint(row, b'{"a": 1}')
+    assert event_fingerprint(row, b'{"a": 1}') != event_fingerprint(row, b'{"a": 2}')
+    keyed = _row('dbt', 'dbt', dedup_key='prod:dbt:run:model.a', run_id='run', node_id='model.a')
+    assert event_fingerprint(keyed, b'{"a": 1}') == event_fingerprint(keyed, b'{"a": 2}')
+
+def test_events_missing_identity_fields_are_fingerprinted_on_their_payload():
+    bare = _row('dbt', 'dbt', model_name='a')
+    same_run = _row('dbt', 'dbt', run_id='run')
+    assert event_fingerprint(bare, b'{"model_name": "a"}') != event_fingerprint(bare, b'{"model_name": "b"}')
+    assert event_fingerprint(same_run, b'{"message": "a"}') != event_fingerprint(same_run, b'{"message": "b"}')
+    assert event_fingerprint(same_run, b'{"message": "a"}') == event_fingerprint(same_run, b'{"message": "a"}')
+
+def test_import_error_recovery_and_recurrence_are_kept():
+    hook = AirflowHook(fakeredis.FakeRedis(), base_url="http://airflow/api/v1")
+    deduplicator = EventDeduplicator(fakeredis.FakeRedis())
+    deduplicator.use_bloom = False
+    error = {"filename": "dags/etl.py", "stack_trace": "SyntaxError", "timestamp": "2024-08-27T01:00:00+00:00"}
+    recurred = {**error, "timestamp": "2024-08-27T01:10:00+00:00"}
+    now = 1724720000.0
+
+    # Failing, fixed, then failing again on the same file within one window
+    for errors in ([error], [], [recurred]):
+        event = hook._build_events({}, {"import_errors": errors}, [])[1]
+        fingerprints = [event_fingerprint(to_db_row(event), event.model_dump_json().encode())]
+        assert deduplicator.duplicates(fingerprints, now) == [False]
+        deduplicator.remember(fingerprints, Counter(), 1, now)
@@ -0,0 +1,26 @@
+from pylotlight.hooks.base_hook import BaseHook
+from pylotlight.worker.hook_registry import HookRegistry
+
+class DummyHook(BaseHook):
+    def __init__(self, redis_client=None, **params):
+        self.params = params
+        self.closed = False
+
+    def push_events(self):
+        return []
+
+    def close(self):
+        self.closed = True
+
+def test_instances_are_reused_until_their_params_change():
+    registry = HookRegistry(None)
+    registry.register_class(DummyHook)
+    prod = registry.get("prod", "DummyHook", {"url": "a"})
+    staging = registry.get("staging", "DummyHook", {"url": "b"})
+    assert registry.get("prod", "DummyHook", {"url": "a"}) is prod
+    assert staging is not prod
+
+    rebuilt = registry.get("prod", "DummyHook", {"url": "c"})
+    assert rebuilt is not prod and prod.closed
+    registry.close_all()
+    assert rebuilt.closed and staging.closed
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from pylotlight.config import Config
+from pylotlight.schemas.log_events import validate_log_event
+
+try:
+    import aioredis
+except (ImportError, TypeError):
+    # aioredis 2.0 does not import on Python 3.11+
+    aioredis = None
+
+pytestmark = pytest.mark.skipif(aioredis is None, reason="aioredis is not importable")
+
+EVENT = validate_log_event({"timestamp": "2024-05-01T10:00:00Z", "source": "dbt", "source_type": "dbt",
+                            "status_type": "normal", "log_level": "INFO", "message": "m"})
+
+async def _slow_redis(delay: dict):
+    """RESP server answering XADD with the id of each command received, after delay['seconds']."""
+    entry_ids = iter(range(1, 1000))
+
+    async def handle(reader, writer):
+        while True:
+            header = await reader.readline()
+            if not header:
+                break
+            args = []
+            for _ in range(int(header[1:])):
+                length = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            entry_id = f"1-{next(entry_ids)}".encode()
+            await asyncio.sleep(delay['seconds'])
+            if args[0].upper() == b'XADD':
+                writer.write(b"$%d\r\n%s\r\n" % (len(entry_id), entry_id))
+            else:
+                writer.write(b":0\r\n")
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+def test_timed_out_push_does_not_leave_its_reply_on_the_pool(monkeypatch):
+    from pylotlight.api import routes
+    monkeypatch.setattr(Config, "INGEST_REDIS_TIMEOUT_MS", 100)
+    payload = [(EVENT, "log_stream", EVENT.model_dump_json().encode())]
+
+    async def run():
+        delay = {'seconds': 0.3}
+        server = await _slow_redis(delay)
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(routes, "ingest_redis", await routes.ingest_redis_client(f"redis://127.0.0.1:{port}/0"))
+        with pytest.raises(aioredis.exceptions.TimeoutError):
+            await routes._queue_events(payload)
+        delay['seconds'] = 0
+        # The late reply to the timed-out XADD ("1-1") must not be read as this one's
+        entry_ids = await routes._queue_events(payload)
+        await routes.ingest_redis.close()
+        server.close()
+        return entry_ids
+
+    assert asyncio.run(run()) == ["1-2"]
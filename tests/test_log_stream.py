@@ -0,0 +1,27 @@
+from pylotlight.log_stream import read_entry, stream_entry
+from pylotlight.schemas.log_events import validate_log_event
+
+def _as_read(entry):
+    return {key.encode(): value if isinstance(value, bytes) else value.encode() for key, value in entry.items()}
+
+def test_envelope_marks_validated_payloads_and_keeps_their_bytes():
+    event = validate_log_event({"timestamp": "2024-08-27T17:24:52Z", "source": "dbt", "source_type": "dbt",
+                                "status_type": "normal", "log_level": "INFO", "message": "ok"})
+    payload = event.model_dump_json().encode()
+    envelope = read_entry(_as_read(stream_entry(payload, event, published=True)))
+    assert envelope.payload == payload
+    assert (envelope.source, envelope.source_type, envelope.validated, envelope.published) == ("dbt", "dbt", True, True)
+
+    unvalidated = read_entry(_as_read(stream_entry(b'{"source": "x"}')))
+    assert not unvalidated.validated and not unvalidated.published
+
+def test_entries_without_an_envelope_are_untrusted():
+    envelope = read_entry({b"event": b'{"source": "x"}'})
+    assert not envelope.validated and not envelope.published and envelope.source is None
+
+def test_single_shard_keeps_the_unsuffixed_stream(monkeypatch):
+    from pylotlight import log_stream
+    monkeypatch.setattr(log_stream, "LOG_STREAM_SHARDS", 1)
+    assert log_stream.all_stream_keys() == [log_stream.LOG_STREAM_KEY]
+    monkeypatch.setattr(log_stream, "LOG_STREAM_SHARDS", 2)
+    assert log_stream.all_stream_keys() == [f"{log_stream.LOG_STREAM_KEY}:0", f"{log_stream.LOG_STREAM_KEY}:1"]
@@ -0,0 +1,93 @@
+import gzip
+import json
+import asyncio
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from pylotlight.api.middleware import DecompressionMiddleware
+from pylotlight.api.ndjson import iter_lines
+
+try:
+    import aioredis
+except (ImportError, TypeError):
+    # aioredis 2.0 does not import on Python 3.11+
+    aioredis = None
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def _collect(data, size, max_line_bytes):
+    return [item async for item in iter_lines(_chunks(data, size), max_line_bytes)]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_lines_keep_their_numbers_and_offsets_across_chunks(chunk_size):
+    data = b'{"a":1}\n\n' + b'x' * 30 + b'\n{"b":2}\r\n{"c":3}'
+    assert asyncio.run(_collect(data, chunk_size, 10)) == [
+        (1, 0, b'{"a":1}'),
+        (3, 9, None),
+        (4, 40, b'{"b":2}'),
+        (5, 49, b'{"c":3}'),
+    ]
+
+def _echo_client(max_size=1000):
+    async def echo(request):
+        body = b"".join([chunk async for chunk in request.stream()])
+        return PlainTextResponse(body)
+    app = Starlette(routes=[Route("/bounded", echo, methods=["POST"]), Route("/ndjson", echo, methods=["POST"])])
+    return TestClient(DecompressionMiddleware(app, max_size=max_size, unbounded_paths=["/ndjson"]))
+
+NDJSON = b"".join(b'{"line": %d}\n' % number for number in range(200))
+
+def test_gzip_and_zstd_bodies_are_decompressed():
+    client = _echo_client()
+    gzipped = client.post("/ndjson", content=gzip.compress(NDJSON), headers={"Content-Encoding": "gzip"})
+    assert gzipped.status_code == 200 and gzipped.content == NDJSON
+    zstd = pytest.importorskip("zstandard")
+    compressed = zstd.ZstdCompressor().compress(NDJSON)
+    zstded = client.post("/ndjson", content=compressed, headers={"Content-Encoding": "zstd"})
+    assert zstded.status_code == 200 and zstded.content == NDJSON
+
+def test_truncated_oversized_and_unknown_bodies_are_rejected():
+    client = _echo_client()
+    truncated = client.post("/ndjson", content=gzip.compress(NDJSON)[:-20], headers={"Content-Encoding": "gzip"})
+    assert truncated.status_code == 400
+    oversized = client.post("/bounded", content=gzip.compress(NDJSON), headers={"Content-Encoding": "gzip"})
+    assert oversized.status_code == 413
+    assert client.post("/bounded", content=b"x", headers={"Content-Encoding": "br"}).status_code == 415
+
+@pytest.mark.skipif(aioredis is None, reason="aioredis is not importable")
+def test_endpoint_reports_line_errors_and_committed_lines(monkeypatch):
+    import fakeredis.aioredis
+    from fastapi import FastAPI
+    from pylotlight.api import routes
+    from pylotlight.api.admission import AdmissionController
+    from pylotlight.config import Config
+    redis_client = fakeredis.aioredis.FakeRedis()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        if len(calls) > 2:
+            raise ConnectionError("Redis is down")
+        return redis_client
+    monkeypatch.setattr(routes, "get_ingest_redis", factory)
+    monkeypatch.setattr(routes, "admission", AdmissionController(factory, [], rate=0, burst=0))
+    monkeypatch.setattr(Config, "INGEST_CHUNK_SIZE", 2)
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(DecompressionMiddleware(app, max_size=1000, unbounded_paths=["/ingest/ndjson"]))
+
+    event = json.dumps({"timestamp": "2024-05-01T10:00:00Z", "source": "ci", "source_type": "build",
+                        "status_type": "normal", "log_level": "INFO", "message": "m"}).encode()
+    lines = [event, b'{"source": "ci"', event, event, event, event, event]
+    body = gzip.compress(b"\n".join(lines))
+    response = client.post("/ingest/ndjson", content=body, headers={"Content-Encoding": "gzip"})
+
+    # Lines 1-5 are queued in two chunks, then Redis fails on the third
+    assert response.status_code == 503
+    result = response.json()
+    assert (result["accepted"], result["failed"], result["committed_lines"]) == (4, 1, 5)
+    assert result["errors"][0]["line"] == 2 and result["errors"][0]["offset"] == len(event) + 1
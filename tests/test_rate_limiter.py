@@ -0,0 +1,18 @@
+from pylotlight.hooks.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+def test_no_delay_until_throttled():
+    limiter = AdaptiveRateLimiter()
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+
+def test_throttling_backs_off_and_success_recovers():
+    limiter = AdaptiveRateLimiter(initial_backoff=0.5)
+    limiter.on_throttle(parse_retry_after("2"))
+    assert limiter.interval == 0.5
+    assert 1.9 < limiter.reserve() <= 2
+    limiter.on_throttle()
+    assert limiter.interval == 1.0
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.interval == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
@@ -0,0 +1,25 @@
+import time
+import fakeredis
+from pylotlight.scheduler import CATCH_UP_ALL, CATCH_UP_LATEST, TASK_SCHEDULE_KEY, TaskScheduler, next_slot
+
+def test_next_slot_on_time_runs_following_slot():
+    assert next_slot(0, 10, 3, 31, CATCH_UP_LATEST, 10) == 4
+    assert next_slot(0, 10, 3, 31, CATCH_UP_ALL, 10) == 4
+
+def test_missed_slots_are_coalesced_or_caught_up():
+    # Slot 0 finished at t=55, so slots 1-5 were missed
+    assert next_slot(0, 10, 0, 55, CATCH_UP_LATEST, 10) == 6
+    assert next_slot(0, 10, 0, 55, CATCH_UP_ALL, 10) == 1
+    # Catch-up is capped at max_catch_up missed runs
+    assert next_slot(0, 10, 0, 155, CATCH_UP_ALL, 3) == 13
+
+def test_lease_outlasts_the_task_timeout():
+    redis_client = fakeredis.FakeRedis()
+    scheduler = TaskScheduler(redis_client, lease_seconds=300, lease_margin=30)
+    scheduler.register('dbt', {'interval': 60, 'timeout': 300.0})
+    scheduler.register('airflow', {'interval': 60, 'timeout': 60.0})
+    started = time.time()
+    assert {claim.task_id for claim in scheduler.claim_due('worker-0')} == {'dbt', 'airflow'}
+    expiries = dict(redis_client.zrange(TASK_SCHEDULE_KEY, 0, -1, withscores=True))
+    assert 330 <= expiries[b'dbt'] - started < 332
+    assert 300 <= expiries[b'airflow'] - started < 302
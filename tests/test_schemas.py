@@ -0,0 +1,37 @@
+import pytest
+from pydantic import ValidationError
+from pylotlight.schemas.log_events import (
+    AirflowFailedDagEvent,
+    DbtLogEvent,
+    GenericLogEvent,
+    BatchLogIngestionRequest,
+    validate_log_event,
+)
+from pylotlight.sources import get_source_handler
+
+BASE = {
+    "timestamp": "2024-08-27T17:24:52",
+    "status_type": "failure",
+    "log_level": "ERROR",
+    "message": "test",
+}
+
+def test_dispatches_on_source_and_source_type():
+    event = validate_log_event({**BASE, "source": "airflow", "source_type": "airflow_failed_dag",
+                                "dag_id": "example", "execution_date": "2024-08-27T00:00:00", "try_number": 1})
+    assert isinstance(event, AirflowFailedDagEvent)
+
+def test_falls_back_to_generic_event():
+    assert type(validate_log_event({**BASE, "source": "ci", "source_type": "build"})) is GenericLogEvent
+    # Known tag, but missing the fields of the specific model
+    assert type(validate_log_event({**BASE, "source": "airflow", "source_type": "airflow_failed_dag"})) is GenericLogEvent
+
+def test_invalid_event_raises():
+    with pytest.raises(ValidationError):
+        validate_log_event({"source": "airflow"})
+
+def test_batch_request_and_handler_share_parsed_models():
+    request = BatchLogIngestionRequest(log_events=[{**BASE, "source": "dbt", "source_type": "dbt", "model_name": "orders"}])
+    event = request.log_events[0]
+    assert isinstance(event, DbtLogEvent)
+    assert get_source_handler("dbt").validate_and_process(event) is event
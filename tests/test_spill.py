@@ -0,0 +1,49 @@
+import os
+import pytest
+from pylotlight.api.spill import SpillFull, SpillLocked, SpillLog
+
+def _drain(spill, batch_size=2):
+    drained = []
+    while spill.pending:
+        payloads, position = spill.read_batch(batch_size)
+        drained.extend(payloads)
+        spill.commit(position)
+    return drained
+
+def test_drains_in_order_across_segments_and_restarts(tmp_path):
+    spill = SpillLog(str(tmp_path), segment_bytes=40, max_bytes=1000)
+    spill.append([b"event-%d" % i for i in range(3)])
+    spill.append([b"event-3"])
+    spill.append([b"event-4", b"event-5"])
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".spill")]) == 3
+
+    payloads, position = spill.read_batch(4)
+    assert payloads == [b"event-0", b"event-1", b"event-2", b"event-3"]
+    spill.commit(position)
+    spill.close()
+
+    # Only the events after the checkpoint are left after a restart
+    resumed = SpillLog(str(tmp_path), segment_bytes=40, max_bytes=1000)
+    resumed.append([b"event-6"])
+    assert _drain(resumed) == [b"event-4", b"event-5", b"event-6"]
+    assert not resumed.pending
+    assert resumed.size_bytes == 0
+
+def test_torn_record_and_disk_cap(tmp_path):
+    spill = SpillLog(str(tmp_path), max_bytes=100)
+    spill.append([b"complete"])
+    spill.close()
+    with open(tmp_path / "000000000001.spill", "ab") as f:
+        f.write(b"\x00\x00\x00\x10torn")
+
+    resumed = SpillLog(str(tmp_path), max_bytes=100)
+    assert _drain(resumed) == [b"complete"]
+    with pytest.raises(SpillFull):
+        resumed.append([b"x" * 100])
+
+def test_directory_is_locked_to_one_process(tmp_path):
+    spill = SpillLog(str(tmp_path))
+    with pytest.raises(SpillLocked):
+        SpillLog(str(tmp_path))
+    spill.close()
+    SpillLog(str(tmp_path)).close()
@@ -0,0 +1,22 @@
+import ast
+import os
+from typing import Tuple
+import pylotlight
+from pylotlight.status import get_status_key
+
+def _ui_get_status_key():
+    # The UI module imports streamlit at import time, so load only its copy of the function
+    path = os.path.join(os.path.dirname(pylotlight.__file__), "ui", "app.py")
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    node = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == "get_status_key")
+    namespace = {"Tuple": Tuple}
+    exec(compile(ast.Module(body=[node], type_ignores=[]), path, "exec"), namespace)
+    return namespace["get_status_key"]
+
+def test_snapshot_keys_match_the_ui():
+    ui_get_status_key = _ui_get_status_key()
+    for source in ["airflow", "airflow_scheduler", "dbt", "dbt_cloud", "database_postgres", "ci_github", "custom"]:
+        assert get_status_key(source) == ui_get_status_key(source)
+    assert get_status_key("airflow") == ("airflow", "airflow")
+    assert get_status_key("airflow_scheduler") == ("airflow", "scheduler")
@@ -0,0 +1,30 @@
+import os
+from pylotlight.agent.tailer import CheckpointStore, FileTailer
+
+def _lines(tailer):
+    return [line for _, line, _ in tailer.poll()]
+
+def test_follows_rotation_truncation_and_resumes_from_checkpoint(tmp_path):
+    log = tmp_path / "dbt.log"
+    log.write_text("one\ntwo\npart")
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.json"))
+    tailer = FileTailer([("dbt", str(log))], checkpoints, start_at_end=False)
+    assert _lines(tailer) == ["one", "two"]
+
+    with open(log, "a") as f:
+        f.write("ial\nthree\n")
+    os.rename(log, tmp_path / "dbt.log.1")
+    log.write_text("new\n")
+    assert sorted(_lines(tailer)) == ["new", "partial", "three"]
+
+    log.write_text("x\n")
+    assert _lines(tailer) == ["x"]
+
+    for tailed in tailer.files.values():
+        checkpoints.update(tailed.key, tailed.path, tailed.offset)
+    checkpoints.save()
+    tailer.close()
+    with open(log, "a") as f:
+        f.write("y\n")
+    resumed = FileTailer([("dbt", str(log))], CheckpointStore(str(tmp_path / "checkpoints.json")))
+    assert _lines(resumed) == ["y"]